@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Memory and evaluation throughput of a 1M-node parse tree, before and after
+ParseNode got __slots__ and a pre-parsed numeric value.
+
+"before" uses a copy of the original ParseNode (per-instance __dict__, string operands)
+evaluated with float(node.value) at every leaf and float() on every intermediate result.
+"after" is the current ParseTree / Execute.
+
+Run from the repository root:
+    python -m benchmarks.bench_parse_node
+"""
+
+import gc
+import time
+import tracemalloc
+
+from parseTree import ParseTree
+
+NODES = 1_000_000
+
+
+class LegacyParseNode:
+    """ The ParseNode layout before __slots__ """
+
+    def __init__(self, value: str, is_operator: bool = False):
+        self.value = value
+        self.is_operator = is_operator
+        self.left = None
+        self.right = None
+
+
+def legacy_apply_operator(left, right, operator: str) -> float:
+    """ apply_operator as it was: a fresh dict per call and float() on both operands """
+    switcher = {
+        '+': lambda x, y: x + y,
+        '-': lambda x, y: x - y,
+        '*': lambda x, y: x * y,
+        '/': lambda x, y: x / y,
+        '^': lambda x, y: x ** y
+    }
+    return switcher[operator](float(left), float(right))
+
+
+def legacy_build(postfix: list[str]) -> LegacyParseNode:
+    stack = []
+    for token in postfix:
+        if token in '+-*/^':
+            node = LegacyParseNode(token, is_operator=True)
+            node.right = stack.pop()
+            node.left = stack.pop()
+            stack.append(node)
+        else:
+            stack.append(LegacyParseNode(token))
+    return stack.pop()
+
+
+def legacy_evaluate(root: LegacyParseNode) -> float:
+    values = []
+    stack = [(root, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if not node.is_operator:
+            values.append(float(node.value))
+        elif children_done:
+            right = values.pop()
+            left = values.pop()
+            values.append(legacy_apply_operator(left, right, node.value))
+        else:
+            stack.append((node, True))
+            stack.append((node.right, False))
+            stack.append((node.left, False))
+    return values.pop()
+
+
+def make_postfix(nodes: int) -> list[str]:
+    """ A left-leaning chain such as 1.5+2*3+2*3... with `nodes` nodes """
+    postfix = ['1.5']
+    while len(postfix) + 4 <= nodes:
+        postfix += ['2', '3', '*', '+']
+    return postfix
+
+
+def measure(label: str, build, evaluate):
+    """ Print the memory taken by the tree and the evaluation throughput """
+    gc.collect()
+    tracemalloc.start()
+    tree = build()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    result = evaluate(tree)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<7} {memory / NODES:7.1f} bytes/node  {memory / 2 ** 20:8.1f} MiB"
+          f"  evaluate {elapsed:6.3f} s  {NODES / elapsed / 1e6:5.2f} M nodes/s  result={result}")
+    return result
+
+
+def main():
+    postfix = make_postfix(NODES)
+    before = measure("before", lambda: legacy_build(postfix), legacy_evaluate)
+    after = measure("after", lambda: ParseTree(postfix), lambda tree: tree.execute())
+    assert before == after
+
+
+if __name__ == "__main__":
+    main()
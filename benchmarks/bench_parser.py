@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Per-expression latency of Parser before and after the fused validate+parse pipeline.
+
+"before" replays the original pipeline: the multi-regex is_valid_expression,
+expression.replace(" ", ""), a regex tokenizer and a separate shunting-yard pass.
+"after" is the current Parser, which scans the expression exactly once.
+
+Run from the repository root:
+    python -m benchmarks.bench_parser
+"""
+
+import re
+import timeit
+
+from index import Parser
+from operators import valid_parentheses
+from parseTree import ParseTree
+
+
+def legacy_get_precedence(operator: str) -> int:
+    """ get_precedence as it was, building its table on every call """
+    precedence = {'+': 1, '-': 1, '*': 2, '/': 2, '^': 3}
+    return precedence.get(operator, 0)
+
+
+def legacy_is_valid_expression(expression: str) -> bool:
+    """ The regex based validation that used to live in operators.is_valid_expression """
+    if not expression:
+        return False
+    if not re.match(r'^[0-9+\-*/^(). ]+$', expression):
+        return False
+    if re.search(r'[+\-*/^]{2,}', expression):
+        return False
+    if not valid_parentheses(expression):
+        return False
+    if re.match(r'^[+\-*/^]', expression) or re.search(r'[+\-*/^]$', expression):
+        return False
+    for token in re.sub(r'[+\-*/^()]', ' ', expression).split():
+        try:
+            float(token)
+        except ValueError:
+            return False
+    for expr in re.findall(r'\(([^()]*)\)', expression):
+        if not expr or not legacy_is_valid_expression(expr):
+            return False
+    return True
+
+
+def legacy_parse(expression: str) -> tuple[list[str], ParseTree]:
+    """ The validate, strip, tokenize, convert pipeline Parser used to run """
+    if not legacy_is_valid_expression(expression):
+        raise ValueError("Invalid expression. Please provide a valid mathematical expression.")
+    expression = expression.replace(" ", "")
+    stack : list[str] = []
+    output : list[str] = []
+    for token in re.findall(r'\d+\.\d+|\d+|[()+\-*/^]', expression):
+        if token == '(':
+            stack.append(token)
+        elif token == ')':
+            while stack and stack[-1] != '(':
+                output.append(stack.pop())
+            if stack and stack[-1] == '(':
+                stack.pop()
+        elif token in ['+', '-', '*', '/', '^']:
+            while (stack and stack[-1] != '(' and
+                   legacy_get_precedence(stack[-1]) >= legacy_get_precedence(token)):
+                output.append(stack.pop())
+            stack.append(token)
+        else:
+            output.append(token)
+    while stack:
+        if stack[-1] in '()':
+            stack.pop()
+            continue
+        output.append(stack.pop())
+    return output, ParseTree(output)
+
+
+def fused_parse(expression: str) -> tuple[list[str], ParseTree]:
+    """ The current single pass Parser """
+    parser = Parser(expression)
+    return parser.postfix, parser.parsetree
+
+
+def make_expression(length: int) -> str:
+    """ Build an expression of roughly `length` characters using every operator and parentheses """
+    unit = "(3.5 + 4) * 2 - 8 / 2 ^ 2 + "
+    return unit * max(1, length // len(unit)) + "1"
+
+
+def bench(label: str, expression: str, number: int):
+    """ Print the per-expression latency of both pipelines """
+    assert legacy_parse(expression)[0] == fused_parse(expression)[0], "pipelines disagree"
+    before = min(timeit.repeat(lambda: legacy_parse(expression), number=number, repeat=5)) / number
+    after = min(timeit.repeat(lambda: fused_parse(expression), number=number, repeat=5)) / number
+    print(f"{label:<8} {len(expression):>8} chars  before {before * 1e6:12.1f} us"
+          f"  after {after * 1e6:12.1f} us  speedup {before / after:5.2f}x")
+
+
+def main():
+    bench("short", "10+4*5-6/2", number=20000)
+    bench("long", make_expression(100_000), number=5)
+
+
+if __name__ == "__main__":
+    main()
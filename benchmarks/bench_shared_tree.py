@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Node reduction and evaluation time of shared parse trees (ParseTree(postfix, shared=True))
+on a corpus of generated formulas that repeat their subexpressions.
+
+The corpus mimics formulas produced by other systems: terms are built from a small pool of
+subexpressions such as (a+b), (x*y-c) or (a+b)^2, and combined into sums of products,
+so the same subexpressions appear many times in every formula.
+"tree" is an ordinary ParseTree, "shared" interns identical subtrees into a DAG.
+
+Run from the repository root:
+    python -m benchmarks.bench_shared_tree
+"""
+
+import random
+import time
+
+from index import Parser
+from parseTree import ParseTree
+
+FORMULAS = 200
+TERMS = 40
+BINDINGS = {'a': 1.25, 'b': -0.5, 'c': 3.0, 'x': 0.75, 'y': 2.0}
+
+
+def make_corpus(seed: int = 7) -> list[list[str]]:
+    """ Postfix expressions of FORMULAS generated formulas of TERMS terms each """
+    rng = random.Random(seed)
+    pool = ["(a+b)", "(x*y-c)", "(a+b)^2", "(x/(y+c))", "(a*x+b*y)", "((a+b)*(x*y-c))"]
+    corpus = []
+    for _ in range(FORMULAS):
+        terms = [f"{rng.choice(pool)}*{rng.choice(pool)}/{rng.choice(pool)}" for _ in range(TERMS)]
+        corpus.append(Parser("+".join(terms)).postfix)
+    return corpus
+
+
+def measure(label: str, corpus: list[list[str]], shared: bool) -> tuple[int, float]:
+    """ Print the node count, build time and evaluation time over the corpus """
+    start = time.perf_counter()
+    trees = [ParseTree(postfix, shared=shared) for postfix in corpus]
+    built = time.perf_counter() - start
+    nodes = sum(tree.node_count() for tree in trees)
+
+    start = time.perf_counter()
+    total = sum(tree.execute(BINDINGS) for tree in trees)
+    evaluated = time.perf_counter() - start
+    print(f"{label:<7} {nodes:9d} nodes  build {built * 1000:7.1f} ms  evaluate {evaluated * 1000:7.1f} ms")
+    return nodes, total
+
+
+def main():
+    corpus = make_corpus()
+    tree_nodes, tree_total = measure("tree", corpus, shared=False)
+    shared_nodes, shared_total = measure("shared", corpus, shared=True)
+    assert tree_total == shared_total
+    print(f"node reduction: {shared_nodes / tree_nodes:.1%} of the nodes remain "
+          f"({tree_nodes / shared_nodes:.2f}x fewer)")
+
+
+if __name__ == "__main__":
+    main()
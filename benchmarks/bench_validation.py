@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Throughput of is_valid_expression on invalid input, with and without a print() per failure.
+
+"before" replays the old behaviour: the same validation followed by print(error) to stdout.
+stdout is replaced by a line buffered pipe that another thread drains, like the log pipe of
+a container with PYTHONUNBUFFERED set, so every print is a write system call.
+"after" is the current is_valid_expression, which only logs at DEBUG level (disabled by default).
+Both are measured from one thread and from several threads at once, which share the stdout lock.
+
+Run from the repository root:
+    python -m benchmarks.bench_validation
+"""
+
+import contextlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from lexer import validate
+from operators import is_valid_expression
+
+INVALID = ["3++4", "+3", "3+", "(3+4", "3+4)", "()", "(3+)", "(3)(4)", "3 4", "1+.5", "3.4.5+6", "2*x$", ""]
+
+
+def legacy_is_valid_expression(expression: str) -> bool:
+    """ is_valid_expression as it was, printing the reason of every failure """
+    error = validate(expression)
+    if error is not None:
+        print(error)
+        return False
+    return True
+
+
+def run(function, count: int):
+    """ Validate count invalid expressions """
+    for i in range(count):
+        function(INVALID[i % len(INVALID)])
+
+
+def throughput(function, count: int, threads: int) -> float:
+    """ Invalid expressions validated per second, split over the given number of threads """
+    start = time.perf_counter()
+    if threads == 1:
+        run(function, count)
+    else:
+        with ThreadPoolExecutor(threads) as pool:
+            for future in [pool.submit(run, function, count // threads) for _ in range(threads)]:
+                future.result()
+    return count / (time.perf_counter() - start)
+
+
+def drain(fd: int):
+    """ Read and discard everything written to the pipe, like a log collector """
+    while os.read(fd, 65536):
+        pass
+
+
+def main():
+    count = 200_000
+    results = []
+    read_fd, write_fd = os.pipe()
+    reader = threading.Thread(target=drain, args=(read_fd,), daemon=True)
+    reader.start()
+    with open(write_fd, "w", buffering=1) as pipe, contextlib.redirect_stdout(pipe):
+        for threads in (1, 4):
+            before = max(throughput(legacy_is_valid_expression, count, threads) for _ in range(3))
+            after = max(throughput(is_valid_expression, count, threads) for _ in range(3))
+            results.append((threads, before, after))
+    reader.join()
+    os.close(read_fd)
+    for threads, before, after in results:
+        print(f"{threads} thread(s)  before {before / 1e3:8.1f} K/s  after {after / 1e3:8.1f} K/s"
+              f"  speedup {after / before:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# A bounded, thread safe LRU (least recently used) cache.
+# Used to remember the parse results of expressions that are seen over and over again,
+# see Parser.cached() in index.py and the /parse endpoint of the API.
+
+# LRUCache
+# ----------
+# Attributes:
+# - maxsize (int): Maximum number of entries, the least recently used entry is evicted
+#   when a new one would exceed it. 0 disables the cache (nothing is stored).
+# - ttl (float): Seconds an entry stays valid after it was stored, None for no expiry.
+# - hits, misses, evictions, expirations (int): Counters since the cache was created.
+# All methods take a lock, so one cache can be shared by every thread of a threadpool.
+
+import time
+from collections import OrderedDict
+from threading import Lock
+
+
+class LRUCache:
+    """
+        A thread safe least recently used cache with an optional time to live.
+        eg. cache = LRUCache(maxsize=2)
+            cache.put("3+4", 7.0)
+            cache.get("3+4") -> 7.0
+            cache.get("1+1") -> None
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = None, clock=time.monotonic):
+        """
+            Initialize an empty cache.
+            clock returns the current time in seconds, it only needs replacing in tests.
+        """
+        if maxsize < 0:
+            raise ValueError("maxsize must not be negative")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be positive (or None for no expiry)")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.__clock = clock
+        # key -> (expiry time or None, value), the most recently used entry is last
+        self.__entries : OrderedDict = OrderedDict()
+        self.__lock = Lock()
+
+    def get(self, key, default=None):
+        """
+            Get the value stored for key and mark it as most recently used.
+            Returns default if there is no entry or it has expired.
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires is None or self.__clock() < expires:
+                    self.__entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.__entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """
+            Store value for key, evicting the least recently used entries if the cache is full.
+        """
+        if self.maxsize == 0:
+            return
+        expires = None if self.ttl is None else self.__clock() + self.ttl
+        with self.__lock:
+            self.__entries[key] = (expires, value)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.maxsize:
+                self.__entries.popitem(last=False)
+                self.evictions += 1
+
+    def __contains__(self, key) -> bool:
+        """
+            Check if there is a valid entry for key, without counting a hit or a miss
+            or changing the order of the entries.
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            return entry is not None and (entry[0] is None or self.__clock() < entry[0])
+
+    def pop(self, key, default=None):
+        """
+            Remove the entry of key and return its value, or default if there is none.
+            Expired entries give default, the counters are not changed.
+        """
+        with self.__lock:
+            entry = self.__entries.pop(key, None)
+            if entry is None or (entry[0] is not None and self.__clock() >= entry[0]):
+                return default
+            return entry[1]
+
+    def __len__(self) -> int:
+        """ Number of stored entries (expired entries are only dropped when they are looked up) """
+        with self.__lock:
+            return len(self.__entries)
+
+    def items(self) -> list:
+        """
+            The (key, value) pairs of the valid entries, least recently used first,
+            without counting hits or changing the order.
+        """
+        with self.__lock:
+            now = self.__clock() if self.ttl is not None else None
+            return [(key, value) for key, (expires, value) in self.__entries.items()
+                    if expires is None or now < expires]
+
+    def clear(self):
+        """ Remove every entry, the counters are kept """
+        with self.__lock:
+            self.__entries.clear()
+
+    def stats(self) -> dict:
+        """
+            The size, limits and counters of the cache
+            eg. {'size': 2, 'maxsize': 1024, 'ttl': None, 'hits': 5, 'misses': 2, 'evictions': 0, 'expirations': 0}
+        """
+        with self.__lock:
+            return {
+                'size': len(self.__entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# Command line interface, `bodmas eval` evaluates a file (or stdin) of expressions in bulk:
+#     python cli.py eval expressions.txt -o results.txt
+#     python cli.py eval data.csv --column formula --workers 8
+#     cat requests.jsonl | python cli.py eval --format jsonl --field expression --output-format jsonl
+#
+# Input formats (--format, guessed from the file extension by default)
+# - lines: One expression per line, blank lines are skipped.
+# - csv: One expression per row in --column, a column name (the first row is then the header)
+#        or a 0 based index (the first column by default, there is no header).
+# - jsonl: One JSON object per line with the expression in --field ("expression" by default),
+#          or a JSON string per line, like the /parse/stream endpoint of the API.
+#
+# Output formats (--output-format), one line per expression in input order
+# - text: "3+4<TAB>7.0", or "1/0<TAB>error: division_by_zero: Division by zero".
+# - jsonl: {"expression": "3+4", "valid": true, "result": 7.0}, or
+#          {"expression": "1/0", "valid": false, "error": {"code": ..., "message": ..., "offset": ...}}.
+#
+# Expressions are read lazily and sent in chunks of --chunk-size to --workers processes,
+# with at most 2 chunks per worker in flight, so memory stays bounded for any input size.
+# Every worker keeps an LRU cache of results and can serve expressions from a store (--store, see store.py).
+# The number of expressions and the throughput are reported on stderr at the end (unless --quiet).
+
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, Optional, TextIO
+
+from cache import LRUCache
+from index import Parser
+from store import ExpressionStore, StoredError, describe_error
+
+INPUT_FORMATS = ("lines", "csv", "jsonl")
+OUTPUT_FORMATS = ("text", "jsonl")
+EXTENSIONS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+# Chunks in flight per worker process: one being evaluated and one waiting
+CHUNKS_PER_WORKER = 2
+
+INVALID_LINE = StoredError('invalid_line', 'Invalid line. Expected {"expression": "..."} or a JSON string.')
+
+# Results cache and store of the current process, set by init_worker()
+worker_cache = LRUCache(maxsize=4096)
+worker_store = None  # type: Optional[ExpressionStore]
+
+
+# Input readers, they yield the expressions of a file one at a time (None for a line without one)
+def read_lines(file: TextIO) -> Iterator[str]:
+    """ The non blank lines of file, eg. "3+4\\n\\n5*6\\n" -> "3+4", "5*6" """
+    for line in file:
+        line = line.strip()
+        if line:
+            yield line
+
+
+def read_csv(file: TextIO, column: Optional[str] = None) -> Iterator[str]:
+    """
+        The column of every row of a CSV file, the first column by default.
+        column is a 0 based index, or the name of a column of the header (the first row).
+        Rows without that column give an empty expression (reported as empty_expression).
+        Raises ValueError if the header has no column of that name.
+    """
+    reader = csv.reader(file)
+    if column is None or column.isdigit():
+        index = int(column or 0)
+    else:
+        header = next(reader, [])
+        if column not in header:
+            raise ValueError(f"No column {column!r} in the CSV header {header}")
+        index = header.index(column)
+    for row in reader:
+        if row:
+            yield row[index] if index < len(row) else ""
+
+
+def read_jsonl(file: TextIO, field: str = "expression") -> Iterator[Optional[str]]:
+    """
+        The field of every JSON object of a JSON Lines file, a line can also be a JSON string.
+        Blank lines are skipped, lines without an expression give None (reported as invalid_line).
+    """
+    for line in file:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            item = None
+        if isinstance(item, dict):
+            item = item.get(field)
+        yield item if isinstance(item, str) else None
+
+
+def init_worker(store_path: Optional[str] = None):
+    """ Open the store of the current process (called once in every worker process) """
+    global worker_store
+    worker_store = ExpressionStore(store_path) if store_path else None
+
+
+def evaluate_chunk(expressions: list, output_format: str = "text") -> tuple[str, int, int]:
+    """
+        Evaluate a chunk of expressions in the current process.
+        Returns (the output lines, the number of expressions, the number of valid expressions).
+    """
+    lines : list[str] = []
+    valid = 0
+    for expression in expressions:
+        error = INVALID_LINE if expression is None else None
+        if error is None:
+            try:
+                result = Parser.cached(expression, worker_cache, with_tree=False, store=worker_store).result
+                valid += 1
+            except (ArithmeticError, ValueError) as e:
+                error = describe_error(e)
+        if output_format == "jsonl":
+            if error is None:
+                # Like the API, results that are not finite (inf, nan) are written as null
+                item = {"expression": expression, "valid": True, "result": result if math.isfinite(result) else None}
+            else:
+                item = {"expression": expression, "valid": False, "error": error._asdict()}
+            lines.append(json.dumps(item))
+        elif error is None:
+            lines.append(f"{expression}\t{result!r}")
+        else:
+            lines.append(f"{expression}\terror: {error.code}: {error.message}")
+    return "".join(line + "\n" for line in lines), len(expressions), valid
+
+
+def evaluate_chunks(expressions: Iterable, workers: int, chunk_size: int, output_format: str = "text",
+                    store_path: Optional[str] = None) -> Iterator[tuple[str, int, int]]:
+    """
+        Evaluate the expressions in chunks of chunk_size, in workers processes (in this process if workers is 0),
+        and yield the evaluate_chunk() results in input order.
+        Only workers * CHUNKS_PER_WORKER chunks are read ahead, the next chunk is read when the oldest one is done.
+    """
+    source = iter(expressions)
+    chunks = iter(lambda: list(islice(source, chunk_size)), [])
+    if workers <= 0:
+        init_worker(store_path)
+        for chunk in chunks:
+            yield evaluate_chunk(chunk, output_format)
+        return
+
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(store_path,))
+    try:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(evaluate_chunk, chunk, output_format))
+            if len(pending) >= workers * CHUNKS_PER_WORKER:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def open_input(path: str, input_format: str) -> TextIO:
+    """ The file at path, or stdin for '-' """
+    if path == "-":
+        return sys.stdin
+    return open(path, encoding="utf-8", newline="" if input_format == "csv" else None)
+
+
+def read_expressions(file: TextIO, input_format: str, column: Optional[str], field: str) -> Iterator[Optional[str]]:
+    """ The expressions of an input file in the given format """
+    if input_format == "csv":
+        return read_csv(file, column)
+    if input_format == "jsonl":
+        return read_jsonl(file, field)
+    return read_lines(file)
+
+
+def build_argument_parser() -> argparse.ArgumentParser:
+    """ The parser of the command line arguments """
+    parser = argparse.ArgumentParser(prog="bodmas", description="BodmasParser command line interface")
+    commands = parser.add_subparsers(dest="command", required=True)
+    evaluate = commands.add_parser("eval", help="evaluate a file of expressions",
+                                   description="Evaluate the expressions of a file (or stdin) in bulk, "
+                                               "with one result per expression in input order.")
+    evaluate.add_argument("input", nargs="?", default="-", help="file of expressions, - (the default) for stdin")
+    evaluate.add_argument("-o", "--output", default="-", help="file for the results, - (the default) for stdout")
+    evaluate.add_argument("-f", "--format", choices=INPUT_FORMATS,
+                          help="input format, guessed from the file extension (.csv, .jsonl) by default, else lines")
+    evaluate.add_argument("--column", help="CSV column of the expressions, a header name or a 0 based index (default 0)")
+    evaluate.add_argument("--field", default="expression", help="JSONL field of the expressions (default expression)")
+    evaluate.add_argument("--output-format", choices=OUTPUT_FORMATS, default="text", help="output format (default text)")
+    evaluate.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1,
+                          help="worker processes, 0 evaluates in this process (default: the number of CPUs)")
+    evaluate.add_argument("--chunk-size", type=int, default=1000, help="expressions per chunk sent to a worker (default 1000)")
+    evaluate.add_argument("--store", help="store of expressions to use (see store.py)")
+    evaluate.add_argument("-q", "--quiet", action="store_true", help="do not report the throughput on stderr")
+    return parser
+
+
+def run_eval(arguments: argparse.Namespace) -> int:
+    """ The eval command, returns the exit status """
+    input_format = arguments.format or EXTENSIONS.get(os.path.splitext(arguments.input)[1].lower(), "lines")
+    if arguments.chunk_size < 1:
+        raise ValueError("--chunk-size must be at least 1")
+    if arguments.store:
+        # Fail now rather than in every worker
+        ExpressionStore(arguments.store).close()
+
+    start = time.perf_counter()
+    count = valid = 0
+    source = open_input(arguments.input, input_format)
+    output = sys.stdout if arguments.output == "-" else open(arguments.output, "w", encoding="utf-8")
+    try:
+        expressions = read_expressions(source, input_format, arguments.column, arguments.field)
+        for text, chunk_count, chunk_valid in evaluate_chunks(expressions, arguments.workers, arguments.chunk_size,
+                                                               arguments.output_format, arguments.store):
+            output.write(text)
+            count += chunk_count
+            valid += chunk_valid
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+        else:
+            output.flush()
+
+    if not arguments.quiet:
+        elapsed = time.perf_counter() - start
+        rate = count / elapsed if elapsed > 0 else 0.0
+        print(f"{count} expressions ({valid} valid, {count - valid} invalid) in {elapsed:.2f} s, "
+              f"{rate:,.0f} expressions/s", file=sys.stderr)
+    return 0
+
+
+def main(argv: list[str] = None) -> int:
+    """ Run the command line, eg. main(["eval", "expressions.txt"]), and return the exit status """
+    arguments = build_argument_parser().parse_args(argv)
+    try:
+        return run_eval(arguments)
+    except (OSError, ValueError) as error:
+        print(f"bodmas: error: {error}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
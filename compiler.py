@@ -0,0 +1,118 @@
+# Compiles a parse tree into a plain Python function, so an expression that is evaluated
+# many times does not pay for walking the tree on every evaluation.
+
+# The generated source is in "one assignment per operator" form, in post-order:
+#   "(3+4)*5"  ->  def compiled():
+#                      t0 = 3.0 + 4.0
+#                      t1 = t0 * 5.0
+#                      return t1
+# Nothing is nested, so trees of any depth compile without hitting the parser's nesting limits.
+# Variables become positional parameters prefixed with v_ (so names like 'in' or 't0' are safe):
+#   "a*x+1"    ->  def compiled(v_a, v_x):
+#                      t0 = v_a * v_x
+#                      t1 = t0 + 1.0
+#                      return t1
+# A shared node of a DAG (ParseTree(postfix, shared=True)) is assigned once and its name reused:
+#   "(a+b)*(a+b)"  ->  t0 = v_a + v_b
+#                      t1 = t0 * t0
+# The +, -, * and / operators of the registry are emitted as native Python arithmetic,
+# any other registered operator (including ^, whose overflow and domain checks are in
+# operators.guarded_power) is called through its function, eg. t0 = op_4(v_x, 2.0).
+
+import math
+from functools import lru_cache
+from operator import add, sub, mul, truediv, pow as power
+
+from operators import operators, registry
+
+# Registry functions that can be written as a native Python operator
+NATIVE_OPERATORS = {
+    add: '+',
+    sub: '-',
+    mul: '*',
+    truediv: '/',
+    power: '**',
+}
+
+
+def generate_source(root, variables: list[str] = ()) -> str:
+    """
+        Generate the source of a function named `compiled` that evaluates the tree starting at root.
+        root is a ParseNode (or None for an empty tree),
+        variables are the names of the positional parameters of the function, in order.
+    """
+    parameters = ", ".join(f"v_{name}" for name in variables)
+    lines : list[str] = [f"def compiled({parameters}):"]
+    if root is None:
+        lines.append("    return 0.0")
+        return "\n".join(lines) + "\n"
+
+    # Operand text (a literal or a temporary name) of every node already generated, by id(node)
+    names : dict[int, str] = {}
+    count = 0
+    stack : list = [(root, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if not children_done and id(node) in names:
+            # A shared node of a DAG that is already generated
+            continue
+        if node.is_variable:
+            names[id(node)] = f"v_{node.value}"
+        elif not node.is_operator:
+            names[id(node)] = _literal(node.number)
+        elif children_done:
+            left = names[id(node.left)]
+            right = names[id(node.right)]
+            spec = registry.get(node.value)
+            native = NATIVE_OPERATORS.get(spec.function)
+            temp = f"t{count}"
+            count += 1
+            if native:
+                lines.append(f"    {temp} = {left} {native} {right}")
+            else:
+                lines.append(f"    {temp} = op_{operators.index(node.value)}({left}, {right})")
+            names[id(node)] = temp
+        else:
+            if node.left is None or node.right is None:
+                raise ValueError("Invalid parse tree: operator node must have both left and right children.")
+            stack.append((node, True))
+            stack.append((node.right, False))
+            stack.append((node.left, False))
+
+    lines.append(f"    return {names[id(root)]}")
+    return "\n".join(lines) + "\n"
+
+
+def compile_tree(root, variables: list[str] = ()):
+    """
+        Compile the tree starting at root into a function taking the variables as positional arguments
+        and returning the result.
+        Identical sources share the same function object (see compile_source).
+    """
+    functions = tuple(registry.get(symbol).function for symbol in operators)
+    return compile_source(generate_source(root, variables), functions)
+
+
+@lru_cache(maxsize=1024)
+def compile_source(source: str, functions: tuple):
+    """
+        Turn generated source into a function.
+        functions are the registry functions by opcode, available to the source as op_0, op_1, ...
+        Results are cached, so repeated expressions (and re-registered operators) are handled correctly.
+    """
+    namespace = {f"op_{index}": function for index, function in enumerate(functions)}
+    namespace["inf"] = math.inf
+    namespace["nan"] = math.nan
+    exec(compile(source, "<bodmas-compiled>", "exec"), namespace)
+    return namespace["compiled"]
+
+
+def _literal(value: float) -> str:
+    """ Python literal for an operand, eg. 3.0 -> '3.0', -2.0 -> '(-2.0)', infinity -> 'inf' """
+    if math.isnan(value):
+        return "nan"
+    if math.isinf(value):
+        return "inf" if value > 0 else "(-inf)"
+    if value < 0 or (value == 0 and math.copysign(1.0, value) < 0):
+        return f"({value!r})"
+    return repr(value)
@@ -0,0 +1,215 @@
+# Estimates how expensive an expression is before it is evaluated,
+# so that oversized or overflowing expressions can be rejected without evaluating them.
+
+# Cost
+# ----------
+# Attributes:
+# - nodes (int): Number of nodes of the parse tree (operands and operators), ie. len(postfix).
+# - depth (int): Depth of the parse tree, a single operand has depth 1.
+# - magnitude (float): Estimated upper bound of log10 of the largest absolute value computed
+#   while evaluating, eg. 400 for "10^400". Powers are what make it large: for x^y it is
+#   log10|x| * y (using upper bounds of |x| and of y), so "10^(10^10)" has magnitude 1e10.
+#   Subexpressions without variables are computed exactly (unless they overflow), so
+#   "10^(400-400)" has magnitude 1 and "2^(0-1100)" magnitude 0.
+#   Otherwise the positive and negative parts of every value are bounded separately, so an exponent
+#   that cannot be positive (eg. "x^(0-400)") does not make a power large.
+#   Numbers below 1 count as 1 and variables count as 1 (of either sign), so a variable base
+#   below 1 with a negative exponent and divisions by small numbers are not taken into account.
+# - value (float or None): The value of an expression without variables, computed exactly while
+#   estimating it (so it does not need to be evaluated again), None if it is not known (eg. with
+#   variables, or operators registered later).
+
+# Estimate
+# ----------
+# The Cost of a subexpression (nodes, depth, magnitude) with the bounds of its positive and negative parts
+# and its exact value when it is known. estimate_operand() and estimate_operator() build them bottom up,
+# so a tree that caches the Estimate of its subtrees (eg. incremental.EditSession) re-estimates only what changed.
+
+# CostLimits
+# ----------
+# Attributes:
+# - max_nodes, max_depth (int or None): Largest allowed node count and depth, None for no limit.
+# - max_magnitude (float or None): Magnitudes from this one up are rejected, by default the float range (about 308),
+#   so expressions whose result certainly overflows are rejected before they are evaluated.
+
+import math
+from typing import NamedTuple
+
+from operator import add, sub, mul, truediv
+from operators import registry, guarded_power, MAX_LOG10
+
+# Magnitude of a value that does not fit in a float, any estimate above MAX_LOG10 behaves the same
+INFINITE = math.inf
+# Bound of the positive (or negative) part of a value that is never positive (or negative)
+NONE = -math.inf
+
+# Operators whose constant subexpressions are computed exactly, they are cheap and have no side effects
+EXACT_FUNCTIONS = (add, sub, mul, truediv, guarded_power)
+
+
+class Cost(NamedTuple):
+    """ Size and numeric magnitude of an expression, see estimate_cost() """
+    nodes: int
+    depth: int
+    magnitude: float
+    value: float = None
+
+
+class Estimate(NamedTuple):
+    """
+        Cost of a subexpression, with what is needed to estimate the operators applied to it
+        (see estimate_operand() and estimate_operator())
+    """
+    nodes: int
+    depth: int
+    magnitude: float
+    positive: float  # log10 of an upper bound of its positive part
+    negative: float  # log10 of an upper bound of its negative part
+    value: float  # its exact value, None if it is not known
+
+    def cost(self) -> Cost:
+        return Cost(self.nodes, self.depth, self.magnitude, self.value)
+
+
+# Builds an Estimate from a tuple of its fields, without the argument handling of Estimate()
+_new_estimate = Estimate._make
+
+
+class CostLimits(NamedTuple):
+    """ Limits for check_cost(), None disables a limit """
+    max_nodes: int = 1_000_000
+    max_depth: int = 100_000
+    max_magnitude: float = MAX_LOG10
+
+
+class CostLimitExceeded(ValueError):
+    """ Raised by check_cost() when an expression is over one of the limits """
+
+    def __init__(self, message: str, cost: Cost):
+        super().__init__(message)
+        self.cost = cost
+
+    def __reduce__(self):
+        # Pickled with its own arguments, eg. to be sent back from a worker process (see offload.py)
+        return type(self), (str(self), self.cost)
+
+
+def estimate_cost(postfix: list[str]) -> Cost:
+    """
+        Estimate the cost of evaluating a postfix expression in one pass, without evaluating it
+        (only its constant subexpressions that cannot overflow are computed).
+        eg. estimate_cost(['10', '10', '10', '^', '^']) -> Cost(nodes=5, depth=3, magnitude=1e10, value=None)
+        Raises ValueError if the postfix expression is malformed.
+    """
+    stack : list[Estimate] = []  # of the pending operands
+    for token in postfix:
+        spec = registry.get(token)
+        if spec is not None:
+            if len(stack) < 2:
+                raise ValueError("Invalid postfix expression: operator without two operands.")
+            right = stack.pop()
+            stack.append(estimate_operator(spec, stack.pop(), right))
+        else:
+            stack.append(estimate_operand(token))
+    if len(stack) > 1:
+        raise ValueError("Invalid postfix expression: operands without operator.")
+    return stack[0].cost() if stack else Cost(0, 0, 0.0)
+
+
+def estimate_operand(token: str) -> Estimate:
+    """ Estimate of a number or variable token """
+    if token[0].isdigit():
+        value = float(token)
+        positive, negative = _bounds(value)
+        return Estimate(1, 1, max(positive, negative, 0.0), positive, negative, value)
+    # A variable, its value is not known yet
+    return Estimate(1, 1, 0.0, 0.0, 0.0, None)
+
+
+def estimate_operator(spec, left: Estimate, right: Estimate) -> Estimate:
+    """ Estimate of left op right, from the estimates of its operands (spec is the OperatorSpec of op) """
+    positive, negative, value = _combine(spec, left, right)
+    left_nodes, left_depth, left_magnitude = left[:3]
+    right_nodes, right_depth, right_magnitude = right[:3]
+    return _new_estimate((left_nodes + right_nodes + 1, max(left_depth, right_depth) + 1,
+                          max(left_magnitude, right_magnitude, positive, negative), positive, negative, value))
+
+
+def check_cost(cost: Cost, limits: CostLimits = CostLimits()) -> Cost:
+    """
+        Check a cost against the limits.
+        Returns the cost, raises CostLimitExceeded (a ValueError) describing the first limit exceeded.
+    """
+    if limits.max_nodes is not None and cost.nodes > limits.max_nodes:
+        raise CostLimitExceeded(f"Expression too large: {cost.nodes} nodes (limit {limits.max_nodes}).", cost)
+    if limits.max_depth is not None and cost.depth > limits.max_depth:
+        raise CostLimitExceeded(f"Expression too deeply nested: depth {cost.depth} (limit {limits.max_depth}).", cost)
+    # A value of magnitude MAX_LOG10 (2^1024) already overflows, so the magnitude limit is exclusive
+    if limits.max_magnitude is not None and cost.magnitude >= limits.max_magnitude:
+        raise CostLimitExceeded(f"Result too large: values up to about 10^{cost.magnitude:.6g} "
+                                f"(limit 10^{limits.max_magnitude:.6g}).", cost)
+    return cost
+
+
+def _bounds(value: float) -> tuple[float, float]:
+    """ Bounds of the positive and negative parts of a known value (below 1 counts as 1) """
+    log = math.log10(max(abs(value), 1.0))
+    return (log if value > 0 else NONE), (log if value < 0 else NONE)
+
+
+def _combine(spec, left: Estimate, right: Estimate) -> tuple[float, float, float]:
+    """
+        (positive part bound, negative part bound, exact value or None) of left op right
+    """
+    _, _, _, left_positive, left_negative, left_value = left
+    _, _, _, right_positive, right_negative, right_value = right
+    if left_value is not None and right_value is not None and spec.function in EXACT_FUNCTIONS:
+        try:
+            value = spec.function(left_value, right_value)
+        except OverflowError:
+            # A power too large to compute, its magnitude is known
+            magnitude = right_value * math.log10(abs(left_value)) if spec.function is guarded_power else INFINITE
+            return magnitude, (magnitude if left_value < 0 else NONE), None
+        except (ArithmeticError, ValueError):
+            # Evaluating the expression fails anyway (eg. division by zero), it does not grow
+            return left_positive, left_negative, None
+        if not math.isfinite(value):
+            return INFINITE, INFINITE, None
+        return (*_bounds(value), value)
+
+    operator = spec.symbol
+    if operator == '^':
+        # |x^y| <= max(|x|, 1)^y, and y is at most 10^right_positive, or at most 0
+        base = max(left_positive, left_negative)
+        if base <= 0.0 or right_positive == NONE:
+            magnitude = 0.0
+        elif right_positive > MAX_LOG10:
+            magnitude = INFINITE
+        else:
+            magnitude = base * 10.0 ** right_positive
+        # A power is only negative when its base is
+        return magnitude, (magnitude if left_negative != NONE else NONE), None
+    if operator == '*':
+        return (max(_product(left_positive, right_positive), _product(left_negative, right_negative)),
+                max(_product(left_positive, right_negative), _product(left_negative, right_positive)), None)
+    if operator == '+':
+        return _sum(left_positive, right_positive), _sum(left_negative, right_negative), None
+    if operator == '-':
+        return _sum(left_positive, right_negative), _sum(left_negative, right_positive), None
+    # Division (and operators registered later) are assumed not to grow their left operand,
+    # its sign is not known
+    bound = max(left_positive, left_negative)
+    return bound, bound, None
+
+
+def _product(left: float, right: float) -> float:
+    """ log10 bound of a product of parts bounded by left and right """
+    return NONE if NONE in (left, right) else left + right
+
+
+def _sum(left: float, right: float) -> float:
+    """ log10(10^left + 10^right) without computing the (possibly huge) powers """
+    if NONE in (left, right):
+        return max(left, right)
+    high, low = max(left, right), min(left, right)
+    return high + math.log10(1.0 + 10.0 ** (low - high)) if high != INFINITE else INFINITE
@@ -1,12 +1,19 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
 import sys
 import os
 import json
-import re
+import math
+import asyncio
+import time
+import threading
 import dotenv
-from typing import Dict, List, Union, Optional
+import uuid
+from concurrent.futures import Future, wait
+from typing import Any, Dict, List, Tuple, Union, Optional
 
 # Add the parent directory to the Python path to import from the root directory
 parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -15,8 +22,15 @@ sys.path.append(parent_dir)
 # Load environment variables from config.env
 dotenv.load_dotenv(os.path.join(parent_dir, "config.env"))
 
-from index import Parser
-from operators import is_valid_expression, valid_parentheses
+from index import Parser, ParseResult
+from cache import LRUCache
+from cost import CostLimits, CostLimitExceeded, Cost, check_cost
+from lexer import normalize, validate
+from operators import operators, MAX_LOG10
+from metrics import MetricsRegistry, instrument, timed
+from incremental import EditSession
+from offload import OffloadPool, WorkerLost, evaluate_offloaded
+from store import ExpressionStore, StoredExpression, write_store, describe_error
 
 app = FastAPI(
     title="BodmasParser API",
@@ -40,7 +54,7 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=allowed_origins,
     allow_credentials=True,
-    allow_methods=["GET", "POST"],  # Only allow GET and POST
+    allow_methods=["GET", "POST", "DELETE"],  # DELETE only closes edit sessions
     allow_headers=["*"],  # Allows all headers
     expose_headers=["*"]  # Expose all headers
 )
@@ -48,139 +62,661 @@ app.add_middleware(
 class Expression(BaseModel):
     expression: str
 
+class ErrorDetail(BaseModel):
+    code: str  # eg. "consecutive_operators", "division_by_zero", "cost_limit_exceeded"
+    message: str
+    offset: Optional[int] = None  # position of the problem in input_expression, when known
+
 class ParseResponse(BaseModel):
-    postfix: List[str]
-    parse_tree: Dict
-    result: float
+    # postfix, parse_tree and result are left out of the response when not selected with ?fields=
+    postfix: List[str] = None
+    parse_tree: Union[Dict, str] = None  # a single operand expression eg. "7" has the tree "7"
+    result: Optional[float] = None  # null when the result is not finite
     input_expression: str
     valid: bool
     error: Optional[str] = None
+    error_detail: Optional[ErrorDetail] = None
+
+class SessionRequest(BaseModel):
+    expression: str
+    bindings: Dict[str, float] = {}
+
+class EditRequest(BaseModel):
+    offset: int  # position of the edit in the current expression
+    deleted: int = 0  # number of characters removed at offset
+    inserted: str = ""  # text inserted at offset
+
+class SessionResponse(BaseModel):
+    session_id: str
+    version: int  # number of edits applied
+    expression: Optional[str] = None  # only when the session is created or read, not after edits
+    result: Optional[float] = None  # null when the result is not finite or the expression is invalid
+    valid: bool
+    error: Optional[str] = None
+    error_detail: Optional[ErrorDetail] = None
+
+class BatchRequest(BaseModel):
+    # Items that are not strings are reported one by one (invalid_item) instead of failing the batch
+    expressions: List[Any]
+
+class BatchResponse(BaseModel):
+    results: List[ParseResponse]
+    count: int
+    valid_count: int
+
+# Upper bound on the number of expressions accepted by /parse/batch
+max_batch_size = int(os.getenv("MAX_BATCH_SIZE", 10000))
+
+# Upper bound on the length of one line of a /parse/stream request body, in bytes
+max_stream_line_length = int(os.getenv("MAX_STREAM_LINE_LENGTH", 1024 * 1024))
+
+# Parse results of recently seen expressions, shared by all threads of the worker
+# CACHE_SIZE=0 disables the cache, CACHE_TTL is in seconds (0 means entries never expire)
+cache_ttl = float(os.getenv("CACHE_TTL", 0))
+parse_cache = LRUCache(maxsize=int(os.getenv("CACHE_SIZE", 4096)), ttl=cache_ttl or None)
+
+# Persistent store of parsed and evaluated expressions (see store.py), empty STORE_PATH disables it.
+# The store is opened (memory mapped) at startup when the file exists, expressions missing from
+# the parse cache are looked up in it, and the parse cache is added to it when the server stops
+store_path = os.getenv("STORE_PATH", "")
+expression_store = ExpressionStore(store_path) if store_path and os.path.exists(store_path) else None
+store_lock = threading.Lock()
+
+# Fields of a ParseResponse that can be selected with ?fields=, eg. ?fields=result
+RESPONSE_FIELDS = ("postfix", "parse_tree", "result")
+
+def select_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    """
+    Parse the comma separated ?fields= query parameter, all fields are returned when it is missing
+    """
+    if fields is None:
+        return RESPONSE_FIELDS
+    selected = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = selected.difference(RESPONSE_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown field(s): {', '.join(sorted(unknown))}. Choose from {', '.join(RESPONSE_FIELDS)}")
+    return tuple(field for field in RESPONSE_FIELDS if field in selected)
+
+# Edit sessions by id, with a lock each, see /sessions. Sessions unused for SESSION_TTL seconds are dropped
+sessions = LRUCache(maxsize=int(os.getenv("SESSION_LIMIT", 1000)), ttl=float(os.getenv("SESSION_TTL", 600)))
+
+# Evaluation budget, expressions over it are rejected before they are evaluated (see cost.py)
+# MAX_MAGNITUDE is log10 of the largest value an expression may compute, by default the float range
+cost_limits = CostLimits(
+    max_nodes=int(os.getenv("MAX_NODES", 1_000_000)),
+    max_depth=int(os.getenv("MAX_DEPTH", 100_000)),
+    max_magnitude=float(os.getenv("MAX_MAGNITUDE", MAX_LOG10))
+)
+
+# Expressions at least this long, or with at least this many exponentiations, are parsed and evaluated
+# in a separate process so they cannot hold the GIL and stall the other requests of the worker
+offload_min_length = int(os.getenv("OFFLOAD_MIN_LENGTH", 10000))
+offload_min_powers = int(os.getenv("OFFLOAD_MIN_POWERS", 64))
+
+# Number of processes evaluating offloaded expressions, 0 evaluates them in the worker's threads instead
+process_pool_workers = int(os.getenv("PROCESS_POOL_WORKERS", os.cpu_count() or 1))
+
+# Seconds an offloaded expression may take, its process is stopped when it takes longer
+request_timeout = float(os.getenv("REQUEST_TIMEOUT", 5))
+
+# The process pool is created on the first offloaded expression, a process is replaced after a timeout
+process_pool = None
+process_pool_lock = threading.Lock()
+
+# Metrics exposed at GET /metrics, METRICS_ENABLED=false removes all instrumentation
+metrics_enabled = os.getenv("METRICS_ENABLED", "true").lower() in ("true", "1", "yes")
+metrics_registry = MetricsRegistry() if metrics_enabled else None
+
+if metrics_registry is not None:
+    # Times Parser and ParseTree stages (see metrics.py), only in this process (not in the process pool)
+    stage_duration = instrument(metrics_registry)
+    request_counter = metrics_registry.counter(
+        "bodmas_requests_total", "Requests by endpoint", ("endpoint",))
+    request_duration = metrics_registry.histogram(
+        "bodmas_request_duration_seconds", "Request latency by endpoint", ("endpoint",))
+    expression_counter = metrics_registry.counter(
+        "bodmas_expressions_total", "Expressions evaluated, by validity", ("valid",))
+    error_counter = metrics_registry.counter(
+        "bodmas_errors_total", "Invalid expressions by error code", ("code",))
+    expression_length = metrics_registry.histogram(
+        "bodmas_expression_length_chars", "Length of the evaluated expressions in characters",
+        buckets=(10, 100, 1000, 10000, 100000, 1000000))
+
+    @metrics_registry.collector
+    def cache_metrics() -> List[str]:
+        """
+        Counters of the parse cache, which are kept by the cache itself
+        """
+        stats = parse_cache.stats()
+        lines = []
+        for name in ("hits", "misses", "evictions", "expirations"):
+            lines.append(f"# HELP bodmas_cache_{name}_total Parse cache {name}")
+            lines.append(f"# TYPE bodmas_cache_{name}_total counter")
+            lines.append(f"bodmas_cache_{name}_total {stats[name]}")
+        lines.append("# HELP bodmas_cache_entries Entries in the parse cache")
+        lines.append("# TYPE bodmas_cache_entries gauge")
+        lines.append(f"bodmas_cache_entries {stats['size']}")
+        return lines
+
+def record_outcome(expression: str, outcome: Union[ParseResult, ParseResponse]):
+    """
+    Count an evaluated expression in the metrics
+    """
+    if metrics_registry is None:
+        return
+    expression_length.observe(len(expression))
+    if isinstance(outcome, ParseResult):
+        expression_counter.inc(valid="true")
+    else:
+        expression_counter.inc(valid="false")
+        error_counter.inc(code=outcome.error_detail.code)
+
+def record_request(endpoint: str, start: float):
+    """
+    Count a request and its latency (start is its time.perf_counter()) in the metrics
+    """
+    if metrics_registry is None:
+        return
+    request_counter.inc(endpoint=endpoint)
+    request_duration.observe(time.perf_counter() - start, endpoint=endpoint)
+
+def invalid_response(expression: str, error: str, code: str, offset: Optional[int] = None) -> ParseResponse:
+    """
+    Build the response for an expression that could not be parsed or evaluated
+    """
+    return ParseResponse(
+        postfix=[],
+        parse_tree={},
+        result=0.0,
+        input_expression=expression,
+        valid=False,
+        error=error,
+        error_detail=ErrorDetail(code=code, message=error, offset=offset)
+    )
+
+def evaluate_expression(expression: str, with_tree: bool = True,
+                        cache: LRUCache = parse_cache) -> Union[ParseResult, ParseResponse]:
+    """
+    Validate, parse and evaluate one stripped expression.
+    Returns the (cached) ParseResult of a valid expression, or the response with valid=False
+    and the reason in error and error_detail for an invalid one. Unexpected errors are raised.
+    The parse tree is only built when with_tree is True.
+    """
+    try:
+        # Reject oversized expressions before doing any work on them
+        check_size(expression)
+
+        # Parse and evaluate the expression, or reuse the result of an earlier request.
+        # The expression is validated once, by the tokenizer while it is parsed
+        return Parser.cached(expression, cache, with_tree=with_tree, limits=cost_limits, store=expression_store)
+    except (ArithmeticError, ValueError) as e:
+        # eg. lexer errors, cost limits, unbound variables or division by zero
+        error = describe_error(e)
+        return invalid_response(expression, error.message, error.code, error.offset)
+
+def check_size(expression: str):
+    """
+    Reject expressions that certainly have too many nodes before they are parsed (or offloaded).
+    Every operator character is a node with two operands, so there are at least 2 * operators + 1 nodes.
+    Raises CostLimitExceeded.
+    """
+    if len(expression) <= cost_limits.max_nodes:
+        # Nodes are never more than characters
+        return
+    nodes = 2 * sum(expression.count(symbol) for symbol in operators) + 1
+    if nodes > cost_limits.max_nodes:
+        raise CostLimitExceeded(f"Expression too large: at least {nodes} nodes (limit {cost_limits.max_nodes}).",
+                                Cost(nodes, 0, 0.0))
+
+class EvaluationTimeout(Exception):
+    """ Raised when an offloaded expression takes longer than request_timeout """
+
+def should_offload(expression: str) -> bool:
+    """
+    Check if an expression is large or complex enough to be evaluated in the process pool
+    """
+    if len(expression) < offload_min_length and expression.count("^") < offload_min_powers:
+        return False
+    # Oversized expressions are rejected inline, there is no need to offload them
+    try:
+        check_size(expression)
+    except CostLimitExceeded:
+        return False
+    key = normalize(expression)
+    return key not in parse_cache and (expression_store is None or key not in expression_store)
+
+def get_process_pool() -> OffloadPool:
+    """
+    The process pool for offloaded expressions, created on first use (see offload.py).
+    Its processes are spawned rather than forked, so they do not inherit locks held by other threads.
+    """
+    global process_pool
+    with process_pool_lock:
+        if process_pool is None:
+            process_pool = OffloadPool(process_pool_workers)
+        return process_pool
+
+def offloaded_outcome(expression: str, future: Union[Future, asyncio.Future]) -> Union[ParseResult, ParseResponse]:
+    """
+    The outcome of an expression evaluated in the process pool (a done future), like evaluate_expression.
+    The worker raises the errors of the expression, valid results are cached in this process.
+    """
+    try:
+        result = future.result()
+    except (ArithmeticError, ValueError) as e:
+        error = describe_error(e)
+        return invalid_response(expression, error.message, error.code, error.offset)
+    parse_cache.put(normalize(expression), result)
+    return result
+
+def evaluate_in_pool(expression: str, with_tree: bool) -> Union[ParseResult, ParseResponse]:
+    """
+    evaluate_expression, run in the process pool when the expression should be offloaded.
+    Blocks the calling thread, use evaluate_in_pool_async on the event loop.
+    Raises EvaluationTimeout if the expression takes longer than request_timeout,
+    WorkerLost if its process stopped for another reason (the expression can be sent again).
+    """
+    if process_pool_workers <= 0 or not should_offload(expression):
+        return evaluate_expression(expression, with_tree)
+    pool = get_process_pool()
+    future = pool.submit(evaluate_offloaded, expression, with_tree, cost_limits)
+    if not wait([future], timeout=request_timeout).done:
+        # Only the process running this expression is stopped
+        pool.stop(future)
+        raise EvaluationTimeout(f"Evaluation timed out after {request_timeout:g} seconds")
+    return offloaded_outcome(expression, future)
+
+async def evaluate_in_pool_async(expression: str, with_tree: bool) -> Union[ParseResult, ParseResponse]:
+    """
+    evaluate_in_pool for the event loop: small expressions are evaluated inline,
+    offloaded expressions are awaited without blocking other requests.
+    """
+    if not should_offload(expression):
+        return evaluate_expression(expression, with_tree)
+    try:
+        if process_pool_workers <= 0:
+            # Without a process pool a thread is used, it keeps running after a timeout
+            return await asyncio.wait_for(run_in_threadpool(evaluate_expression, expression, with_tree), request_timeout)
+        pool = get_process_pool()
+        future = pool.submit(evaluate_offloaded, expression, with_tree, cost_limits)
+        awaited = asyncio.wrap_future(future)
+        done, _ = await asyncio.wait([awaited], timeout=request_timeout)
+        if not done:
+            # Only the process running this expression is stopped
+            pool.stop(future)
+            awaited.cancel()
+            raise asyncio.TimeoutError
+        return offloaded_outcome(expression, awaited)
+    except asyncio.TimeoutError:
+        raise EvaluationTimeout(f"Evaluation timed out after {request_timeout:g} seconds") from None
+
+def encode_response(expression: str, outcome: Union[ParseResult, ParseResponse],
+                    fields: Tuple[str, ...] = RESPONSE_FIELDS) -> str:
+    """
+    Encode the result of evaluate_expression as the JSON of a ParseResponse with the selected fields.
+    The parse tree of a valid expression was serialized once when it was cached
+    and is copied into the response as it is, instead of being converted back and forth.
+    """
+    if isinstance(outcome, ParseResponse):
+        return outcome.model_dump_json(exclude=set(RESPONSE_FIELDS).difference(fields))
+    parts = ["{"]
+    if "postfix" in fields:
+        parts.append('"postfix":' + json.dumps(outcome.postfix, separators=(",", ":")) + ",")
+    if "parse_tree" in fields:
+        parts.append('"parse_tree":' + outcome.parse_tree_json + ",")
+    if "result" in fields:
+        # Like pydantic, write results that are not finite (inf, nan) as null
+        result = json.dumps(outcome.result) if math.isfinite(outcome.result) else "null"
+        parts.append('"result":' + result + ",")
+    parts.append('"input_expression":' + json.dumps(expression) + ',"valid":true,"error":null,"error_detail":null}')
+    return "".join(parts)
+
+if metrics_registry is not None:
+    encode_response = timed(encode_response, stage_duration, "encode")
+
+def evaluate_item(expression: str, fields: Tuple[str, ...] = RESPONSE_FIELDS) -> Tuple[str, bool]:
+    """
+    Evaluate one item of a batch or stream.
+    Returns the encoded ParseResponse and whether the expression was valid,
+    unexpected errors only fail this item
+    """
+    expression = expression.strip()
+    try:
+        outcome = evaluate_in_pool(expression, with_tree="parse_tree" in fields)
+    except EvaluationTimeout as e:
+        outcome = invalid_response(expression, str(e), "timeout")
+    except WorkerLost as e:
+        outcome = invalid_response(expression, str(e), "worker_lost")
+    except Exception as e:
+        outcome = invalid_response(expression, str(e), "internal_error")
+    record_outcome(expression, outcome)
+    return encode_response(expression, outcome, fields), isinstance(outcome, ParseResult)
+
+@app.on_event("startup")
+def start_process_pool():
+    """
+    Start the process pool for offloaded expressions with the server
+    """
+    if process_pool_workers > 0:
+        get_process_pool()
+
+@app.on_event("shutdown")
+def shutdown_process_pool():
+    """
+    Stop the process pool with the server
+    """
+    global process_pool
+    with process_pool_lock:
+        pool, process_pool = process_pool, None
+    if pool is not None:
+        pool.shutdown()
+
+@app.on_event("shutdown")
+def save_store():
+    """
+    Add the parse cache to the persistent store when the server stops
+    """
+    if store_path:
+        save_parse_cache()
+
+def save_parse_cache() -> int:
+    """
+    Write the entries of the current store and of the parse cache to a new store at STORE_PATH,
+    then use the new store. Returns the number of expressions in the store.
+    """
+    global expression_store
+    with store_lock:
+        entries = list(expression_store.items()) if expression_store is not None else []
+        entries.extend((key, StoredExpression(result.postfix, result.result)) for key, result in parse_cache.items())
+        count = write_store(store_path, entries)
+        # The previous store is unmapped when the requests still reading it are done with it
+        expression_store = ExpressionStore(store_path)
+        return count
 
-@app.post("/parse", response_model=ParseResponse)
-def parse_expression(req: Expression):
+@app.post("/parse", response_model=ParseResponse, response_model_exclude_unset=True)
+async def parse_expression(req: Expression, fields: Optional[str] = None):
     """
     Parse and evaluate a mathematical expression
+    fields selects the parts of the response, eg. ?fields=result (default: postfix,parse_tree,result),
+    the parse tree is not built unless it is selected.
+    Small expressions are evaluated inline, large ones in the process pool (see should_offload).
+    The response is sent as pre-encoded JSON, see encode_response
     """
+    start = time.perf_counter()
+    selected = select_fields(fields)
+    expression = req.expression.strip()
     try:
-        # Validate the expression first and provide specific error messages
-        expression = req.expression.strip()
-        
-        # Check for empty expression
-        if not expression:
-            return ParseResponse(
-                postfix=[],
-                parse_tree={},
-                result=0.0,
-                input_expression=expression,
-                valid=False,
-                error="Expression cannot be empty"
-            )
-            
-        # Check for valid characters
-        if not re.match(r'^[0-9+\-*/^(). ]+$', expression):
-            return ParseResponse(
-                postfix=[],
-                parse_tree={},
-                result=0.0,
-                input_expression=expression,
-                valid=False,
-                error="Invalid characters in expression. Only +, -, *, /, ^, decimal numbers and () are allowed."
-            )
-            
-        # Check for consecutive operators
-        if re.search(r'[+\-*/^]{2,}', expression):
-            return ParseResponse(
-                postfix=[],
-                parse_tree={},
-                result=0.0,
-                input_expression=expression,
-                valid=False,
-                error="Invalid expression. Consecutive operators are not allowed."
-            )
-            
-        # Check for balanced parentheses
-        if not valid_parentheses(expression):
-            return ParseResponse(
-                postfix=[],
-                parse_tree={},
-                result=0.0,
-                input_expression=expression,
-                valid=False,
-                error="Invalid expression. Parentheses are not balanced."
-            )
-            
-        # Check for leading/trailing operators
-        if re.match(r'^[+\-*/^]', expression) or re.search(r'[+\-*/^]$', expression):
-            return ParseResponse(
-                postfix=[],
-                parse_tree={},
-                result=0.0,
-                input_expression=expression,
-                valid=False,
-                error="Invalid expression. Expression cannot start or end with an operator."
-            )
-            
-        # Check for invalid decimal numbers
-        tokens = re.sub(r'[+\-*/^()]', ' ', expression).split()
-        for token in tokens:
-            try:
-                float(token)
-            except ValueError:
-                return ParseResponse(
-                    postfix=[],
-                    parse_tree={},
-                    result=0.0,
-                    input_expression=expression,
-                    valid=False,
-                    error=f"Invalid number in expression: {token}. Please use valid decimal numbers."
-                )
-        
-        # If we got here, the expression is valid, so parse it
-        parser = Parser(expression)
-        
-        # Get the parse tree as a dictionary
-        parse_tree = json.loads(str(parser.parsetree))
-        
-        # Return the response
-        return ParseResponse(
-            postfix=parser.postfix,
-            parse_tree=parse_tree,
-            result=parser.evaluate(),
-            input_expression=expression,
-            valid=True,
-            error=None
-        )
-    except ValueError as e:
-        return ParseResponse(
-            postfix=[],
-            parse_tree={},
-            result=0.0,
-            input_expression=expression,
-            valid=False,
-            error=str(e)
-        )
-    except ZeroDivisionError:
-        return ParseResponse(
-            postfix=[],
-            parse_tree={},
-            result=0.0,
-            input_expression=expression,
-            valid=False,
-            error="Division by zero"
-        )
+        outcome = await evaluate_in_pool_async(expression, with_tree="parse_tree" in selected)
+    except EvaluationTimeout as e:
+        record_outcome(expression, invalid_response(expression, str(e), "timeout"))
+        raise HTTPException(status_code=504, detail=str(e))
+    except WorkerLost as e:
+        # The expression was not evaluated, it can be sent again
+        record_outcome(expression, invalid_response(expression, str(e), "worker_lost"))
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
+        record_outcome(expression, invalid_response(expression, str(e), "internal_error"))
         raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        record_request("/parse", start)
+    record_outcome(expression, outcome)
+    return Response(content=encode_response(expression, outcome, selected), media_type="application/json")
+
+@app.post("/parse/batch", response_model=BatchResponse, response_model_exclude_unset=True)
+def parse_batch(req: BatchRequest, fields: Optional[str] = None):
+    """
+    Parse and evaluate many expressions in one request.
+    Results are returned in input order, an invalid expression only fails its own item.
+    fields selects the parts of every result, as for /parse.
+    """
+    if len(req.expressions) > max_batch_size:
+        raise HTTPException(status_code=413, detail=f"Too many expressions in batch (maximum {max_batch_size})")
+
+    start = time.perf_counter()
+    selected = select_fields(fields)
+    items = [evaluate_item(expression, selected) if isinstance(expression, str) else invalid_item(expression, selected)
+             for expression in req.expressions]
+    results = [content for content, _ in items]
+    valid_count = sum(1 for _, valid in items if valid)
+
+    # Join the pre-encoded results instead of validating and serializing a BatchResponse model
+    content = '{"results":[' + ",".join(results) + '],"count":' + str(len(results)) + ',"valid_count":' + str(valid_count) + '}'
+    record_request("/parse/batch", start)
+    return Response(content=content, media_type="application/json")
+
+def invalid_item(item: Any, fields: Tuple[str, ...] = RESPONSE_FIELDS) -> Tuple[str, bool]:
+    """
+    The encoded response for a batch item that is not a string, eg. null or 3
+    """
+    expression = json.dumps(item)[:100]
+    return encode_response(expression, invalid_response(
+        expression, "Invalid item. Expected an expression string.", "invalid_item"), fields), False
+
+def evaluate_ndjson_lines(lines: List[Optional[bytes]], fields: Tuple[str, ...] = RESPONSE_FIELDS) -> bytes:
+    """
+    Evaluate NDJSON lines of a /parse/stream request.
+    Each line is either {"expression": "3+4"} or a plain JSON string "3+4".
+    Returns one NDJSON line (with the selected fields of ParseResponse) per non-empty input line.
+    """
+    output = []
+    for line in lines:
+        if line is None:
+            # Placeholder for a line longer than max_stream_line_length
+            output.append(encode_response("", invalid_response("", f"Line too long (maximum {max_stream_line_length} bytes)", "line_too_long"), fields))
+            output.append("\n")
+            continue
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            item = None
+        if isinstance(item, dict):
+            item = item.get("expression")
+        if isinstance(item, str):
+            output.append(evaluate_item(item, fields)[0])
+        else:
+            expression = line[:100].decode("utf-8", "replace")
+            output.append(encode_response(expression, invalid_response(
+                expression, 'Invalid line. Expected {"expression": "..."} or a JSON string.', "invalid_line"), fields))
+        output.append("\n")
+    return "".join(output).encode("utf-8")
+
+async def stream_results(request: Request, fields: Tuple[str, ...]):
+    """
+    Read the request body chunk by chunk and yield the results of the complete lines of each chunk.
+    Only one chunk and one partial line are held in memory, and the next chunk is only read
+    once the previous results have been sent, so a slow client slows down the reading (backpressure).
+    """
+    start = time.perf_counter()
+    pending = b""  # the incomplete last line of the data read so far
+    skipping = False  # True while reading the rest of a line that was too long
+    try:
+        async for chunk in request.stream():
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            if skipping:
+                if lines:
+                    # The first line is the end of the line that was too long
+                    lines.pop(0)
+                    skipping = False
+                else:
+                    pending = b""
+            # Complete lines of this chunk that are too long are reported like a long pending line
+            lines = [None if len(line) > max_stream_line_length else line for line in lines]
+            if len(pending) > max_stream_line_length:
+                # Report the line once and drop the rest of it instead of buffering it
+                lines.append(None)
+                pending = b""
+                skipping = True
+            if lines:
+                # Evaluation is CPU bound, keep it off the event loop
+                yield await run_in_threadpool(evaluate_ndjson_lines, lines, fields)
+        if pending:
+            yield await run_in_threadpool(evaluate_ndjson_lines, [pending], fields)
+    finally:
+        record_request("/parse/stream", start)
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    A StreamingResponse whose body generator may still be reading the request body.
+    StreamingResponse listens for the client disconnecting on the same receive channel,
+    which would swallow the request body, here a disconnect surfaces from request.stream() instead.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+@app.post("/parse/stream")
+async def parse_stream(request: Request, fields: Optional[str] = None):
+    """
+    Parse and evaluate an NDJSON stream of expressions.
+    The request body has one expression per line ({"expression": "3+4"} or "3+4"),
+    the response streams one ParseResponse JSON object per line, in input order.
+    fields selects the parts of every result, as for /parse.
+    """
+    return DuplexStreamingResponse(stream_results(request, select_fields(fields)), media_type="application/x-ndjson")
+
+@app.get("/cache")
+def cache_stats():
+    """
+    Size, limits and hit/miss/eviction counters of the parse cache
+    """
+    return parse_cache.stats()
+
+@app.post("/cache/clear")
+def clear_cache():
+    """
+    Remove every entry from the parse cache, the counters are kept
+    """
+    parse_cache.clear()
+    return parse_cache.stats()
+
+@app.get("/store")
+def store_info():
+    """
+    Path and number of expressions of the persistent store
+    """
+    if not store_path:
+        raise HTTPException(status_code=404, detail="The persistent store is disabled (STORE_PATH is not set)")
+    store = expression_store
+    return {"path": store_path, "size": len(store) if store is not None else 0}
+
+@app.post("/store/save")
+def save_to_store():
+    """
+    Add the parse cache to the persistent store now rather than when the server stops
+    """
+    if not store_path:
+        raise HTTPException(status_code=404, detail="The persistent store is disabled (STORE_PATH is not set)")
+    return {"path": store_path, "size": save_parse_cache()}
+
+def session_response(session_id: str, session: EditSession, with_expression: bool = False) -> SessionResponse:
+    """
+    Evaluate an edit session (only the parts changed since the last evaluation) and describe it
+    """
+    response = SessionResponse(session_id=session_id, version=session.version, valid=True)
+    if with_expression:
+        response.expression = session.expression
+    try:
+        # The cost is estimated incrementally like the value, only for the parts changed by the last edits
+        check_cost(session.cost(), cost_limits)
+        result = session.evaluate()
+        response.result = result if math.isfinite(result) else None
+        return response
+    except (ArithmeticError, ValueError) as e:
+        error = describe_error(e)
+    response.valid = False
+    response.error = error.message
+    response.error_detail = ErrorDetail(code=error.code, message=error.message, offset=error.offset)
+    return response
+
+def get_session(session_id: str) -> Tuple[EditSession, threading.Lock]:
+    """
+    The session and its lock, raises 404 for an unknown or expired session
+    """
+    entry = sessions.get(session_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired session: {session_id}")
+    return entry
+
+@app.post("/sessions", response_model=SessionResponse, response_model_exclude_unset=True)
+def create_session(req: SessionRequest):
+    """
+    Start an edit session on an expression, which is then changed with /sessions/{session_id}/edits.
+    Expressions that certainly have too many nodes are rejected with 413 before they are parsed.
+    """
+    try:
+        check_size(req.expression)
+    except CostLimitExceeded as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    session_id = uuid.uuid4().hex
+    session = EditSession(req.expression, req.bindings)
+    lock = threading.Lock()
+    with lock:
+        sessions.put(session_id, (session, lock))
+        return session_response(session_id, session, with_expression=True)
+
+@app.post("/sessions/{session_id}/edits", response_model=SessionResponse, response_model_exclude_unset=True)
+def edit_session(session_id: str, req: EditRequest):
+    """
+    Apply an edit (replace `deleted` characters at `offset` with `inserted`) and evaluate again.
+    Only the edited part of the expression is parsed and evaluated again, so the time taken
+    does not grow with the length of the expression.
+    """
+    start = time.perf_counter()
+    session, lock = get_session(session_id)
+    with lock:
+        try:
+            session.edit(req.offset, req.deleted, req.inserted)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        # Storing it again restarts the time to live
+        sessions.put(session_id, (session, lock))
+        response = session_response(session_id, session)
+    record_request("/sessions/edits", start)
+    return response
+
+@app.get("/sessions/{session_id}", response_model=SessionResponse, response_model_exclude_unset=True)
+def read_session(session_id: str):
+    """
+    The current expression and result of an edit session
+    """
+    session, lock = get_session(session_id)
+    with lock:
+        return session_response(session_id, session, with_expression=True)
+
+@app.delete("/sessions/{session_id}")
+def close_session(session_id: str):
+    """
+    End an edit session
+    """
+    if sessions.pop(session_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired session: {session_id}")
+    return {"closed": session_id}
+
+@app.get("/metrics")
+def metrics():
+    """
+    Request, expression, error, cache and per stage latency metrics in the Prometheus text format
+    """
+    if metrics_registry is None:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (METRICS_ENABLED=false)")
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/validate/{expression}")
 def validate_expression(expression: str):
     """
     Validate a mathematical expression
+    Invalid expressions also get the error with its code, message and offset
     """
-    try:
-        is_valid = is_valid_expression(expression)
-        return {"valid": is_valid}
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    error = validate(expression)
+    if error is None:
+        return {"valid": True}
+    return {"valid": False, "error": error.to_dict()}
 
 @app.get("/", tags=["Root"])
 def read_root():
@@ -197,6 +733,46 @@ def read_root():
                 "method": "POST",
                 "description": "Parse and evaluate a mathematical expression"
             },
+            {
+                "path": "/parse/batch",
+                "method": "POST",
+                "description": "Parse and evaluate a list of expressions, results in input order"
+            },
+            {
+                "path": "/parse/stream",
+                "method": "POST",
+                "description": "Parse and evaluate an NDJSON stream of expressions, streams NDJSON results"
+            },
+            {
+                "path": "/cache",
+                "method": "GET",
+                "description": "Inspect the parse cache (size and hit/miss/eviction counters)"
+            },
+            {
+                "path": "/cache/clear",
+                "method": "POST",
+                "description": "Clear the parse cache"
+            },
+            {
+                "path": "/store",
+                "method": "GET",
+                "description": "Inspect the persistent store of parsed expressions (STORE_PATH)"
+            },
+            {
+                "path": "/store/save",
+                "method": "POST",
+                "description": "Add the parse cache to the persistent store"
+            },
+            {
+                "path": "/sessions",
+                "method": "POST",
+                "description": "Start an edit session, then POST /sessions/{session_id}/edits to re-evaluate after each edit"
+            },
+            {
+                "path": "/metrics",
+                "method": "GET",
+                "description": "Metrics in the Prometheus text format (requests, errors, cache, stage latencies)"
+            },
             {
                 "path": "/validate/{expression}",
                 "method": "GET",
@@ -70,6 +70,11 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
     
+    // Show the result while typing, only the edits are sent to the server
+    document.getElementById('expression-input').addEventListener('input', function() {
+        sendLiveEdit();
+    });
+    
     // Add event listener for pressing Enter in the input field
     document.getElementById('expression-input').addEventListener('keypress', function(e) {
         if (e.key === 'Enter') {
@@ -176,6 +181,79 @@ async function parseExpression() {
     }
 }
 
+// Live result while typing: the expression is held in an edit session on the server and only
+// the changed characters are sent, so the server re-evaluates just the edited part (see /sessions)
+let liveSession = null;  // {id, text}: the session and the expression the server holds
+let liveQueue = Promise.resolve();  // edits are sent one after the other, in order
+
+// The change from one text to the other as a single edit, eg. "3+4" -> "3+45" is {offset: 3, deleted: 0, inserted: "5"}
+function computeEdit(before, after) {
+    let start = 0;
+    while (start < before.length && start < after.length && before[start] === after[start]) {
+        start++;
+    }
+    let end = 0;
+    while (end < before.length - start && end < after.length - start &&
+           before[before.length - 1 - end] === after[after.length - 1 - end]) {
+        end++;
+    }
+    return { offset: start, deleted: before.length - start - end, inserted: after.slice(start, after.length - end) };
+}
+
+function sendLiveEdit() {
+    const text = document.getElementById('expression-input').value;
+    liveQueue = liveQueue.then(async () => {
+        const headers = { 'Content-Type': 'application/json' };
+        let response = null;
+        if (liveSession && liveSession.text !== text) {
+            response = await fetch(`${API_URL}/sessions/${liveSession.id}/edits`, {
+                method: 'POST',
+                headers,
+                body: JSON.stringify(computeEdit(liveSession.text, text))
+            });
+            if (response.status === 404) {
+                // The session expired, start a new one
+                liveSession = null;
+            }
+        }
+        if (!liveSession) {
+            response = await fetch(`${API_URL}/sessions`, {
+                method: 'POST',
+                headers,
+                body: JSON.stringify({ expression: text })
+            });
+        }
+        if (!response) {
+            return;  // nothing changed
+        }
+        if (!response.ok) {
+            throw new Error(`HTTP error! Status: ${response.status}`);
+        }
+        const data = await response.json();
+        liveSession = { id: data.session_id, text };
+        showLiveResult(data);
+    }).catch(error => {
+        liveSession = null;
+        updateDebugInfo(`Live result error: ${error.message}`);
+    });
+}
+
+// Show the result of an edit session, the parse tree is shown when the expression is parsed
+function showLiveResult(data) {
+    document.getElementById('result-section').style.display = 'flex';
+    const validationStatus = document.getElementById('validation-status');
+    const result = document.getElementById('result');
+    if (data.valid) {
+        validationStatus.innerHTML = '<span class="success">Valid expression</span>';
+        result.innerHTML = '<h3></h3>';
+        result.firstChild.textContent = `Result: ${data.result}`;
+    } else {
+        validationStatus.innerHTML = '<span class="error">Invalid expression</span>';
+        result.innerHTML = '<div class="error-details"><p></p></div>';
+        result.querySelector('p').textContent = data.error || 'Unknown error';
+    }
+}
+
 // Update debug info
 function updateDebugInfo(message) {
     const debugElement = document.getElementById('debug-info');
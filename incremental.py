@@ -0,0 +1,529 @@
+# Incremental re-evaluation of an expression that is edited a few characters at a time,
+# eg. while it is typed. See EditSession, and the /sessions endpoints of the API.
+
+# EditSession
+# ----------
+# Holds an expression, its parse tree and the value of every subtree between edits.
+# Attributes:
+# - expression (str): The current text of the expression.
+# - version (int): Number of edits applied so far.
+# - bindings (dict): Values of the variables of the expression.
+# Methods:
+# - edit(offset, deleted, inserted): Replaces `deleted` characters at `offset` with `inserted`.
+# - evaluate() -> float: The value of the expression, only the subtrees changed by edits are evaluated again.
+# - cost() -> Cost: The cost.Cost of the expression, the same as estimate_cost(postfix),
+#   only the subtrees changed by edits are estimated again.
+# - bind(**values): Sets variable values (every value is then evaluated again).
+# - error -> LexerError or None: Why the current expression is not valid.
+# - postfix -> List[str]: The postfix expression, the same as Parser(expression).postfix.
+#
+# An edit is applied with the cheapest of:
+# 1. Inside a number or variable (eg. typing a digit): only that operand is lexed again.
+# 2. An operator replaced by one of the same precedence and associativity (eg. + by -): only that node changes.
+# 3. Otherwise only the operands and operators around the edit are parsed again, within the innermost
+#    pair of parentheses around it (or the whole expression). The subtrees on either side of the edit are
+#    kept as they are, and the shunting-yard loop is run again over them and the new tokens, which
+#    rebuilds only the nodes between the edit and the top of that pair of parentheses (see __splice).
+#    Whether the new text is valid, and its first error, is found by lexing it together with the tokens
+#    just before and after it: the rest of the expression was valid and has not changed.
+# The whole expression is only parsed again when an edit adds or removes an unmatched parenthesis,
+# or when it has never been valid yet.
+# While the expression is not valid, the last valid tree is kept together with the part of the text that
+# changed since, so the edit that makes it valid again only parses that part.
+# Then the changed nodes and their ancestors forget their value, every other subtree keeps it.
+# So the work per keystroke depends on the depth of the edited node and the size of the part
+# parsed again, not on the length of the expression.
+# Nodes do not store their position, only their width, so edits never renumber the rest of the tree.
+#
+# An EditSession is not thread safe, callers that share one must hold a lock around its methods.
+
+from operators import registry, LEFT
+from lexer import iter_tokens, tokenize, is_variable, LexerError, LPAREN, RPAREN, OPERATOR, NUMBER, VARIABLE
+from parseTree import resolve_bindings
+from cost import Cost, Estimate, estimate_operand, estimate_operator
+
+# Kinds of _Node
+OPERAND = 'OPERAND'
+BINARY = 'BINARY'
+GROUP = 'GROUP'
+# Kind of the items of _build() that are a subtree which is already built
+SUBTREE = 'SUBTREE'
+
+
+class _Node:
+    """
+        A node of the tree of an EditSession.
+        An OPERAND holds a number or variable token, a BINARY node an operator with two children,
+        a GROUP node a pair of parentheses around its child (left).
+        width is the number of characters the node spans in the expression, from its first to its last
+        non space character. gaps are the spaces around the operator of a BINARY node, or after '('
+        and before ')' of a GROUP. value is the cached value of the subtree, None until it is evaluated,
+        and estimate its cached cost.Estimate, None until it is estimated.
+    """
+
+    __slots__ = ('kind', 'token', 'number', 'left', 'right', 'parent', 'width', 'gaps', 'value', 'estimate')
+
+    def __init__(self, kind: str, token: str, width: int, left: '_Node' = None, right: '_Node' = None,
+                 gaps: tuple = (0, 0)):
+        self.kind = kind
+        self.token = token
+        self.number = float(token) if kind == OPERAND and not is_variable(token) else None
+        self.left = left
+        self.right = right
+        self.parent = None  # type: _Node
+        self.width = width
+        self.gaps = gaps
+        self.value = None  # type: float
+        self.estimate = None  # type: Estimate
+        for child in (left, right):
+            if child is not None:
+                child.parent = self
+
+
+class EditSession:
+    """
+        An expression that is edited and evaluated again after every edit, eg.
+            session = EditSession("(3600*24)*7+x", {'x': 1})
+            session.evaluate() -> 604801.0
+            session.edit(12, 1, "10")     # "(3600*24)*7+10"
+            session.evaluate() -> 604810.0  (3600*24 and 86400*7 are not computed again)
+    """
+
+    def __init__(self, expression: str, bindings: dict = None):
+        """
+            Start a session on the expression, which does not have to be valid yet.
+            bindings maps variable names to their values.
+        """
+        self.expression = expression
+        self.version = 0
+        self.bindings = dict(bindings or {})
+        self.__root = None  # type: _Node
+        self.__lead = 0  # spaces before the root
+        self.__error = None  # type: LexerError
+        # While the expression is not valid the tree is the last valid one, and its characters start to end
+        # are now characters start to new_end of the expression: (start, end, new_end). None when it is valid
+        self.__pending = None  # type: tuple
+        self.__parse_all()
+
+    @property
+    def error(self) -> LexerError:
+        """ Why the expression is not valid, None if it is valid """
+        return self.__error
+
+    @property
+    def postfix(self) -> list[str]:
+        """
+            The postfix expression, eg. ['3', '4', '5', '*', '+'] for "3+4*5".
+            Raises LexerError if the expression is not valid.
+        """
+        if self.__error is not None:
+            raise self.__error
+        postfix : list[str] = []
+        stack : list[tuple[_Node, bool]] = [(self.__root, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if node.kind == OPERAND or children_done:
+                postfix.append(node.token)
+            elif node.kind == GROUP:
+                stack.append((node.left, False))
+            else:
+                stack.append((node, True))
+                stack.append((node.right, False))
+                stack.append((node.left, False))
+        return postfix
+
+    def edit(self, offset: int, deleted: int = 0, inserted: str = ""):
+        """
+            Replace the `deleted` characters starting at `offset` with `inserted`, eg. for "3+4"
+                edit(3, 0, "5")   typing 5 at the end: "3+45"
+                edit(1, 1, "*")   replacing + by *:    "3*4"
+                edit(0, 2, "")    deleting "3+":       "4"
+            The expression may become invalid (see error), the next edits can make it valid again.
+            Raises ValueError if the edit is outside the expression.
+        """
+        length = len(self.expression)
+        if offset < 0 or deleted < 0 or offset + deleted > length:
+            raise ValueError(f"Edit out of range: {deleted} character(s) at offset {offset} "
+                             f"of an expression of {length} characters.")
+        end = offset + deleted
+        self.expression = self.expression[:offset] + inserted + self.expression[end:]
+        self.version += 1
+        # The characters of the tree to replace, and the end of their replacement in the new expression
+        start, new_end = offset, offset + len(inserted)
+        if self.__pending is not None:
+            # Also replace what changed since the tree was valid
+            pending_start, pending_end, pending_new_end = self.__pending
+            start = min(offset, pending_start)
+            new_end = max(end, pending_new_end) + len(inserted) - deleted
+            end = pending_end + max(0, end - pending_new_end)
+        self.__error = None
+        if self.__root is None or not self.__apply(start, end, self.expression[start:new_end]):
+            self.__parse_all()
+        self.__pending = (start, end, new_end) if self.__error is not None and self.__root is not None else None
+
+    def evaluate(self) -> float:
+        """
+            The value of the expression. Subtrees that were not changed since they were last
+            evaluated are not evaluated again.
+            Raises LexerError if the expression is not valid, ValueError for a variable without a value,
+            and the errors of the operators (eg. ZeroDivisionError) like Parser.evaluate().
+        """
+        if self.__error is not None:
+            raise self.__error
+        return _evaluate(self.__root, self.bindings)
+
+    def cost(self) -> Cost:
+        """
+            The cost of evaluating the expression (see cost.estimate_cost()), to check against limits
+            before evaluate(). Subtrees that were not changed since they were last estimated are not
+            estimated again.
+            Raises LexerError if the expression is not valid.
+        """
+        if self.__error is not None:
+            raise self.__error
+        return _estimate(self.__root).cost()
+
+    def bind(self, **values):
+        """
+            Set the values of variables, eg. session.bind(x=2). The cached values are forgotten.
+        """
+        self.bindings.update(values)
+        stack : list[_Node] = [self.__root] if self.__root is not None else []
+        while stack:
+            node = stack.pop()
+            node.value = None
+            stack.extend(child for child in (node.left, node.right) if child is not None)
+
+    def __parse_all(self):
+        """ Parse the whole expression, keeping the error (and the last valid tree) if it is not valid """
+        try:
+            self.__root, self.__lead, _ = _parse(self.expression)
+            self.__error = None
+        except LexerError as error:
+            self.__error = error
+
+    def __apply(self, start: int, end: int, inserted: str) -> bool:
+        """
+            Update the tree for the edit of its characters start to end (already applied to self.expression),
+            or set the error of the new expression.
+            Returns False if the whole expression has to be parsed again.
+        """
+        # The innermost GROUP whose parentheses are around the edit, and its position
+        group, group_position = None, 0
+        node, position = self.__root, self.__lead
+
+        while start >= position and end <= position + node.width:
+            if node.kind == OPERAND:
+                if self.__edit_operand(node, start - position, end - position, inserted):
+                    return True
+                break
+            if node.kind == GROUP:
+                if start == position or end == position + node.width:
+                    # The edit touches a parenthesis
+                    break
+                group, group_position = node, position
+                node, position = node.left, position + 1 + node.gaps[0]
+                continue
+            # BINARY: left operand, spaces, operator, spaces, right operand
+            operator = position + node.left.width + node.gaps[0]
+            right = operator + 1 + node.gaps[1]
+            if end <= position + node.left.width:
+                node = node.left
+            elif start >= right:
+                node, position = node.right, right
+            elif start == operator and end == operator + 1 and self.__edit_operator(node, inserted):
+                return True
+            else:
+                break
+
+        return self.__splice(group, group_position, start, end, inserted)
+
+    def __splice(self, group: _Node, group_position: int, start: int, end: int, inserted: str) -> bool:
+        """
+            Parse again the operands and operators around the edit, inside group (the whole expression if None).
+            The tree is walked from the top of the group down to the edit. Every subtree on the way that is
+            entirely before the edit is kept with the operator after it, every subtree entirely after it
+            with the operator before it. A subtree only depends on its own tokens and the operators on
+            either side of it, so running the shunting-yard loop over these subtrees and the tokens of the
+            edited text gives the tree of the new expression, with new nodes only between the edit and the top.
+            Returns False if the edit adds or removes an unmatched parenthesis.
+        """
+        delta = len(inserted) - (end - start)
+        if group is None:
+            node, position = self.__root, self.__lead
+        else:
+            node, position = group.left, group_position + 1 + group.gaps[0]
+        # (subtree, its position, operator after it, the operator position) for the subtrees before the edit,
+        # and (operator, its position, subtree after it, the subtree position) after it, from the outside in
+        before : list[tuple] = []
+        after : list[tuple] = []
+        last = None  # the subtree the end of the edit is in, when it is not the one the start is in
+
+        while node.kind == BINARY:
+            operator = position + node.left.width + node.gaps[0]
+            right = operator + 1 + node.gaps[1]
+            if end <= position + node.left.width:
+                after.append((node.token, operator, node.right, right))
+                node = node.left
+            elif start >= right:
+                before.append((node.left, position, node.token, operator))
+                node, position = node.right, right
+            else:
+                # The operator is edited, the start is in the left operand and the end in the right one
+                last, last_position = node.right, right
+                node = node.left
+                break
+
+        # Down to the operand the start of the edit is in (or the last one before it)
+        while node.kind == BINARY:
+            operator = position + node.left.width + node.gaps[0]
+            right = operator + 1 + node.gaps[1]
+            if start < right:
+                node = node.left
+            else:
+                before.append((node.left, position, node.token, operator))
+                node, position = node.right, right
+        window_start, window_end = position, position + node.width
+        if last is not None:
+            # Down to the operand the end of the edit is in (or the first one after it)
+            inner : list[tuple] = []
+            while last.kind == BINARY:
+                operator = last_position + last.left.width + last.gaps[0]
+                right = operator + 1 + last.gaps[1]
+                if end <= last_position + last.left.width:
+                    inner.append((last.token, operator, last.right, right))
+                    last = last.left
+                else:
+                    last, last_position = last.right, right
+            after.extend(inner)
+            window_end = last_position + last.width
+        after.reverse()
+
+        # The characters parsed again, in the new expression
+        window_start, window_end = min(start, window_start), max(end, window_end) + delta
+        depth = 0
+        for char in self.expression[window_start:window_end]:
+            if char == '(':
+                depth += 1
+            elif char == ')':
+                depth -= 1
+                if depth < 0:
+                    return False
+        if depth:
+            return False
+
+        # Lex them with the token just before them ('(' or an operator, after a placeholder operand)
+        # and the one just after them (')' or an operator, before a placeholder operand)
+        prefix, suffix = "", ""
+        if before:
+            context_start, prefix = before[-1][3], "0"
+        else:
+            context_start = group_position if group is not None else 0
+        if after:
+            context_end, suffix = after[0][1] + delta + 1, "0"
+        else:
+            context_end = group_position + group.width + delta if group is not None else len(self.expression)
+        if group is not None and not before and after:
+            suffix += ")"
+        elif group is not None and before and not after:
+            prefix = "(" + prefix
+        shift = context_start - len(prefix)
+        tokens : list[tuple] = []
+        try:
+            for token in iter_tokens(prefix + self.expression[context_start:context_end] + suffix):
+                offset = token.offset + shift
+                if window_start <= offset < window_end:
+                    tokens.append((token.type, token.value, offset))
+        except LexerError as error:
+            # The first error of the new expression, the rest of it is the same as in the last valid one
+            self.__error = LexerError(error.message, error.offset + shift, error.code)
+            return True
+
+        items : list[tuple] = []
+        for subtree, subtree_position, operator, operator_position in before:
+            items.append((SUBTREE, subtree, subtree_position))
+            items.append((OPERATOR, operator, operator_position))
+        items.extend(tokens)
+        for operator, operator_position, subtree, subtree_position in after:
+            items.append((OPERATOR, operator, operator_position + delta))
+            items.append((SUBTREE, subtree, subtree_position + delta))
+        root, root_start, root_end = _build(items)
+
+        if group is None:
+            root.parent = None
+            self.__root, self.__lead = root, root_start
+        else:
+            group.left = root
+            root.parent = group
+            closing = group_position + group.width + delta - 1
+            group.gaps = (root_start - group_position - 1, closing - root_end)
+            group.width += delta
+            _changed(group, delta)
+        return True
+
+    def __edit_operand(self, node: _Node, start: int, end: int, inserted: str) -> bool:
+        """
+            Apply an edit within an operand (positions relative to the operand).
+            Returns False if the result is not a single number or variable.
+        """
+        text = node.token[:start] + inserted + node.token[end:]
+        try:
+            tokens = tokenize(text)
+        except LexerError:
+            return False
+        if len(tokens) != 1 or tokens[0].type not in (NUMBER, VARIABLE) or tokens[0].value != text:
+            return False
+        node.token = text
+        node.number = None if is_variable(text) else float(text)
+        delta = len(text) - node.width
+        node.width = len(text)
+        _changed(node, delta)
+        return True
+
+    def __edit_operator(self, node: _Node, inserted: str) -> bool:
+        """
+            Replace the operator of a BINARY node, if the new one binds the same way.
+            Returns False if the tree would have a different shape.
+        """
+        spec, current = registry.get(inserted), registry.get(node.token)
+        if spec is None or (spec.precedence, spec.associativity) != (current.precedence, current.associativity):
+            return False
+        node.token = inserted
+        _changed(node, 0)
+        return True
+
+
+# Helper function to forget the values that depend on a changed node
+def _changed(node: _Node, delta: int):
+    """
+        Clear the cached value and estimate of node and its ancestors, and add delta to the width of the ancestors.
+    """
+    node.value = node.estimate = None
+    while node.parent is not None:
+        node = node.parent
+        node.value = node.estimate = None
+        node.width += delta
+
+
+# Helper function to build the tree of an expression
+def _parse(text: str) -> tuple:
+    """
+        Parse text into a tree of _Node with the shunting-yard algorithm (the same tree shape as index.Parser).
+        Returns (root, spaces before the root, spaces after the root).
+        Raises LexerError if text is not a valid expression.
+    """
+    root, start, end = _build((token.type, token.value, token.offset) for token in iter_tokens(text))
+    return root, start, len(text) - end
+
+
+# Helper function for the shunting-yard loop of _parse() and EditSession.__splice()
+def _build(items) -> tuple:
+    """
+        Build a tree of _Node from the (type, value, offset) of valid tokens in order, where a value of type
+        SUBTREE is a _Node that is already built (used as an operand).
+        Returns (root, offset of its first character, offset after its last character).
+    """
+    operands : list[tuple[_Node, int, int]] = []  # (node, start, end) of the pending operands
+    pending : list[tuple] = []  # (OperatorSpec, offset) of the pending operators, (None, offset) for '('
+
+    def reduce():
+        spec, offset = pending.pop()
+        right, right_start, right_end = operands.pop()
+        left, left_start, left_end = operands.pop()
+        node = _Node(BINARY, spec.symbol, right_end - left_start, left, right,
+                     (offset - left_end, right_start - offset - 1))
+        operands.append((node, left_start, right_end))
+
+    for kind, value, offset in items:
+        if kind == LPAREN:
+            pending.append((None, offset))
+        elif kind == RPAREN:
+            while pending[-1][0] is not None:
+                reduce()
+            _, opening = pending.pop()
+            child, start, end = operands.pop()
+            node = _Node(GROUP, '()', offset + 1 - opening, child, None,
+                         (start - opening - 1, offset - end))
+            operands.append((node, opening, offset + 1))
+        elif kind == OPERATOR:
+            spec = registry.get(value)
+            while pending and pending[-1][0] is not None:
+                top = pending[-1][0]
+                if top.precedence > spec.precedence or (
+                        top.precedence == spec.precedence and spec.associativity == LEFT):
+                    reduce()
+                else:
+                    break
+            pending.append((spec, offset))
+        elif kind == SUBTREE:
+            operands.append((value, offset, offset + value.width))
+        else:
+            operands.append((_Node(OPERAND, value, len(value)), offset, offset + len(value)))
+
+    while pending:
+        reduce()
+    return operands.pop()
+
+
+# Helper function to evaluate a tree, reusing the cached values
+def _evaluate(root: _Node, bindings: dict) -> float:
+    """
+        Evaluate the tree with an explicit stack, only descending into nodes without a cached value.
+        The values computed are cached in the nodes.
+    """
+    get_spec = registry.get
+    values : list[float] = []
+    stack : list[tuple[_Node, bool]] = [(root, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if node.value is not None:
+            values.append(node.value)
+            continue
+        if node.kind == OPERAND:
+            value = node.number if node.number is not None else resolve_bindings([node.token], bindings)[node.token]
+        elif not children_done:
+            stack.append((node, True))
+            if node.kind == BINARY:
+                stack.append((node.right, False))
+            stack.append((node.left, False))
+            continue
+        elif node.kind == GROUP:
+            value = values.pop()
+        else:
+            right = values.pop()
+            left = values.pop()
+            value = get_spec(node.token).function(left, right)
+        node.value = value
+        values.append(value)
+    return values.pop()
+
+
+# Helper function to estimate the cost of a tree, reusing the cached estimates
+def _estimate(root: _Node) -> Estimate:
+    """
+        Estimate the tree like _evaluate(), caching the estimates in the nodes.
+    """
+    get_spec = registry.get
+    estimates : list[Estimate] = []
+    stack : list[tuple[_Node, bool]] = [(root, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if node.estimate is not None:
+            estimates.append(node.estimate)
+            continue
+        if node.kind == OPERAND:
+            estimate = estimate_operand(node.token)
+        elif not children_done:
+            stack.append((node, True))
+            if node.kind == BINARY:
+                stack.append((node.right, False))
+            stack.append((node.left, False))
+            continue
+        elif node.kind == GROUP:
+            estimate = estimates.pop()
+        else:
+            right = estimates.pop()
+            estimate = estimate_operator(get_spec(node.token), estimates.pop(), right)
+        node.estimate = estimate
+        estimates.append(estimate)
+    return estimates.pop()
@@ -1,96 +1,142 @@
-from operators import is_operator, get_precedence, is_valid_expression
-from parseTree import ParseTree
+from typing import NamedTuple
+
+from cache import LRUCache
+from cost import CostLimits, check_cost, estimate_cost
+from operators import registry, LEFT
+from lexer import iter_tokens, is_variable, normalize, LPAREN, RPAREN, OPERATOR
+from parseTree import ParseTree, evaluate_postfix, resolve_bindings
+
+
+class ParseResult(NamedTuple):
+    """ Everything Parser.cached() remembers about an expression """
+    postfix: tuple[str, ...]
+    result: float
+    # The parse tree serialized once as JSON, however often it is sent.
+    # None when the tree was not asked for (Parser.cached(..., with_tree=False))
+    parse_tree_json: str
+
+    @property
+    def parse_tree(self) -> dict:
+        """
+            The parse tree as nested dictionaries (ParseTree.to_dict()), built from the postfix expression
+            on each access, None when the tree was not asked for. Only its JSON is kept in the cache.
+        """
+        if self.parse_tree_json is None:
+            return None
+        return ParseTree(list(self.postfix)).to_dict()
+
+
+# Results of Parser.cached() keyed on the normalized expression, shared by all threads
+result_cache = LRUCache(maxsize=1024)
+
 
 class Parser:
     """ 
         A class to parse a mathematical expression.
         eg. "34 + 5 * 60 - 8/2"
-        It will be first converted to "34+5*60-8/2" by removing whitespace.
-        Then it will be converted to postfix expression.
+        It will be scanned once: the tokenizer in lexer.py validates the expression
+        and skips whitespace while the shunting-yard loop consumes its tokens,
+        converting it to postfix expression on the fly.
         The postfix expression will be a list of strings.
         eg. ['34', '5', '60', '*', '+', '8', '2', '/', '-']
-        Finally, it will create a parse tree from the postfix expression.
-        The parse tree will be used to evaluate the expression.
+        The postfix expression is evaluated directly on a value stack.
+        The parse tree is only created from the postfix expression when it is asked for
+        (parser.parsetree or get_parse_tree()), eg. for visualization.
+
+        Expressions may use variables, eg. "a*x^2+b*x+c". They are parsed once and
+        evaluated many times with parser.bind(a=1, b=2, c=3, x=0.5).
     """
 
     postfix : list[str] = []
-    parsetree : ParseTree = None
 
     def __init__(self, expression: str):
         """
             Initialize the Parser with a mathematical expression.
             The expression should be a valid infix expression.
-            It will be converted to postfix expression and a parse tree will be created.
+            It will be converted to postfix expression, the parse tree is created lazily.
+            Raises ValueError (lexer.LexerError) describing the first problem and its position
+            if the expression is not valid.
         """
-        if not is_valid_expression(expression):
-            raise ValueError("Invalid expression. Please provide a valid mathematical expression.")
-
-        # First remove any whitespace from the expression
-        self.expression = expression.replace(" ", "")
+        self.source = expression
 
-        # Convert the infix expression to postfix expression
+        # Validate, tokenize and convert the infix expression to postfix expression in one pass
         self.postfix = self.__infix_to_postfix()
 
-        # Create a parse tree from the postfix expression
-        self.parsetree = ParseTree(self.postfix)
+        # The parse tree is created from the postfix expression on first use
+        self.__parsetree = None
+
+    @property
+    def parsetree(self) -> ParseTree:
+        """
+            The parse tree of the expression, created from the postfix expression on first access.
+        """
+        if self.__parsetree is None:
+            self.__parsetree = ParseTree(self.postfix)
+        return self.__parsetree
+
+    @property
+    def expression(self) -> str:
+        """
+            The expression without whitespace eg. "34+5*60-8/2"
+        """
+        return self.source.replace(" ", "")
 
     # Converting infix expression to postfix expression 
     def __infix_to_postfix(self) -> list[str]:
         """
             Convert the infix expression to postfix expression.
             Returns a list of strings representing the postfix expression.
+            The tokens are validated by lexer.iter_tokens as they are consumed,
+            so the first error (with its position) is raised from inside this loop.
             
-            This implementation handles parentheses and follows operator precedence:
+            This implementation handles parentheses and follows operator precedence
+            and associativity from operators.registry:
             - Parentheses have the highest precedence
             - Exponentiation (^) next
             - Multiplication and division (* and /)
             - Addition and subtraction (+ and -)
         """
-        stack : list[str] = []
+        # The stack holds the OperatorSpec of pending operators and None for an opening parenthesis
+        stack : list = []
         output : list[str] = []
+        get_spec = registry.get
 
-        # Split the expression using regex into tokens including parentheses
-        import re
-        tokens = re.findall(r'\d+\.\d+|\d+|[()+\-*/^]', self.expression)
-        # eg. tokens = ['34', '+', '5', '*', '60', '-', '8', '/', '2']
-        # or for expressions with parentheses: ['(', '3', '+', '4', ')', '*', '5']
+        # The tokens are produced lazily, eg. for "34+5*60"
+        # NUMBER '34', OPERATOR '+', NUMBER '5', OPERATOR '*', NUMBER '60'
+        for token in iter_tokens(self.source):
+            kind = token.type
 
-        for token in tokens:
-            if token == '':
-                continue  # Skip empty tokens
-            
-            if token == '(':
+            if kind == LPAREN:
                 # If token is an opening parenthesis, push it to the stack
-                stack.append(token)
-            elif token == ')':
+                stack.append(None)
+            elif kind == RPAREN:
                 # If token is a closing parenthesis, pop from the stack
                 # until an opening parenthesis is encountered
-                while stack and stack[-1] != '(':
-                    output.append(stack.pop())
+                while stack[-1] is not None:
+                    output.append(stack.pop().symbol)
                 
                 # Remove the opening parenthesis
-                if stack and stack[-1] == '(':
-                    stack.pop()
-                # Note: If stack is empty, there was a parentheses mismatch
-                # But this should be caught by is_valid_expression
-            elif is_operator(token):
-                # If the token is an operator
-                while (stack and stack[-1] != '(' and 
-                       get_precedence(stack[-1]) >= get_precedence(token)):
-                    output.append(stack.pop())
-                stack.append(token)
+                stack.pop()
+            elif kind == OPERATOR:
+                # If the token is an operator, pop the operators that bind tighter
+                # (or as tight, when the new operator is left associative)
+                spec = get_spec(token.value)
+                while stack and stack[-1] is not None:
+                    top = stack[-1]
+                    if top.precedence > spec.precedence or (
+                            top.precedence == spec.precedence and spec.associativity == LEFT):
+                        output.append(stack.pop().symbol)
+                    else:
+                        break
+                stack.append(spec)
             else:
-                # If the token is an operand (number)
-                output.append(token)
+                # If the token is an operand (number or variable)
+                output.append(token.value)
 
         # Pop all the remaining operators from the stack
+        # (the exhausted tokenizer guarantees the parentheses are balanced)
         while stack:
-            # If there's a parenthesis left, there was a mismatch
-            # This should be caught by is_valid_expression
-            if stack[-1] == '(' or stack[-1] == ')':
-                stack.pop()
-                continue
-            output.append(stack.pop())
+            output.append(stack.pop().symbol)
 
         return output
     
@@ -102,16 +148,92 @@ class Parser:
         """
         print(self.parsetree) # This will call the __str__ method of ParseTree class
 
+    @property
+    def variables(self) -> list[str]:
+        """
+            The variable names of the expression in order of first appearance,
+            eg. ['a', 'x', 'b', 'c'] for "a*x^2+b*x+c"
+        """
+        return list(dict.fromkeys(token for token in self.postfix if is_variable(token)))
+
+    # Compile the expression for repeated evaluation
+    def compiled(self):
+        """
+            Get the expression compiled into a Python function, see ParseTree.compile().
+            The function takes the values of parser.variables as positional arguments.
+            eg. Parser("3+4*5").compiled()() -> 23.0
+        """
+        return self.parsetree.compile()
+
     # A evaluate function to evaluate the expression
     def evaluate(self) -> float:
         """
-            Evaluate the expression represented by the parse tree.
+            Evaluate the expression.
             Returns the result as a float.
+            The postfix expression is evaluated directly, so no parse tree is built.
+            Raises ValueError if the expression has variables, use bind() for those.
+        """
+        return evaluate_postfix(self.postfix)
+
+    # Evaluate the expression for given values of its variables
+    def bind(self, **values) -> float:
+        """
+            Evaluate the expression with the given variable values, without parsing it again.
+            eg. Parser("a*x^2+b*x+c").bind(x=2, a=1, b=0, c=1) -> 5.0
+            The expression is compiled on the first call and the compiled function is reused.
+            Values for names that are not in the expression are ignored.
+            Raises ValueError if a variable of the expression has no value.
         """
-        if not self.parsetree:
-            self.parsetree = ParseTree(self.postfix)
-        
-        return self.parsetree.execute()
+        tree = self.parsetree
+        arguments = resolve_bindings(tree.get_variables(), values)
+        return tree.compile()(*arguments.values())
+
+    # Parse and evaluate an expression, reusing the result for repeated expressions
+    @staticmethod
+    def cached(expression: str, cache: LRUCache = result_cache, with_tree: bool = True,
+               limits: CostLimits = None, store=None) -> ParseResult:
+        """
+            Get the postfix expression, the parse tree (as JSON) and the result of the expression.
+            With with_tree=False the parse tree is not built, parse_tree_json may then be None.
+            The tree is serialized once and only its JSON is cached, result.parse_tree builds the dictionary again.
+            With limits, expressions over the limits raise cost.CostLimitExceeded (a ValueError)
+            before they are evaluated.
+            Results are stored in cache (result_cache by default) keyed on lexer.normalize(expression),
+            so "3 + 4" and "3+4" are parsed and evaluated only once.
+            Invalid expressions are not cached, they raise ValueError (or ZeroDivisionError) every time.
+            With store (a store.ExpressionStore), expressions missing from the cache are looked up in the
+            store before they are parsed, a stored expression is neither parsed nor evaluated again.
+        """
+        key = normalize(expression)
+        result = cache.get(key)
+        stored = store.get(key) if result is None and store is not None else None
+        if stored is not None:
+            if stored.error is not None:
+                raise stored.exception()
+            if limits is not None:
+                check_cost(estimate_cost(list(stored.postfix)), limits)
+            result = ParseResult(stored.postfix, stored.result, None)
+            if not with_tree:
+                cache.put(key, result)
+                return result
+        elif result is None:
+            parser = Parser(expression)
+            value = None
+            if limits is not None:
+                # The estimate computes an expression without variables exactly, it is not evaluated again
+                value = check_cost(estimate_cost(parser.postfix), limits).value
+            result = ParseResult(tuple(parser.postfix), parser.evaluate() if value is None else value, None)
+            if not with_tree:
+                cache.put(key, result)
+                return result
+        elif not with_tree or result.parse_tree_json is not None:
+            return result
+
+        # Add the tree, built from the postfix expression (the expression is not parsed again)
+        tree = ParseTree(list(result.postfix))
+        result = result._replace(parse_tree_json=tree.to_json())
+        cache.put(key, result)
+        return result
     
 
 
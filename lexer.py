@@ -0,0 +1,270 @@
+# A hand written, single pass tokenizer for BODMAS expressions.
+# It walks the expression exactly once and validates the grammar while it goes,
+# so callers never have to re-scan the input with separate regular expressions.
+
+# Grammar accepted by the lexer:
+#   expression := operand (operator operand)*
+#   operand    := number | variable | '(' expression ')'
+#   number     := digits | digits '.' digits
+#   variable   := (letter | '_') (letter | digit | '_')*     eg. x, rate, price_2
+# Spaces are allowed anywhere between tokens and are ignored.
+
+# Token
+# ----------
+# A single lexeme of the expression.
+# Attributes:
+# - type (str): One of NUMBER, VARIABLE, OPERATOR, LPAREN, RPAREN.
+# - value (str): The source text of the token eg. '34', '3.5', 'rate', '+', '('.
+# - offset (int): Index of the first character of the token in the source expression.
+
+# LexerError
+# ----------
+# Raised for the first invalid character or sequence found in the expression.
+# It is a ValueError, so existing `except ValueError` handlers keep working.
+# Attributes:
+# - code (str): Machine readable reason, one of ERROR_CODES eg. 'consecutive_operators'.
+# - message (str): Human readable reason.
+# - offset (int): Index in the source expression where the error was detected.
+
+from string import ascii_letters
+from typing import Iterator, Optional
+
+from operators import is_operator
+
+# Token types
+NUMBER = 'NUMBER'
+VARIABLE = 'VARIABLE'
+OPERATOR = 'OPERATOR'
+LPAREN = 'LPAREN'
+RPAREN = 'RPAREN'
+
+DIGITS = '0123456789'
+IDENTIFIER_START = ascii_letters + '_'
+IDENTIFIER_CHARACTERS = IDENTIFIER_START + DIGITS
+OPERAND_CHARACTERS = IDENTIFIER_CHARACTERS + '.'
+
+# Error messages (kept in line with the messages the API has always returned)
+EMPTY_EXPRESSION = "Expression cannot be empty"
+INVALID_CHARACTERS = "Invalid characters in expression. Only +, -, *, /, ^, decimal numbers, variables and () are allowed."
+CONSECUTIVE_OPERATORS = "Invalid expression. Consecutive operators are not allowed."
+UNBALANCED_PARENTHESES = "Invalid expression. Parentheses are not balanced."
+LEADING_TRAILING_OPERATOR = "Invalid expression. Expression cannot start or end with an operator."
+EMPTY_PARENTHESES = "Invalid expression. Empty parentheses are not allowed."
+INVALID_PARENTHESES_CONTENT = "Invalid expression inside parentheses."
+MISSING_OPERATOR = "Invalid expression. Missing operator between operands."
+
+# Error codes, the machine readable reason of a LexerError. Every raise passes its code explicitly,
+# so rewording a message never changes the code the API returns
+EMPTY_EXPRESSION_CODE = 'empty_expression'
+INVALID_CHARACTERS_CODE = 'invalid_characters'
+CONSECUTIVE_OPERATORS_CODE = 'consecutive_operators'
+UNBALANCED_PARENTHESES_CODE = 'unbalanced_parentheses'
+LEADING_TRAILING_OPERATOR_CODE = 'leading_trailing_operator'
+EMPTY_PARENTHESES_CODE = 'empty_parentheses'
+INVALID_PARENTHESES_CONTENT_CODE = 'invalid_parentheses_content'
+MISSING_OPERATOR_CODE = 'missing_operator'
+# Numbers that are not of the form 3 or 3.4
+INVALID_NUMBER = 'invalid_number'
+ERROR_CODES = frozenset({
+    EMPTY_EXPRESSION_CODE,
+    INVALID_CHARACTERS_CODE,
+    CONSECUTIVE_OPERATORS_CODE,
+    UNBALANCED_PARENTHESES_CODE,
+    LEADING_TRAILING_OPERATOR_CODE,
+    EMPTY_PARENTHESES_CODE,
+    INVALID_PARENTHESES_CONTENT_CODE,
+    MISSING_OPERATOR_CODE,
+    INVALID_NUMBER,
+})
+
+
+class Token:
+    """ A single token of an expression with its position in the source """
+
+    __slots__ = ('type', 'value', 'offset')
+
+    def __init__(self, type: str, value: str, offset: int):
+        self.type = type
+        self.value = value
+        self.offset = offset
+
+    def __repr__(self):
+        """
+            String representation of the Token
+            eg. Token(type=NUMBER, value='34', offset=0)
+        """
+        return f"Token(type={self.type}, value={self.value!r}, offset={self.offset})"
+
+    def __eq__(self, other):
+        if not isinstance(other, Token):
+            return NotImplemented
+        return (self.type, self.value, self.offset) == (other.type, other.value, other.offset)
+
+
+class LexerError(ValueError):
+    """ Raised when the expression is not a valid infix expression """
+
+    def __init__(self, message: str, offset: int, code: str):
+        super().__init__(f"{message} (at position {offset})")
+        self.code = code
+        self.message = message
+        self.offset = offset
+
+    def __reduce__(self):
+        # Pickled with its own arguments, eg. to be sent back from a worker process (see offload.py)
+        return type(self), (self.message, self.offset, self.code)
+
+    def to_dict(self) -> dict:
+        """
+            The error as a dictionary
+            eg. {'code': 'consecutive_operators', 'message': 'Invalid expression. ...', 'offset': 2}
+        """
+        return {'code': self.code, 'message': self.message, 'offset': self.offset}
+
+
+def tokenize(expression: str) -> list[Token]:
+    """
+        Convert the expression into a list of tokens in a single linear pass.
+        See iter_tokens() for the validation rules.
+        Raises LexerError (a ValueError) at the first problem found.
+    """
+    return list(iter_tokens(expression))
+
+
+def validate(expression: str) -> Optional[LexerError]:
+    """
+        Validate the expression without keeping its tokens.
+        Returns None if the expression is valid, otherwise the LexerError describing
+        the first problem (with its code, message and offset), eg.
+            validate("3++4").to_dict() -> {'code': 'consecutive_operators', 'message': '...', 'offset': 2}
+    """
+    try:
+        for _ in iter_tokens(expression):
+            pass
+    except LexerError as error:
+        return error
+    return None
+
+
+def iter_tokens(expression: str) -> Iterator[Token]:
+    """
+        Lazily yield the tokens of the expression in a single linear pass.
+        The grammar is validated while scanning, so consumers such as the
+        shunting-yard loop in index.Parser can work on the tokens as they are produced,
+        and exhausting the generator guarantees the expression is well formed:
+        1. The expression is not empty
+        2. Only digits, variable names, operators, parentheses, decimal points and spaces are used
+        3. No consecutive operators and no leading/trailing operators
+        4. Parentheses are balanced and never empty
+        5. Numbers are of the form 3 or 3.4 (3., .4 and 3.4.5 are rejected)
+        6. Two operands are always separated by an operator
+        Raises LexerError (a ValueError) at the first problem found.
+    """
+    previous : Token = None  # the last token produced
+    open_parentheses : list[int] = []  # offsets of the currently unmatched '('
+    expect_operand = True  # True at the start, after an operator and after '('
+    length = len(expression)
+    i = 0
+
+    while i < length:
+        char = expression[i]
+
+        if char == ' ':
+            i += 1
+            continue
+
+        if char in DIGITS or char == '.':
+            # Consume the whole run of digits and dots, then check its shape
+            start = i
+            while i < length and (expression[i] in DIGITS or expression[i] == '.'):
+                i += 1
+            lexeme = expression[start:i]
+            whole, dot, fraction = lexeme.partition('.')
+            if not whole or (dot and not fraction) or '.' in fraction:
+                raise LexerError(f"Invalid number in expression: {lexeme}. Please use valid decimal numbers.", start,
+                                 INVALID_NUMBER)
+            if not expect_operand:
+                raise LexerError(MISSING_OPERATOR, start, MISSING_OPERATOR_CODE)
+            previous = Token(NUMBER, lexeme, start)
+            yield previous
+            expect_operand = False
+            continue
+
+        if char in IDENTIFIER_START:
+            # A variable name, eg. x, rate, price_2
+            start = i
+            while i < length and expression[i] in IDENTIFIER_CHARACTERS:
+                i += 1
+            if not expect_operand:
+                raise LexerError(MISSING_OPERATOR, start, MISSING_OPERATOR_CODE)
+            previous = Token(VARIABLE, expression[start:i], start)
+            yield previous
+            expect_operand = False
+            continue
+
+        if char == '(':
+            if not expect_operand:
+                raise LexerError(MISSING_OPERATOR, i, MISSING_OPERATOR_CODE)
+            open_parentheses.append(i)
+            previous = Token(LPAREN, char, i)
+            yield previous
+        elif char == ')':
+            if not open_parentheses:
+                raise LexerError(UNBALANCED_PARENTHESES, i, UNBALANCED_PARENTHESES_CODE)
+            if expect_operand:
+                if previous.type == LPAREN:
+                    raise LexerError(EMPTY_PARENTHESES, previous.offset, EMPTY_PARENTHESES_CODE)
+                raise LexerError(INVALID_PARENTHESES_CONTENT, previous.offset, INVALID_PARENTHESES_CONTENT_CODE)
+            open_parentheses.pop()
+            previous = Token(RPAREN, char, i)
+            yield previous
+        elif is_operator(char):
+            if expect_operand:
+                if previous is None:
+                    raise LexerError(LEADING_TRAILING_OPERATOR, i, LEADING_TRAILING_OPERATOR_CODE)
+                if previous.type == OPERATOR:
+                    raise LexerError(CONSECUTIVE_OPERATORS, i, CONSECUTIVE_OPERATORS_CODE)
+                raise LexerError(INVALID_PARENTHESES_CONTENT, i, INVALID_PARENTHESES_CONTENT_CODE)
+            previous = Token(OPERATOR, char, i)
+            yield previous
+            expect_operand = True
+        else:
+            raise LexerError(INVALID_CHARACTERS, i, INVALID_CHARACTERS_CODE)
+
+        i += 1
+
+    if previous is None:
+        raise LexerError(EMPTY_EXPRESSION, 0, EMPTY_EXPRESSION_CODE)
+    if expect_operand:
+        # The last token is an operator or an opening parenthesis
+        if previous.type == OPERATOR:
+            raise LexerError(LEADING_TRAILING_OPERATOR, previous.offset, LEADING_TRAILING_OPERATOR_CODE)
+        raise LexerError(UNBALANCED_PARENTHESES, previous.offset, UNBALANCED_PARENTHESES_CODE)
+    if open_parentheses:
+        raise LexerError(UNBALANCED_PARENTHESES, open_parentheses[-1], UNBALANCED_PARENTHESES_CODE)
+
+
+def is_variable(token: str) -> bool:
+    """
+        Check if a postfix token is a variable name (rather than a number or an operator).
+        Numbers always start with a digit and operators are never letters, so the first character decides.
+    """
+    return token[0] in IDENTIFIER_START
+
+
+def normalize(expression: str) -> str:
+    """
+        The expression without insignificant spaces, eg. " 3 + 4 * x " -> "3+4*x".
+        Used as a cache key: a space between two operand characters is kept as a single space
+        ("1 2" stays "1 2" and is not confused with "12"), so two expressions normalize
+        to the same string only if they have the same tokens.
+    """
+    parts = [part for part in expression.split(' ') if part]
+    if not parts:
+        return ''
+    pieces = [parts[0]]
+    for previous, part in zip(parts, parts[1:]):
+        if previous[-1] in OPERAND_CHARACTERS and part[0] in OPERAND_CHARACTERS:
+            pieces.append(' ')
+        pieces.append(part)
+    return ''.join(pieces)
@@ -0,0 +1,238 @@
+# Counters and latency histograms, rendered in the Prometheus text exposition format.
+# No third party client is needed, see GET /metrics in frontend/api.py.
+
+# MetricsRegistry
+# ----------
+# Holds the metrics of a process.
+# Methods:
+# - counter(name, help, labelnames) -> Counter: A value that only goes up, eg. requests.
+# - histogram(name, help, labelnames, buckets) -> Histogram: Counts observations into buckets, eg. latencies.
+# - collector(function): Adds a function returning extra exposition lines (eg. values kept elsewhere).
+# - render() -> str: Returns every metric in the text exposition format.
+
+# Instrumentation
+# ----------
+# instrument(registry) times the stages of parsing and evaluation into the histogram
+# bodmas_stage_duration_seconds{stage=...}, by replacing these methods with timed wrappers:
+#   parse     Parser.__infix_to_postfix   validation, tokenizing and infix to postfix (one fused pass)
+#   evaluate  Parser.evaluate             evaluation of the postfix expression
+#   build     ParseTree.build_tree        building the parse tree
+#   execute   ParseTree.execute           evaluation of the parse tree
+#   serialize ParseTree.to_dict/to_json   exporting the parse tree
+# uninstrument() puts the original methods back. While not instrumented the original methods
+# run unchanged, so disabled instrumentation costs nothing.
+# timed(function, histogram, stage) wraps any other function the same way.
+
+import math
+import time
+from functools import wraps
+from threading import Lock
+
+from index import Parser
+from parseTree import ParseTree
+
+# Default histogram buckets for latencies, in seconds (10us to 10s)
+LATENCY_BUCKETS = (0.00001, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+# The instrumented stages: stage label -> (class, attribute)
+STAGES = {
+    'parse': (Parser, '_Parser__infix_to_postfix'),
+    'evaluate': (Parser, 'evaluate'),
+    'build': (ParseTree, 'build_tree'),
+    'execute': (ParseTree, 'execute'),
+    'serialize': (ParseTree, ('to_dict', 'to_json')),
+}
+
+
+class Counter:
+    """ A counter per combination of label values """
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.__values : dict[tuple, float] = {}
+        self.__lock = Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        """ Add amount to the counter of the given label values """
+        key = tuple(labels[name] for name in self.labelnames)
+        with self.__lock:
+            self.__values[key] = self.__values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        """ Current value of the counter of the given label values """
+        key = tuple(labels[name] for name in self.labelnames)
+        with self.__lock:
+            return self.__values.get(key, 0)
+
+    def render(self) -> list[str]:
+        """ Exposition lines of the counter """
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.__lock:
+            values = sorted(self.__values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """ Observations counted into cumulative buckets, per combination of label values """
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [count per bucket (not cumulative, the last one is +Inf), sum]
+        self.__values : dict[tuple, list] = {}
+        self.__lock = Lock()
+
+    def observe(self, value: float, **labels):
+        """ Count value in the histogram of the given label values """
+        key = tuple(labels[name] for name in self.labelnames)
+        index = len(self.buckets)
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = position
+                break
+        with self.__lock:
+            entry = self.__values.get(key)
+            if entry is None:
+                entry = self.__values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def count(self, **labels) -> int:
+        """ Number of observations of the given label values """
+        key = tuple(labels[name] for name in self.labelnames)
+        with self.__lock:
+            entry = self.__values.get(key)
+            return sum(entry[0]) if entry else 0
+
+    def render(self) -> list[str]:
+        """ Exposition lines of the histogram """
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.__lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self.__values.items())
+        names = self.labelnames + ('le',)
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(names, key + (_number(bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """ The metrics of a process, rendered together by render() """
+
+    def __init__(self):
+        self.__metrics : list = []
+        self.__collectors : list = []
+
+    def counter(self, name: str, help: str, labelnames: tuple = ()) -> Counter:
+        """ Create and register a Counter """
+        metric = Counter(name, help, labelnames)
+        self.__metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        """ Create and register a Histogram """
+        metric = Histogram(name, help, labelnames, buckets)
+        self.__metrics.append(metric)
+        return metric
+
+    def collector(self, function):
+        """
+            Register a function called on every render(), returning a list of exposition lines.
+            Used for values that are counted elsewhere, eg. the hits of an LRUCache.
+        """
+        self.__collectors.append(function)
+        return function
+
+    def render(self) -> str:
+        """ Every metric in the Prometheus text exposition format (version 0.0.4) """
+        lines : list[str] = []
+        for metric in self.__metrics:
+            lines.extend(metric.render())
+        for function in self.__collectors:
+            lines.extend(function())
+        return "\n".join(lines) + "\n"
+
+
+# The original methods while instrumented, by (class, attribute)
+_originals : dict = {}
+_originals_lock = Lock()
+
+
+def instrument(registry: MetricsRegistry) -> Histogram:
+    """
+        Time the stages of parsing and evaluation (see STAGES) into the histogram
+        bodmas_stage_duration_seconds{stage=...} of registry, and return it.
+        Instrumenting again first removes the previous instrumentation.
+    """
+    histogram = registry.histogram("bodmas_stage_duration_seconds",
+                                   "Time spent in each stage of parsing and evaluation", ("stage",))
+    with _originals_lock:
+        _restore()
+        for stage, (owner, attributes) in STAGES.items():
+            for attribute in (attributes if isinstance(attributes, tuple) else (attributes,)):
+                original = owner.__dict__[attribute]
+                _originals[(owner, attribute)] = original
+                setattr(owner, attribute, timed(original, histogram, stage))
+    return histogram
+
+
+def uninstrument():
+    """ Put the original methods back, instrumentation then costs nothing """
+    with _originals_lock:
+        _restore()
+
+
+def is_instrumented() -> bool:
+    """ Check if the stages are currently timed """
+    return bool(_originals)
+
+
+def _restore():
+    """ Put the original methods back, the caller holds _originals_lock """
+    for (owner, attribute), original in _originals.items():
+        setattr(owner, attribute, original)
+    _originals.clear()
+
+
+def timed(function, histogram: Histogram, stage: str):
+    """ Wrap a function so the duration of every call is observed in histogram under the stage label """
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - start, stage=stage)
+    return wrapper
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    """ Label set in exposition format eg. {stage="parse",le="0.001"} """
+    if not names:
+        return ""
+    pairs = (f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return "{" + ",".join(pairs) + "}"
+
+
+def _escape(value: str) -> str:
+    """ Escape a label value: backslash, double quote and line feed """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    """ Sample value in exposition format, eg. 3, 0.25, +Inf """
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
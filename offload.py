@@ -0,0 +1,167 @@
+# Evaluation of large expressions in worker processes, for the API (see should_offload in frontend/api.py).
+# This is the module the worker processes import: it only needs the parser and the cost model,
+# importing the API instead would print its CORS settings, instrument its metrics and open its store
+# in every worker.
+# Errors are raised in the worker and sent back as they are (LexerError and CostLimitExceeded
+# can be pickled), the calling process turns them into responses and caches the valid results.
+
+# OffloadPool
+# ----------
+# The worker processes, with a thread of the calling process feeding each one over a pipe.
+# Methods:
+# - submit(function, *arguments) -> Future: Calls function(*arguments) in the next free process.
+# - stop(future): Stops an evaluation that took too long, by terminating only its own process.
+# - shutdown(): Cancels the waiting evaluations and stops the processes once they are done.
+
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import Future
+
+from cache import LRUCache
+from cost import CostLimits
+from index import Parser, ParseResult
+
+
+def evaluate_offloaded(expression: str, with_tree: bool, limits: CostLimits = None) -> ParseResult:
+    """
+        Parser.cached() for a worker process, without a cache (the calling process caches the result).
+        The result holds the parse tree as JSON only, so deep trees are sent back without recursion.
+        Raises the errors of Parser.cached(), eg. LexerError or cost.CostLimitExceeded.
+    """
+    return Parser.cached(expression, LRUCache(maxsize=0), with_tree=with_tree, limits=limits)
+
+
+class WorkerLost(RuntimeError):
+    """ Raised for an evaluation whose worker process stopped, eg. killed by the system; it can be retried """
+
+
+class OffloadPool:
+    """
+        A pool of worker processes for evaluate_offloaded(), eg.
+            pool = OffloadPool(4)
+            future = pool.submit(evaluate_offloaded, "3+4", True)
+            future.result() -> ParseResult(postfix=('3', '4', '+'), result=7.0, ...)
+        Every process is fed by its own thread of the calling process, over a pipe.
+        Unlike concurrent.futures.ProcessPoolExecutor, an evaluation that takes too long is stopped with
+        stop(future), which terminates only the process running it: the other evaluations keep running
+        and the process is replaced before its thread takes the next evaluation.
+    """
+
+    def __init__(self, workers: int, context=None):
+        """
+            Start workers processes (spawned by default, so they do not inherit locks held by other threads).
+        """
+        self.__context = context or multiprocessing.get_context("spawn")
+        self.__tasks = queue.SimpleQueue()
+        self.__lock = threading.Lock()
+        # The process running each future, a future is removed when it is done or stopped
+        self.__running : dict[Future, multiprocessing.Process] = {}
+        self.__closed = False
+        self.__threads = [threading.Thread(target=self.__feed, name=f"offload-{i}", daemon=True)
+                          for i in range(workers)]
+        for thread in self.__threads:
+            thread.start()
+
+    def submit(self, function, *arguments) -> Future:
+        """
+            Call function(*arguments) in a worker process, function must be importable by the worker.
+            Returns a Future of its result, an exception raised by the function is raised by future.result(),
+            WorkerLost if the process stopped first.
+        """
+        future = Future()
+        with self.__lock:
+            if self.__closed:
+                raise RuntimeError("The pool is shut down")
+            self.__tasks.put((future, function, arguments))
+        return future
+
+    def stop(self, future: Future):
+        """
+            Stop an evaluation: cancel it if it is still waiting, else terminate the process running it.
+            Other evaluations are not affected, the process is replaced.
+        """
+        if future.cancel():
+            return
+        with self.__lock:
+            # Terminated while the lock is held, so the process cannot move on to the next evaluation
+            process = self.__running.pop(future, None)
+            if process is not None:
+                process.terminate()
+
+    def shutdown(self):
+        """
+            Cancel the waiting evaluations and let the processes exit once their evaluation is done.
+        """
+        with self.__lock:
+            self.__closed = True
+        while True:
+            try:
+                future, _, _ = self.__tasks.get_nowait()
+            except queue.Empty:
+                break
+            future.cancel()
+        for _ in self.__threads:
+            self.__tasks.put(None)
+
+    def __start(self) -> tuple:
+        """ Start a worker process, returns (process, connection) """
+        connection, child = self.__context.Pipe()
+        process = self.__context.Process(target=_serve, args=(child,), daemon=True)
+        process.start()
+        child.close()
+        return process, connection
+
+    def __feed(self):
+        """ The loop of a feeding thread: send the next evaluation to its process and wait for the outcome """
+        # The process is started right away, so that its imports are done before the first evaluation
+        process, connection = self.__start()
+        while True:
+            task = self.__tasks.get()
+            if task is None:
+                break
+            future, function, arguments = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            with self.__lock:
+                self.__running[future] = process
+            lost = False
+            try:
+                connection.send((function, arguments))
+                succeeded, value = connection.recv()
+            except (EOFError, OSError):
+                # The pipe is closed as the process exits, possibly before is_alive() knows it
+                lost = True
+                succeeded, value = False, WorkerLost("The process evaluating the expression stopped")
+            with self.__lock:
+                stopped = self.__running.pop(future, None) is None
+            if succeeded:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+            if stopped or lost:
+                connection.close()
+                process.join()
+                process, connection = self.__start()
+        connection.close()
+        process.join()
+
+
+# The loop of a worker process
+def _serve(connection):
+    """ Run the functions received on connection and send back (True, result) or (False, exception) """
+    while True:
+        try:
+            function, arguments = connection.recv()
+        except EOFError:
+            # The pool is shut down
+            return
+        try:
+            outcome = (True, function(*arguments))
+        except Exception as error:
+            outcome = (False, error)
+        try:
+            connection.send(outcome)
+        except Exception as error:
+            # eg. an exception that cannot be pickled
+            connection.send((False, RuntimeError(str(error))))
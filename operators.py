@@ -1,128 +1,186 @@
 # For extensibility, we can add more operators in the future. Hence Operator list and Precedence are to be defined on a global level.
+# Every operator is described once in the global `registry` below, which the parser and the evaluators read from.
+# To add an operator, register it, eg.
+#   registry.register('%', 2, mod)
+# and it will be accepted by the tokenizer, ordered by the shunting-yard loop and applied by the evaluators.
 
-import re
+import logging
+import math
+from operator import add, sub, mul, truediv
 
-# List of allowed Operators
-operators : list[str] = ['+', '-', '*', '/', '^']
+# Validation diagnostics are logged at DEBUG level, nothing is written to stdout
+logger = logging.getLogger(__name__)
 
-def is_operator(value: str) -> bool:
+LEFT = 'left'
+RIGHT = 'right'
+
+
+class OperatorSpec:
+    """ Everything the parser and the evaluators need to know about one operator """
+
+    __slots__ = ('symbol', 'precedence', 'associativity', 'function')
+
+    def __init__(self, symbol: str, precedence: int, function, associativity: str = LEFT):
+        self.symbol = symbol
+        self.precedence = precedence
+        self.associativity = associativity
+        self.function = function  # a callable taking (left, right) and returning the result
+
+    def __repr__(self):
+        """
+            String representation of the OperatorSpec
+            eg. OperatorSpec(symbol='+', precedence=1, associativity='left')
+        """
+        return f"OperatorSpec(symbol={self.symbol!r}, precedence={self.precedence}, associativity={self.associativity!r})"
+
+
+class OperatorRegistry:
     """
-        Check if the value is a valid operator.
-        Returns True if the value is an operator, False otherwise.
+        The table of supported operators, built once at import.
+        Maps each operator symbol to its OperatorSpec (precedence, associativity and function).
+    """
+
+    def __init__(self):
+        self.__specs : dict[str, OperatorSpec] = {}
+        # Symbols in registration order, their index is used as opcode by CompactParseTree
+        self.symbols : list[str] = []
+
+    def register(self, symbol: str, precedence: int, function, associativity: str = LEFT) -> OperatorSpec:
+        """
+            Add a binary operator, or replace the definition of an existing one.
+            symbol must be a single character that is not a digit, a letter, '_', '.', '(' , ')' or a space.
+            Returns the new OperatorSpec.
+        """
+        if len(symbol) != 1 or symbol.isalnum() or symbol in '_.() ':
+            raise ValueError(f"Invalid operator symbol: {symbol!r}")
+        if associativity not in (LEFT, RIGHT):
+            raise ValueError(f"Invalid associativity: {associativity!r}")
+        spec = OperatorSpec(symbol, precedence, function, associativity)
+        if symbol not in self.__specs:
+            self.symbols.append(symbol)
+        self.__specs[symbol] = spec
+        return spec
+
+    def unregister(self, symbol: str):
+        """
+            Remove an operator. Opcodes of the operators registered after it shift down by one,
+            so CompactParseTrees built before the removal must not be used afterwards.
+        """
+        del self.__specs[symbol]
+        self.symbols.remove(symbol)
+
+    def get(self, symbol: str) -> OperatorSpec:
+        """
+            Get the OperatorSpec of the symbol.
+            Returns None if the symbol is not an operator.
+        """
+        return self.__specs.get(symbol)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.__specs
+
+    def __iter__(self):
+        return iter(self.__specs.values())
+
+
+# log10 of the largest float, a power whose result is larger than this overflows
+MAX_LOG10 = math.log10(2.0) * 1024
+
+def guarded_power(base: float, exponent: float) -> float:
+    """
+        The ^ operator: base raised to exponent, with cheap checks instead of Python's generic errors.
+        Raises OverflowError when the power of a finite base and exponent would not fit in a float,
+        detected from exponent * log10(|base|) before anything is computed, eg. 10^400.
+        An infinite base or exponent gives inf (or 0 or 1) like the other operators, eg. inf^2 = inf,
+        the same as the NumPy path of vectorized.py.
+        Raises ValueError for a negative base with a fractional exponent (eg. (0-8)^0.5),
+        which has no real result (x ** y would return a complex number).
     """
-    return value in operators
+    if base < 0 and not float(exponent).is_integer():
+        raise ValueError(f"Invalid power: {base:g}^{exponent:g} has no real result.")
+    if base != 0 and math.isfinite(base) and math.isfinite(exponent) and exponent * math.log10(abs(base)) > MAX_LOG10:
+        raise OverflowError(f"Result too large: {base:g}^{exponent:g} exceeds the largest number.")
+    return base ** exponent
+
 
 # The precedence of operators is defined as follows: (will be needed only when converting infix to postfix)
 # + and - have the lowest precedence (1)
 # * and / have medium precedence (2)
-# ^ has the highest precedence (3)
+# ^ has the highest precedence (3) and is left associative like the others, ie. 2^3^2 = (2^3)^2
+registry = OperatorRegistry()
+registry.register('+', 1, add)
+registry.register('-', 1, sub)
+registry.register('*', 2, mul)
+registry.register('/', 2, truediv)
+registry.register('^', 3, guarded_power)
+
+# List of allowed Operators (kept in sync with the registry)
+operators : list[str] = registry.symbols
+
+def is_operator(value: str) -> bool:
+    """
+        Check if the value is a valid operator.
+        Returns True if the value is an operator, False otherwise.
+    """
+    return value in registry
+
 def get_precedence(operator: str) -> int:
     """
         Get the precedence of the operator.
         Returns 0 if the operator is not recognized.
     """
-    precedence = {
-        '+': 1,
-        '-': 1,
-        '*': 2,
-        '/': 2,
-        '^': 3
-    }
-    return precedence.get(operator, 0)
+    spec = registry.get(operator)
+    return spec.precedence if spec else 0
     # If the operator is not recognized, return 0.
 
 
 # How operators are used in the code:
-def apply_operator(left: str, right: str, operator: str) -> float:
+def apply_operator(left: float, right: float, operator: str) -> float:
     """
         Apply the operator on the left and right operands.
         Returns the result of the operation.
     """
-    switcher = {
-        '+': lambda x, y: x + y,
-        '-': lambda x, y: x - y,
-        '*': lambda x, y: x * y,
-        '/': lambda x, y: x / y,
-        '^': lambda x, y: x ** y
-    }
-    func = switcher.get(operator)
-    if func:
-        return func(float(left), float(right))
+    spec = registry.get(operator)
+    if spec:
+        # Operands from the parse tree are already numbers, only strings still need converting
+        if isinstance(left, str):
+            left = float(left)
+        if isinstance(right, str):
+            right = float(right)
+        return spec.function(left, right)
     else:
         raise ValueError(f"Unknown operator: {operator}")
     # If the operator is not recognized, raise an error.
-    # This function assumes that left and right are valid numbers in string format.
-    # It converts them to float before applying the operator.
+    # This function expects left and right as numbers (numbers in string format are still accepted).
     # This is a utility function to apply the operator on the operands.
-    # It can be used in the evaluation of the expression.
-    # This function can be extended to support more operators in the future.
-    # For now, it supports +, -, *, /, and ^ operators.
+    # The evaluators call registry.get(symbol).function directly in their loops.
 
 
 def is_valid_expression(expression: str) -> bool:
     """
         Check if the given expression is valid.
         expression must be a valid infix expression.
-        Steps for validation:
+        The validation is done by the single pass tokenizer in lexer.py, which checks:
         1. Empty expression check
         2. Valid characters check (digits, operators, parentheses, and decimal points)
         3. Consecutive operators check
         4. Balanced parentheses check
         5. Leading/trailing operators check.
-        6. Invalid use of decimal points check (currently only 3.4 type is allowed, .4, 3. type is not allowed)
-        7. Invalid sequences like '()', '(+)', '(-)', etc.
+        6. Invalid use of decimal points check (only 3.4 type is allowed, .4, 3. type is not allowed)
+        7. Invalid sequences like '()', '(+)', '(-)', '(3)(4)', etc.
         Returns True if the expression is valid, False otherwise.
+        The reason is logged at DEBUG level, use lexer.validate() to get it as an error object.
     """
-    # Check if the expression is empty
-    if not expression:
-        return False
-    
-    # Check for valid characters (digits, operators, parentheses, and decimal points)
-    if not re.match(r'^[0-9+\-*/^(). ]+$', expression):
-        print("Invalid characters in expression. Only +, -, *, /, ^, decimal numbers and () are allowed.")
-        return False
-    
-    # Check for consecutive operators or invalid sequences
-    if re.search(r'[+\-*/^]{2,}', expression):
-        print("Invalid expression. Consecutive operators are not allowed.")
-        return False
-    
-    # Check for balanced parentheses
-    if not valid_parentheses(expression):
-        print("Invalid expression. Parentheses are not balanced.")
-        return False
-    
-    # Check for leading/trailing operators (excluding parentheses) eg. "+3", "5*", etc.
-    if re.match(r'^[+\-*/^]', expression) or re.search(r'[+\-*/^]$', expression):
-        print("Invalid expression. Expression cannot start or end with an operator.")
+    from lexer import validate
+
+    error = validate(expression)
+    if error is not None:
+        logger.debug("Invalid expression %r: %s", expression, error)
         return False
-    
-    # Check for invalid use of decimal points e.g. "3.5.2", "3.+5", "3.-5", etc.
-    # Logic: Replace all operators and parentheses with space 
-    # then split the expression by space and use float() operator to check if these are valid
-    tokens = re.sub(r'[+\-*/^()]', ' ', expression).split()
-    for token in tokens:
-        try:
-            float(token)  # Try to convert the token to a float
-        except ValueError:
-            print(f"Invalid number in expression: {token}. Please use valid decimal numbers.")
-            return False
-    
-    # Check for invalid sequences like '()' or '(+)', '(-)', etc.
-    # Logic - Separate the a full parenthesis and pass it through is_valid_expression recursively
-    # Eg: "(3 + 5) * (2 - 1)" are to be checked like -
-    # ParenthesesExpressions = ['3 + 5', '2 - 1']
-    # for each expression in ParenthesesExpressions, apply is_valid_expression(expression)
-    parentheses_expressions = re.findall(r'\(([^()]*)\)', expression)
-    for expr in parentheses_expressions:
-        if not expr or not is_valid_expression(expr):
-            print(f"Invalid expression inside parentheses: '{expr}'")
-            return False
-    
+
     return True
     # If all checks pass, the expression is valid.
-    # This function checks if the expression is a valid mathematical expression.
-    # It checks for valid characters, balanced parentheses, and invalid sequences of operators.
+    # The tokenizer reports the first problem it finds along with its position.
 
 
 
@@ -0,0 +1,111 @@
+# Simplifies an expression before it is evaluated many times (see ParseTree.optimized()).
+# Works on the postfix expression and returns a new, shorter one, the original is not modified.
+
+# Two rewrites are applied, bottom-up in a single pass:
+# - Constant folding: an operator whose operands are both numbers is replaced by its result,
+#     "(3600*24)*x"  ->  ['86400', 'x', '*']
+#   Subexpressions that raise (eg. "1/0") or do not give a finite number are left as they are,
+#   so evaluating the optimized expression raises exactly like the original.
+# - Identities that hold for every float value of x:
+#     x*1, 1*x, x/1, x^1, x+0, 0+x, x-0  ->  x
+#   eg. "x*1+0"  ->  ['x']
+# Nothing is reordered: floating point arithmetic is not associative, so "x*3600*24"
+# (ie. (x*3600)*24) keeps both multiplications, and results equal those of the original
+# (x+0 turns x=-0.0 into 0.0, the identity keeps -0.0).
+# Variables are never removed (x*0 is not 0 for x=inf), so the optimized expression
+# takes the same variables as the original.
+
+import math
+from operator import add, sub, mul, truediv
+
+from operators import registry, guarded_power
+from lexer import is_variable
+
+# Registry function -> (right operand, left operand) values that leave the other operand unchanged,
+# None where there is no such value
+IDENTITIES = {
+    add: (0.0, 0.0),
+    sub: (0.0, None),
+    mul: (1.0, 1.0),
+    truediv: (1.0, None),
+    guarded_power: (1.0, None),
+}
+
+
+def optimize(postfix: list[str]) -> list[str]:
+    """
+        Fold the constant subexpressions of the postfix expression and remove identity operations.
+        eg. ['3600', '24', '*', 'x', '*'] -> ['86400', 'x', '*']
+            ['x', '1', '*', '0', '+'] -> ['x']
+        Returns a new list, evaluating it gives the same result as evaluating postfix.
+    """
+    get_spec = registry.get
+    output : list[str] = []
+    # For every pending operand: (index of its first token in output, its value if it is a number else None)
+    stack : list[tuple[int, float]] = []
+
+    for token in postfix:
+        spec = get_spec(token)
+        if spec is None:
+            stack.append((len(output), None if is_variable(token) else float(token)))
+            output.append(token)
+            continue
+        if len(stack) < 2:
+            raise ValueError("Invalid postfix expression: operator needs two operands.")
+
+        right_start, right = stack.pop()
+        left_start, left = stack.pop()
+
+        if left is not None and right is not None:
+            value = _fold(spec.function, left, right)
+            if value is not None:
+                # Replace both operands with the result
+                del output[left_start:]
+                output.append(_format_number(value))
+                stack.append((left_start, value))
+                continue
+
+        right_identity, left_identity = IDENTITIES.get(spec.function, (None, None))
+        if right_identity is not None and right == right_identity:
+            # x op identity: drop the right operand (the last tokens of output)
+            del output[right_start:]
+            stack.append((left_start, left))
+        elif left_identity is not None and left == left_identity:
+            # identity op x: drop the left operand, the right one moves up to its place
+            del output[left_start:right_start]
+            stack.append((left_start, right))
+        else:
+            output.append(token)
+            stack.append((left_start, None))
+
+    if len(stack) > 1:
+        raise ValueError("Invalid postfix expression: operands are not separated by operators.")
+    return output
+
+
+# Helper function to evaluate a constant subexpression
+def _fold(function, left: float, right: float) -> float:
+    """
+        The finite result of function(left, right), or None if it raises or is infinite or nan.
+    """
+    try:
+        value = function(left, right)
+    except (ArithmeticError, ValueError):
+        return None
+    if not math.isfinite(value):
+        return None
+    return value
+
+
+# Helper function to write a folded value as a postfix token
+def _format_number(value: float) -> str:
+    """
+        eg. 86400.0 -> '86400', 0.5 -> '0.5', 1e+20 -> '1e+20', -0.0 -> '-0.0'
+        float() of the token gives value back exactly.
+    """
+    if value == 0:
+        # Keep the sign of a negative zero eg. from (0-1)*0
+        return "-0.0" if math.copysign(1.0, value) < 0 else "0"
+    if value.is_integer() and abs(value) < 1e16:
+        return str(int(value))
+    return repr(value)
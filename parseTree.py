@@ -1,5 +1,5 @@
 # This class is meant to represent a parse tree of a BODMAS mathematical expression.
-# Allowed symbols: +, -, *, /, ^ and numbers.
+# Allowed symbols: +, -, *, /, ^, numbers and variables.
 
 # Class Diagrams:
 
@@ -7,7 +7,9 @@
 # ----------
 # Represents a node in the parse tree.
 # Attributes:
-# - value (str): The value of the node (operator or operand).
+# - value (str): The value of the node (operator or operand) as written in the expression.
+# - number (float or None): The numeric value of an operand, parsed once when the node is created.
+# - is_variable (bool): True if the node is a variable operand eg. 'x' (its number is then None).
 # - is_operator (bool): True if the node is an operator, False otherwise.
 # - left (ParseNode or None): The left child node.
 # - right (ParseNode or None): The right child node.
@@ -22,29 +24,68 @@
 # Attributes:
 # - __root (ParseNode or None): The root node of the parse tree (private).
 # - __postfix (List[str]): The postfix expression used to build the tree (private).
+# - __shared (bool): True if identical subtrees are a single shared node, which makes the tree a DAG (private).
 # Methods:
 # - __repr__(): Returns string representation for debugging.
 # - __str__(): Returns JSON-like string of the tree.
 # - build_tree(): Builds the tree from postfix.
 # - get_root() -> ParseNode: Returns the root node.
 # - get_postfix() -> List[str]: Returns the postfix expression.
-# - execute() -> float: Evaluates the expression.
+# - get_variables() -> List[str]: Returns the variable names in order of first appearance.
+# - is_shared() -> bool: Returns True if identical subtrees are shared (see ParseTree(postfix, shared=True)).
+# - node_count() -> int: Returns the number of distinct nodes.
+# - execute(bindings) -> float: Evaluates the expression, variables are looked up in bindings.
+# - optimized() -> ParseTree: Returns a smaller equivalent tree, constants folded and identities removed (see optimizer.py).
+# - compile() -> Callable[..., float]: Compiles the optimized tree into a Python function taking the variables (see compiler.py).
+# - evaluate_vectorized(**arrays): Evaluates the optimized tree over arrays of variable values (see vectorized.py).
+# - to_dict() -> dict: Returns the tree as nested dictionaries, ready for JSON serialization.
+# - to_json(indent) -> str: Returns the tree as a JSON string without building the dictionaries.
+# - cost() -> Cost: Estimates the size and numeric magnitude of the expression (see cost.py).
+# - dump() -> bytes: Serializes the tree (its postfix expression) into a compact binary form.
+# - load(data, shared) -> ParseTree: Builds a tree back from dump(), without lexing or parsing (static).
 
 # Execute
 # ----------
 # Executes and evaluates the parse tree.
 # Attributes:
 # - tree (ParseTree): The parse tree to evaluate.
+# - bindings (dict): Values of the variables of the expression.
 # Methods:
 # - evaluate() -> float: Evaluates the expression and returns the result.
+#   The tree is walked with an explicit stack, so its depth is not limited by the recursion limit.
+#   A shared node of a DAG is evaluated once per evaluation.
 
-from operators import is_operator, apply_operator
+# CompactParseTree
+# ----------
+# A memory compact alternative to ParseTree for holding many expressions at once.
+# Attributes:
+# - __nodes (bytes): One struct packed record (opcode, operand, left, right) per node, in postfix order (private).
+# Methods:
+# - __str__(): Returns the same JSON-like string as ParseTree.
+# - get_root() -> int: Returns the index of the root record.
+# - get_postfix() -> List[str]: Returns the postfix expression.
+# - execute() -> float: Evaluates the expression in one linear pass.
+
+import struct
+
+from operators import operators, registry
+from compiler import compile_tree
+from cost import Cost, estimate_cost
+from lexer import is_variable
+from optimizer import optimize
+from vectorized import evaluate_tree
 
 class ParseNode:
     """ A node in the parse tree representing an operator or operand """
 
+    # No per-node __dict__: 92 instead of 104 bytes per node (about 12% smaller, see benchmarks/bench_parse_node.py)
+    __slots__ = ('value', 'number', 'is_operator', 'is_variable', 'left', 'right')
+
     def __init__(self, value: str, is_operator: bool = False):
         self.value = value
+        self.is_variable = not is_operator and is_variable(value)
+        # Operands are converted to float once here instead of on every evaluation
+        self.number = None if is_operator or self.is_variable else float(value)  # type: float
         self.is_operator = is_operator
         self.left = None  # type: ParseNode
         self.right = None  # type: ParseNode
@@ -81,10 +122,32 @@ class ParseTree:
     # The postfix expression used to build the parse tree
     __postfix: list[str] = []
 
+    # The variable names of the expression in order of first appearance
+    __variables: list[str] = []
+
+    # The function compiled from the parse tree, created on the first call to compile()
+    __compiled = None
+
+    # The optimized equivalent of the parse tree, created on the first call to optimized()
+    __optimized = None
+
+    # True if structurally identical subtrees are one shared node
+    __shared = False
+
     # Constructor to initialize the parse tree with a postfix expression
-    def __init__(self, postfix: list[str]):
+    def __init__(self, postfix: list[str], shared: bool = False):
+        """
+        Build the parse tree of the postfix expression.
+        With shared=True identical subtrees are built once and shared (hash-consing), so the tree
+        becomes a DAG, eg. for "(a+b)*(a+b)" both operands of '*' are the same '+' node.
+        Shared nodes are evaluated once per evaluation, the nodes must then not be modified.
+        """
         self.__root = None  # type: ParseNode
         self.__postfix = postfix
+        self.__shared = shared
+        self.__variables = []
+        self.__compiled = None
+        self.__optimized = None
 
         self.build_tree()
 
@@ -117,12 +180,8 @@ class ParseTree:
                 }
             }
         """
-        if self.__root is None:
-            return "{}"
-        
-        # Convert the parse tree to a dictionary representation and format with indentation
-        import json
-        return json.dumps(to_dict(self.__root), indent=4)
+        # Format the parse tree as indented JSON without recursion (same output as json.dumps(..., indent=4))
+        return self.to_json(indent=4)
 
 
     # A recursive function to build the parse tree from the postfix expression
@@ -130,24 +189,46 @@ class ParseTree:
         """
         Build the parse tree from the postfix expression.
         The postfix expression is expected to be a list of strings.
+        In shared mode every distinct subtree is created once.
         """
         stack : list[ParseNode] = []
+        variables : dict[str, None] = {}  # an ordered set
+        # Shared mode: the node of every distinct subtree, by operand token or by
+        # (operator, id of the left node, id of the right node) as the children are already shared
+        interned = {} if self.__shared else None
 
         for token in self.__postfix:
-            if is_operator(token):
+            if token in registry:
                 # If the token is an operator, pop two nodes from the stack
                 right = stack.pop() if stack else None # It will be present always if postfix is correct
                 left = stack.pop() if stack else None  # It will be present always if postfix is correct
+                if interned is not None:
+                    key = (token, id(left), id(right))
+                    opNode = interned.get(key)
+                    if opNode is not None:
+                        stack.append(opNode)
+                        continue
                 opNode = ParseNode(token, is_operator=True)
                 opNode.left = left
                 opNode.right = right
+                if interned is not None:
+                    interned[key] = opNode
                 stack.append(opNode)
             else:
                 # If the token is an operand, create a new ParseNode and push it onto the stack
-                stack.append(ParseNode(token, is_operator=False))
+                if interned is not None:
+                    node = interned.get(token)
+                    if node is None:
+                        node = interned[token] = ParseNode(token, is_operator=False)
+                else:
+                    node = ParseNode(token, is_operator=False)
+                if node.is_variable:
+                    variables[token] = None
+                stack.append(node)
 
         # The last element in the stack is the root of the parse tree
         self.__root = stack.pop() if stack else None
+        self.__variables = list(variables)
 
     def get_root(self) -> ParseNode:
         """ 
@@ -163,59 +244,477 @@ class ParseTree:
         """
         return self.__postfix
 
-    def execute(self) -> float:
+    def get_variables(self) -> list[str]:
+        """
+        Get the variable names used in the expression, in order of first appearance.
+        eg. ['a', 'x', 'b', 'c'] for "a*x^2+b*x+c"
+        """
+        return self.__variables
+
+    def is_shared(self) -> bool:
+        """
+        Check if identical subtrees are shared nodes, ie. the tree was built with shared=True.
+        """
+        return self.__shared
+
+    def node_count(self) -> int:
+        """
+        Count the distinct nodes of the tree. This is len(get_postfix()) unless the tree is shared,
+        eg. 7 nodes for "(a+b)*(a+b)" but 4 when shared ('*', '+', 'a' and 'b').
+        """
+        if not self.__shared:
+            return len(self.__postfix)
+        seen : set[int] = set()
+        stack : list[ParseNode] = [self.__root] if self.__root is not None else []
+        while stack:
+            node = stack.pop()
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            if node.is_operator:
+                stack.extend(child for child in (node.left, node.right) if child is not None)
+        return len(seen)
+
+    def execute(self, bindings: dict = None) -> float:
         """
         Create an Execute object to evaluate the expression represented by the parse tree.
-        Returns an Execute object.
+        bindings maps variable names to their values, eg. {'x': 2, 'a': 1.5}.
+        Returns the result of the evaluation.
+        """
+        return Execute(self, bindings).evaluate()
+
+    def optimized(self) -> 'ParseTree':
+        """
+        Get an equivalent tree with the constant subexpressions folded and identity operations removed, eg.
+            "(3600*24)*x"  ->  ['86400', 'x', '*']
+            "x*1+0"        ->  ['x']
+        This tree is left unchanged (eg. for display), the optimized tree has the same variables.
+        It is created once, returns this tree itself if there is nothing to simplify.
+        Raises ValueError if an operator node is missing a child.
+        """
+        if self.__optimized is None:
+            original = to_postfix(self.__root)
+            postfix = optimize(original)
+            if len(postfix) == len(original):
+                self.__optimized = self
+            else:
+                self.__optimized = ParseTree(postfix, shared=self.__shared)
+                self.__optimized.__optimized = self.__optimized
+        return self.__optimized
+
+    def compile(self):
+        """
+        Compile the parse tree into a Python function taking the variables as positional arguments,
+        in the order of get_variables(), eg.
+            Parser("3+4*5").compiled()()  ->  23.0
+            Parser("a*x+1").compiled()(2, 3)  ->  7.0   (a=2, x=3)
+        The function evaluates the optimized tree (see optimized()) with native arithmetic, without walking the tree.
+        It is created once per tree (and shared between trees that compile to the same source),
+        so the tree must not be modified after compile() has been called.
+        """
+        if self.__compiled is None:
+            self.__compiled = compile_tree(self.optimized().__root, self.__variables)
+        return self.__compiled
+
+    def evaluate_vectorized(self, **arrays):
+        """
+        Evaluate the expression for many rows at once, eg.
+            Parser("a*x+1").parsetree.evaluate_vectorized(a=[1, 2], x=[10, 20])  ->  [11.0, 41.0]
+        The optimized tree (see optimized()) is walked once and every operator is applied to whole arrays.
+        Returns a numpy.ndarray if NumPy is installed, otherwise an array.array('d').
+        Division by zero and overflow raise the same errors as execute().
         """
-        return Execute(self).evaluate()
+        return evaluate_tree(self.optimized().__root, self.__variables, arrays, shared=self.__shared)
+
+    def cost(self) -> Cost:
+        """
+        Estimate the cost of evaluating the expression without evaluating it, eg. for "10^10^10"
+            Cost(nodes=5, depth=3, magnitude=1e10, value=None)
+        See cost.check_cost() to reject expressions over given limits.
+        """
+        return estimate_cost(self.__postfix)
+
+    def dump(self) -> bytes:
+        """
+        Serialize the tree into bytes, eg. b'3 4 5 * +' for "3+4*5".
+        The tokens are stored in postfix order, so ParseTree.load() rebuilds the tree in one pass
+        without validating or parsing the expression again (see store.py).
+        Raises ValueError if an operator node is missing a child.
+        """
+        return dump_postfix(to_postfix(self.__root))
+
+    @staticmethod
+    def load(data: bytes, shared: bool = False) -> 'ParseTree':
+        """
+        Build the tree serialized by dump(), eg. ParseTree.load(b'3 4 5 * +').execute() -> 23.0
+        The data is trusted to come from dump(), it is not validated.
+        """
+        return ParseTree(load_postfix(data), shared=shared)
+
+    def to_dict(self):
+        """
+        Get the parse tree as nested dictionaries, eg. for "3+4*5"
+            {'operator': '+', 'left': '3', 'right': {'operator': '*', 'left': '4', 'right': '5'}}
+        A tree with a single operand is just its value eg. '7', an empty tree is None.
+        """
+        return to_dict(self.__root)
+
+    def to_json(self, indent: int = None) -> str:
+        """
+        Get the parse tree as a JSON string, the same as json.dumps(self.to_dict(), indent=indent)
+        but written directly from the nodes. An empty tree gives "{}" (like str()).
+        """
+        if self.__root is None:
+            return "{}"
+        return to_json(self.__root, indent)
     
 
 # Helper function to convert a ParseNode to a dictionary representation for JSON serialization
 def to_dict(node: ParseNode) -> dict:
-        """
-        Convert the ParseNode to a dictionary representation for JSON serialization.
-        """
-        if node is None:
-            return None
-        if node.is_operator:
-            return {
-                "operator": node.value,
-                "left": to_dict(node.left),
-                "right": to_dict(node.right)
-            }
+    """
+    Convert the ParseNode to a dictionary representation for JSON serialization.
+    Uses an explicit stack instead of recursion, so trees of any depth can be converted.
+    """
+    if node is None:
+        return None
+    if not node.is_operator:
+        return node.value
+
+    root = {}
+    # Each entry is a node together with the (still empty) dictionary that will represent it
+    stack : list[tuple[ParseNode, dict]] = [(node, root)]
+    while stack:
+        current, target = stack.pop()
+        target["operator"] = current.value
+        for key, child in (("left", current.left), ("right", current.right)):
+            if child is None:
+                target[key] = None
+            elif child.is_operator:
+                target[key] = {}
+                stack.append((child, target[key]))
+            else:
+                target[key] = child.value
+    return root
+
+
+# Helper function to convert a ParseNode back to a postfix expression
+def to_postfix(node: ParseNode) -> list[str]:
+    """
+    Get the postfix expression of the tree starting at node, eg. ['3', '4', '5', '*', '+'].
+    It reflects the nodes as they are now, even if they were changed after the tree was built.
+    Raises ValueError if an operator node is missing a child.
+    """
+    postfix : list[str] = []
+    # Same post-order traversal as Execute.evaluate()
+    stack : list[tuple[ParseNode, bool]] = [(node, False)] if node is not None else []
+    while stack:
+        current, children_done = stack.pop()
+        if current.is_leaf() or children_done:
+            postfix.append(current.value)
         else:
-            return node.value
+            if current.left is None or current.right is None:
+                raise ValueError("Invalid parse tree: operator node must have both left and right children.")
+            stack.append((current, True))
+            stack.append((current.right, False))
+            stack.append((current.left, False))
+    return postfix
+
+
+# Helper functions for the binary form of a postfix expression (see ParseTree.dump())
+def dump_postfix(postfix: list[str]) -> bytes:
+    """
+    eg. ['3', '4', '+'] -> b'3 4 +'. Tokens never contain spaces, so a space separates them.
+    """
+    return " ".join(postfix).encode("utf-8")
+
+
+def load_postfix(data: bytes) -> list[str]:
+    """
+    eg. b'3 4 +' -> ['3', '4', '+'], the inverse of dump_postfix()
+    """
+    return bytes(data).decode("utf-8").split(" ") if data else []
+
+
+# Helper function to convert a ParseNode to a JSON string
+def to_json(node: ParseNode, indent: int = None) -> str:
+    """
+    Convert the ParseNode to a JSON string, formatted exactly like json.dumps(to_dict(node), indent=indent).
+    json.dumps recurses once per nesting level, so deep trees are written with an explicit stack instead.
+    Note that indented output grows quadratically with the depth of the tree, use indent=None for deep trees.
+    """
+    return _write_json(node, lambda current: (current.value, current.is_operator, current.left, current.right), indent)
+
+
+def _write_json(root, describe, indent: int = None) -> str:
+    """
+    Write the tree starting at root as JSON with an explicit stack.
+    describe(node) must return (value, is_operator, left, right) for any node of the tree,
+    which lets ParseTree and CompactParseTree share the same writer.
+    """
+    import json
+
+    parts : list[str] = []
+    # The stack holds either literal strings to write or (node, level) pairs still to be expanded
+    stack : list = [(root, 0)]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            parts.append(item)
+            continue
+        current, level = item
+        if current is None:
+            parts.append("null")
+            continue
+        value, operator, left, right = describe(current)
+        if not operator:
+            parts.append(json.dumps(value))
+        else:
+            if indent is None:
+                inner, closing = "", "}"
+            else:
+                inner = "\n" + " " * (indent * (level + 1))
+                closing = "\n" + " " * (indent * level) + "}"
+            separator = ", " if indent is None else ","
+            # Pushed in reverse order of output
+            stack.append(closing)
+            stack.append((right, level + 1))
+            stack.append(separator + inner + '"right": ')
+            stack.append((left, level + 1))
+            parts.append("{" + inner + '"operator": ' + json.dumps(value) + separator + inner + '"left": ')
+    return "".join(parts)
         
 
+# Helper function to look up the values of variables
+def resolve_bindings(variables: list[str], bindings: dict) -> dict[str, float]:
+    """
+    Get the float value of every variable from bindings, eg.
+    (['x', 'a'], {'x': 2, 'a': 1.5, 'b': 3}) -> {'x': 2.0, 'a': 1.5}
+    Raises ValueError if a variable has no value.
+    """
+    bindings = bindings or {}
+    missing = [name for name in variables if name not in bindings]
+    if missing:
+        raise ValueError(f"Unbound variable(s): {', '.join(missing)}")
+    return {name: float(bindings[name]) for name in variables}
+
+
+# Helper function to evaluate a postfix expression without building a parse tree
+def evaluate_postfix(postfix: list[str], bindings: dict = None) -> float:
+    """
+    Evaluate the postfix expression directly on a value stack.
+    eg. ['3', '4', '5', '*', '+'] -> 23.0
+    This gives the same result as ParseTree(postfix).execute() without allocating any ParseNode,
+    which makes it the fast path when only the number is needed.
+    bindings maps variable names to their values, eg. {'x': 2}.
+    """
+    if not postfix:
+        return 0.0
+
+    get_spec = registry.get
+    stack : list[float] = []
+    for token in postfix:
+        spec = get_spec(token)
+        if spec:
+            if len(stack) < 2:
+                raise ValueError("Invalid postfix expression: operator needs two operands.")
+            right = stack.pop()
+            left = stack.pop()
+            stack.append(spec.function(left, right))
+        elif is_variable(token):
+            stack.append(resolve_bindings([token], bindings)[token])
+        else:
+            stack.append(float(token))
+
+    if len(stack) != 1:
+        raise ValueError("Invalid postfix expression: operands are not separated by operators.")
+    return stack.pop()
+
+
 class Execute:
     """
     A class to execute the parse tree and evaluate the expression.
     It will traverse the parse tree and evaluate the expression.
+    The traversal uses an explicit stack, so deeply nested expressions
+    do not hit Python's recursion limit.
     """
 
-    def __init__(self, tree: ParseTree):
+    def __init__(self, tree: ParseTree, bindings: dict = None):
         self.tree = tree
+        self.bindings = bindings
 
     def evaluate(self) -> float:
         """
         Evaluate the expression represented by the parse tree.
         Returns a float representing the result of the expression.
+        Raises ValueError if a variable of the expression is missing from the bindings.
+        Shared nodes of a DAG (ParseTree(postfix, shared=True)) are evaluated only once.
+        """
+        root = self.tree.get_root()
+        if root is None:
+            return 0.0
+
+        variables = resolve_bindings(self.tree.get_variables(), self.bindings)
+        get_spec = registry.get
+        values : list[float] = []
+        # The values of the operator nodes evaluated so far by id(node), only needed for a DAG
+        done : dict[int, float] = {} if self.tree.is_shared() else None
+        # Post-order traversal: an operator is pushed once to visit its children (False)
+        # and once more to combine their values (True)
+        stack : list[tuple[ParseNode, bool]] = [(root, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if node.is_leaf():
+                values.append(variables[node.value] if node.is_variable else node.number)
+            elif children_done:
+                right_value = values.pop()
+                left_value = values.pop()
+                values.append(get_spec(node.value).function(left_value, right_value))
+                if done is not None:
+                    done[id(node)] = values[-1]
+            elif done is not None and id(node) in done:
+                values.append(done[id(node)])
+            else:
+                # Operators can never be leaf nodes, hence both children must be present
+                if node.left is None or node.right is None:
+                    raise ValueError("Invalid parse tree: operator node must have both left and right children.")
+                stack.append((node, True))
+                stack.append((node.right, False))
+                stack.append((node.left, False))
+        return values.pop()
+
+
+class CompactParseTree:
+    """
+    A memory compact parse tree for a mathematical expression.
+    Instead of one ParseNode object per node, all nodes are packed into a single immutable
+    bytes buffer, one fixed size record per node in postfix order:
+        opcode (unsigned char) : 0 for a number, 255 for a variable, 1 + index in operators.operators for an operator
+        operand (double)       : the numeric value of a number (0.0 otherwise)
+        left, right (int32)    : indices of the child records (-1 for operands),
+                                 for a variable left is its index in the tuple of variable names
+    Children always come before their parent, so the root is the last record and the tree can be
+    evaluated in one linear pass. A tree of n nodes takes 17 * n bytes plus a fixed ~90 bytes overhead.
+    Operands are stored as floats, so they are displayed in canonical form (eg. '3.50' is shown as '3.5').
+    """
+
+    __slots__ = ('__nodes', '__variables')
+
+    # Record layout: opcode, operand, left child index, right child index
+    RECORD = struct.Struct('<Bdii')
+
+    # Opcode of a variable operand
+    VARIABLE = 255
+
+    def __init__(self, postfix: list[str]):
+        pack = CompactParseTree.RECORD.pack
+        records : list[bytes] = []
+        stack : list[int] = []  # indices of the records that do not have a parent yet
+        variables : dict[str, int] = {}  # variable name -> index, in order of first appearance
+
+        for token in postfix:
+            if token in registry:
+                if len(stack) < 2:
+                    raise ValueError("Invalid postfix expression: operator needs two operands.")
+                right = stack.pop()
+                left = stack.pop()
+                records.append(pack(operators.index(token) + 1, 0.0, left, right))
+            elif is_variable(token):
+                records.append(pack(CompactParseTree.VARIABLE, 0.0, variables.setdefault(token, len(variables)), -1))
+            else:
+                records.append(pack(0, float(token), -1, -1))
+            stack.append(len(records) - 1)
+
+        if len(stack) > 1:
+            raise ValueError("Invalid postfix expression: operands are not separated by operators.")
+        self.__nodes = b"".join(records)
+        self.__variables = tuple(variables)
+
+    def __repr__(self):
+        """
+            String representation of the CompactParseTree
+            eg. CompactParseTree(nodes=3, postfix=['3', '4', '+'])
+        """
+        return f"CompactParseTree(nodes={len(self)}, postfix={self.get_postfix()})"
+
+    def __str__(self):
+        """
+            Formatted JSON representation of the parse tree, same layout as str(ParseTree).
         """
-        return self.__evaluate_node(self.tree.get_root())
+        if not self.__nodes:
+            return "{}"
+        return _write_json(self.get_root(), self.__describe, indent=4)
+
+    def __len__(self) -> int:
+        """ Number of nodes in the tree """
+        return len(self.__nodes) // CompactParseTree.RECORD.size
+
+    def __describe(self, index: int) -> tuple:
+        """ (value, is_operator, left, right) of the node at index, as needed by _write_json """
+        opcode, operand, left, right = CompactParseTree.RECORD.unpack_from(self.__nodes, index * CompactParseTree.RECORD.size)
+        if opcode == CompactParseTree.VARIABLE:
+            return self.__variables[left], False, None, None
+        if opcode:
+            return operators[opcode - 1], True, left, right
+        return _format_operand(operand), False, None, None
 
-    def __evaluate_node(self, node: ParseNode) -> float:
+    def get_root(self) -> int:
         """
-        Evaluate the expression represented by the given node.
+        Get the index of the root node of the parse tree (the last record).
+        Returns None if the tree is empty.
+        """
+        return len(self) - 1 if self.__nodes else None
+
+    def get_postfix(self) -> list[str]:
         """
-        if node is None:
+        Get the postfix expression stored in the tree, eg. ['3', '4', '+'].
+        """
+        return [
+            self.__variables[left] if opcode == CompactParseTree.VARIABLE
+            else operators[opcode - 1] if opcode else _format_operand(operand)
+            for opcode, operand, left, _ in CompactParseTree.RECORD.iter_unpack(self.__nodes)
+        ]
+
+    def get_variables(self) -> list[str]:
+        """
+        Get the variable names used in the expression, in order of first appearance.
+        """
+        return list(self.__variables)
+
+    def to_bytes(self) -> bytes:
+        """
+        Get the packed node records of the tree.
+        """
+        return self.__nodes
+
+    def execute(self, bindings: dict = None) -> float:
+        """
+        Evaluate the expression represented by the parse tree.
+        bindings maps variable names to their values.
+        Children are stored before their parents, so a single pass over the records is enough.
+        """
+        if not self.__nodes:
             return 0.0
-        if node.is_leaf():
-            return float(node.value)
-        # Operators can never be leaf nodes, hence we can safely assume that node is an operator here.
-        # Recursively evaluate the left and right subtrees and apply the operator
-        if node.left is None or node.right is None:
-            raise ValueError("Invalid parse tree: operator node must have both left and right children.")
-        left_value = self.__evaluate_node(node.left)
-        right_value = self.__evaluate_node(node.right)
-        return apply_operator(left_value, right_value, node.value)
\ No newline at end of file
+        variables = resolve_bindings(self.__variables, bindings)
+        by_index = [variables[name] for name in self.__variables]
+
+        # Functions indexed by opcode (index 0, the operand opcode, is never used)
+        functions = [None] + [registry.get(symbol).function for symbol in operators]
+        values : list[float] = []
+        for opcode, operand, left, right in CompactParseTree.RECORD.iter_unpack(self.__nodes):
+            if opcode == CompactParseTree.VARIABLE:
+                values.append(by_index[left])
+            elif opcode:
+                values.append(functions[opcode](values[left], values[right]))
+            else:
+                values.append(operand)
+        return values[-1]
+
+
+# Helper function to display a float operand the way it would be written in an expression
+def _format_operand(value: float) -> str:
+    """
+    eg. 3.0 -> '3', 3.5 -> '3.5'
+    """
+    if value.is_integer() and abs(value) < 1e16:
+        return str(int(value))
+    return repr(value)
@@ -0,0 +1,328 @@
+# A persistent, memory mapped store of parsed and evaluated expressions.
+# A process that restarts opens the store and serves every expression in it without parsing
+# it again (see Parser.cached(..., store=...), STORE_PATH in the API and `python store.py`).
+
+# File format (little endian)
+# ----------
+# header   magic b'BDMSTORE', version (u32), reserved (u32), record count (u64), index offset (u64)
+# records  one per expression, starting right after the header:
+#            result (f64), has error (u8), error offset (i32, -1 for none),
+#            key, postfix and error lengths (3 x u32), then the key (the normalized expression),
+#            the postfix expression (ParseTree.dump() form) and the error ("code\nmessage"), all UTF-8
+# index    slot count (u64, a power of two), then per slot: key hash (u64), record offset (u64, 0 if empty)
+#          An open addressing hash table with linear probing, the hash is the first 8 bytes of BLAKE2b
+#          of the key, so it is the same in every process (unlike hash()).
+# Opening a store maps the file into memory and reads only the header, a lookup reads one index slot
+# (or a few) and one record, so opening a store of millions of expressions takes no time.
+
+# StoredExpression
+# ----------
+# What the store remembers about an expression.
+# Attributes:
+# - postfix (tuple[str, ...]): The postfix expression, empty if the expression could not be parsed.
+# - result (float): The value of the expression, nan if it could not be evaluated.
+# - error (StoredError or None): Why the expression could not be parsed or evaluated.
+# Methods:
+# - exception() -> Exception: The error as the exception Parser raises for it.
+
+# ExpressionStore
+# ----------
+# A read only store, opened with ExpressionStore(path).
+# Methods:
+# - get(key) -> StoredExpression or None, key in store, len(store): Lookups by normalized expression.
+# - items(): Iterates over every (key, StoredExpression).
+# - close(): Unmaps the file, stores are also context managers.
+
+import hashlib
+import math
+import mmap
+import os
+import struct
+import sys
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+from cost import CostLimitExceeded
+from lexer import LexerError, ERROR_CODES, normalize
+from parseTree import dump_postfix, load_postfix
+
+MAGIC = b'BDMSTORE'
+VERSION = 1
+
+HEADER = struct.Struct('<8sIIQQ')
+RECORD = struct.Struct('<dBiIII')
+SLOT = struct.Struct('<QQ')
+SLOT_COUNT = struct.Struct('<Q')
+
+# Error codes of evaluation errors and the exception raised for them, other codes are ValueError
+# (or LexerError for lexer.ERROR_CODES)
+EVALUATION_ERRORS = {
+    'division_by_zero': ZeroDivisionError,
+    'overflow': OverflowError,
+}
+
+
+class StoredError(NamedTuple):
+    """ An error remembered by the store, with the codes of the API eg. 'consecutive_operators' """
+    code: str
+    message: str
+    offset: Optional[int] = None
+
+
+class StoredExpression(NamedTuple):
+    """ The parse and evaluation results of an expression, as kept in a store """
+    postfix: tuple[str, ...]
+    result: float
+    error: Optional[StoredError] = None
+
+    def exception(self) -> Exception:
+        """
+            The exception raised when the expression is parsed or evaluated, eg.
+            LexerError for 'consecutive_operators', ZeroDivisionError for 'division_by_zero'.
+        """
+        code, message, offset = self.error
+        if code in EVALUATION_ERRORS:
+            return EVALUATION_ERRORS[code](message)
+        if code in ERROR_CODES:
+            return LexerError(message, offset if offset is not None else 0, code)
+        return ValueError(message)
+
+
+def compile_expression(expression: str) -> StoredExpression:
+    """
+        Parse and evaluate the expression, keeping the error if it fails, eg.
+            compile_expression("3+4") -> StoredExpression(postfix=('3', '4', '+'), result=7.0, error=None)
+            compile_expression("1/0").error -> StoredError('division_by_zero', 'Division by zero', None)
+    """
+    from index import Parser
+
+    try:
+        parser = Parser(expression)
+    except LexerError as error:
+        return StoredExpression((), math.nan, describe_error(error))
+    postfix = tuple(parser.postfix)
+    try:
+        return StoredExpression(postfix, parser.evaluate())
+    except (ArithmeticError, ValueError) as error:
+        return StoredExpression(postfix, math.nan, describe_error(error))
+
+
+def describe_error(error: Exception) -> StoredError:
+    """
+        The StoredError of an exception raised while parsing or evaluating an expression, with the
+        error codes of the API, eg. describe_error(ZeroDivisionError()) -> StoredError('division_by_zero', ...)
+        This is the one mapping from exceptions to error codes, the API and the command line use it too.
+    """
+    if isinstance(error, LexerError):
+        return StoredError(error.code, error.message, error.offset)
+    if isinstance(error, CostLimitExceeded):
+        return StoredError('cost_limit_exceeded', str(error))
+    if isinstance(error, ZeroDivisionError):
+        return StoredError('division_by_zero', "Division by zero")
+    if isinstance(error, OverflowError):
+        return StoredError('overflow', str(error))
+    # eg. unbound variables or a negative base with a fractional exponent
+    return StoredError('invalid_expression', str(error))
+
+
+def key_hash(key: str) -> int:
+    """ The hash of a key in the index, never 0 """
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little") or 1
+
+
+def write_store(path: str, entries: Iterable[tuple[str, StoredExpression]]) -> int:
+    """
+        Write a store of (key, StoredExpression) pairs, where key is the normalized expression
+        (lexer.normalize), and return the number of records. A key given twice keeps its last value.
+        The file is written next to path and then renamed, so readers never see a partial store.
+    """
+    records : dict[str, StoredExpression] = dict(entries)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as file:
+            file.write(HEADER.pack(MAGIC, VERSION, 0, len(records), 0))
+            offsets : list[tuple[int, int]] = []  # (hash, record offset)
+            for key, stored in records.items():
+                offsets.append((key_hash(key), file.tell()))
+                file.write(_encode_record(key, stored))
+
+            index_offset = file.tell()
+            slots = 1
+            while slots < 2 * len(records):
+                slots *= 2
+            table = [(0, 0)] * slots
+            for hash_value, offset in offsets:
+                slot = hash_value & (slots - 1)
+                while table[slot][1]:
+                    slot = (slot + 1) & (slots - 1)
+                table[slot] = (hash_value, offset)
+            file.write(SLOT_COUNT.pack(slots))
+            file.write(b"".join(SLOT.pack(*entry) for entry in table))
+
+            file.seek(0)
+            file.write(HEADER.pack(MAGIC, VERSION, 0, len(records), index_offset))
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+    return len(records)
+
+
+class ExpressionStore:
+    """
+        A store written by write_store(), memory mapped for lookups, eg.
+            with ExpressionStore("expressions.store") as store:
+                store.get(normalize("3 + 4")) -> StoredExpression(postfix=('3', '4', '+'), result=7.0, error=None)
+    """
+
+    def __init__(self, path: str):
+        """
+            Open and map the store at path.
+            Raises ValueError if the file is not a store of this version.
+        """
+        self.path = path
+        with open(path, "rb") as file:
+            self.__data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.__data) < HEADER.size:
+            self.close()
+            raise ValueError(f"Not an expression store: {path}")
+        magic, version, _, self.__count, self.__index = HEADER.unpack_from(self.__data, 0)
+        if magic != MAGIC or version != VERSION or not self.__index:
+            self.close()
+            raise ValueError(f"Not an expression store (or an incomplete one): {path}")
+        self.__slots = SLOT_COUNT.unpack_from(self.__data, self.__index)[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        """ Number of expressions in the store """
+        return self.__count
+
+    def __contains__(self, key: str) -> bool:
+        """ Check if the normalized expression is in the store """
+        return self.__find(key) is not None
+
+    def get(self, key: str, default=None) -> StoredExpression:
+        """
+            The StoredExpression of the normalized expression key, or default if it is not in the store.
+        """
+        offset = self.__find(key)
+        if offset is None:
+            return default
+        return _decode_record(self.__data, offset)[1]
+
+    def items(self) -> Iterator[tuple[str, StoredExpression]]:
+        """ Every (key, StoredExpression) of the store, in the order they were written """
+        offset = HEADER.size
+        for _ in range(self.__count):
+            key, stored, offset = _decode_record(self.__data, offset, with_end=True)
+            yield key, stored
+
+    def close(self):
+        """ Unmap the file """
+        self.__data.close()
+
+    def __find(self, key: str) -> Optional[int]:
+        """ The offset of the record of key, None if key is not in the store """
+        hash_value = key_hash(key)
+        mask = self.__slots - 1
+        slot = hash_value & mask
+        encoded = key.encode("utf-8")
+        base = self.__index + SLOT_COUNT.size
+        while True:
+            stored_hash, offset = SLOT.unpack_from(self.__data, base + slot * SLOT.size)
+            if not offset:
+                return None
+            if stored_hash == hash_value:
+                key_length = RECORD.unpack_from(self.__data, offset)[3]
+                start = offset + RECORD.size
+                if self.__data[start:start + key_length] == encoded:
+                    return offset
+            slot = (slot + 1) & mask
+
+
+# Helper function to write one record
+def _encode_record(key: str, stored: StoredExpression) -> bytes:
+    """ The bytes of the record of key, see the file format above """
+    encoded_key = key.encode("utf-8")
+    postfix = dump_postfix(stored.postfix)
+    if stored.error is None:
+        error, has_error, error_offset = b"", 0, -1
+    else:
+        code, message, offset = stored.error
+        error, has_error = f"{code}\n{message}".encode("utf-8"), 1
+        error_offset = -1 if offset is None else offset
+    header = RECORD.pack(stored.result, has_error, error_offset, len(encoded_key), len(postfix), len(error))
+    return header + encoded_key + postfix + error
+
+
+# Helper function to read one record
+def _decode_record(data, offset: int, with_end: bool = False) -> tuple:
+    """ (key, StoredExpression) of the record at offset, and the offset of the next record if with_end """
+    result, has_error, error_offset, key_length, postfix_length, error_length = RECORD.unpack_from(data, offset)
+    start = offset + RECORD.size
+    key = data[start:start + key_length].decode("utf-8")
+    start += key_length
+    postfix = tuple(load_postfix(data[start:start + postfix_length]))
+    start += postfix_length
+    error = None
+    if has_error:
+        code, _, message = data[start:start + error_length].decode("utf-8").partition("\n")
+        error = StoredError(code, message, None if error_offset < 0 else error_offset)
+    start += error_length
+    stored = StoredExpression(postfix, result, error)
+    return (key, stored, start) if with_end else (key, stored)
+
+
+def build_store(path: str, expressions: Iterable[str], store: ExpressionStore = None) -> int:
+    """
+        Parse and evaluate the expressions and write them, together with the entries of store if given,
+        to a new store at path. Returns the number of expressions in the new store.
+    """
+    def entries():
+        if store is not None:
+            yield from store.items()
+        for expression in expressions:
+            expression = expression.strip()
+            if expression:
+                yield normalize(expression), compile_expression(expression)
+    return write_store(path, entries())
+
+
+if __name__ == "__main__":
+    def main(arguments: list[str]) -> int:
+        usage = ("usage: python store.py build STORE [FILE]   parse the expressions of FILE (or stdin), one per line\n"
+                 "       python store.py get STORE EXPRESSION  look an expression up\n"
+                 "       python store.py info STORE            number of expressions")
+        if len(arguments) < 2 or arguments[0] not in ("build", "get", "info"):
+            print(usage, file=sys.stderr)
+            return 2
+        command, path = arguments[0], arguments[1]
+        if command == "build":
+            existing = ExpressionStore(path) if os.path.exists(path) else None
+            source = open(arguments[2]) if len(arguments) > 2 else sys.stdin
+            with source:
+                count = build_store(path, source, existing)
+            if existing is not None:
+                existing.close()
+            print(f"{count} expressions in {path}")
+            return 0
+        with ExpressionStore(path) as store:
+            if command == "info":
+                print(f"{len(store)} expressions in {path}")
+                return 0
+            if len(arguments) < 3:
+                print(usage, file=sys.stderr)
+                return 2
+            stored = store.get(normalize(arguments[2]))
+            if stored is None:
+                print("not in the store")
+                return 1
+            print(f"postfix: {list(stored.postfix)}")
+            print(f"result: {stored.result}" if stored.error is None else f"error: {stored.error.code}: {stored.error.message}")
+            return 0
+
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,9 @@
+# Helpers shared by the test modules
+
+
+def outcome(function):
+    """The result of function(), or the type of the error it raised"""
+    try:
+        return function()
+    except (ArithmeticError, ValueError) as e:
+        return type(e)
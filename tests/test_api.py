@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import unittest
+from concurrent.futures import Future
+from unittest import mock
+
+# Expressions are evaluated inline unless a test enables the process pool
+os.environ.setdefault("PROCESS_POOL_WORKERS", "0")
+
+try:
+    from fastapi.testclient import TestClient
+    from frontend import api
+    from offload import WorkerLost, evaluate_offloaded
+except ImportError:  # the API dependencies (fastapi, httpx) are optional for the parser
+    TestClient = None
+
+
+@unittest.skipIf(TestClient is None, "fastapi and httpx are needed to test the API")
+class TestBatch(unittest.TestCase):
+    """Test cases for POST /parse/batch"""
+
+    def setUp(self):
+        self.client = TestClient(api.app)
+
+    def test_partial_failures(self):
+        """Test that invalid expressions and items that are not strings only fail their own item"""
+        response = self.client.post("/parse/batch?fields=result",
+                                    json={"expressions": ["3+4*5", "3++4", None, "1/0", 3, " 2^10 "]})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body["count"], body["valid_count"]), (6, 2))
+        results = body["results"]
+        self.assertEqual([item["valid"] for item in results], [True, False, False, False, False, True])
+        self.assertEqual((results[0]["result"], results[5]["result"]), (23, 1024))
+        self.assertEqual([item["error_detail"]["code"] for item in results[1:5]],
+                         ["consecutive_operators", "invalid_item", "division_by_zero", "invalid_item"])
+        self.assertEqual(results[2]["input_expression"], "null")
+        self.assertNotIn("postfix", results[0])
+
+    def test_too_many_expressions(self):
+        """Test that batches over MAX_BATCH_SIZE are rejected"""
+        with mock.patch.object(api, "max_batch_size", 2):
+            response = self.client.post("/parse/batch", json={"expressions": ["1", "2", "3"]})
+        self.assertEqual(response.status_code, 413)
+
+
+@unittest.skipIf(TestClient is None, "fastapi and httpx are needed to test the API")
+class TestStream(unittest.TestCase):
+    """Test cases for POST /parse/stream"""
+
+    def setUp(self):
+        self.client = TestClient(api.app)
+
+    def stream(self, body) -> list:
+        response = self.client.post("/parse/stream?fields=result", content=body)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        return [json.loads(line) for line in response.text.splitlines()]
+
+    def test_lines(self):
+        """Test objects, strings, blank and invalid lines, in input order"""
+        results = self.stream(b'{"expression": "3+4"}\n\n"2*x"\n[1]\n"(1+2)*3"')
+        self.assertEqual([item["valid"] for item in results], [True, False, False, True])
+        self.assertEqual((results[0]["result"], results[3]["result"]), (7, 9))
+        self.assertEqual(results[1]["error_detail"]["code"], "invalid_expression")
+        self.assertEqual(results[2]["error_detail"]["code"], "invalid_line")
+
+    def test_line_too_long(self):
+        """Test that a line over MAX_STREAM_LINE_LENGTH is reported once and the next lines are evaluated"""
+        long_line = b'"' + b"1+" * 50 + b'1"'
+        with mock.patch.object(api, "max_stream_line_length", 40):
+            results = self.stream(b'"1+1"\n' + long_line + b'\n"2+2"\n' + long_line)
+        self.assertEqual([item["valid"] for item in results], [True, False, True, False])
+        self.assertEqual(results[1]["error_detail"]["code"], "line_too_long")
+        self.assertEqual(results[2]["result"], 4)
+        self.assertEqual(results[3]["error_detail"]["code"], "line_too_long")
+
+    def test_line_too_long_across_chunks(self):
+        """Test a line over MAX_STREAM_LINE_LENGTH that is sent in several chunks"""
+        chunks = [b'"1+1"\n"' + b"1+" * 15, b"1+" * 15, b"1+" * 15 + b'1"\n"2', b'+2"\n']
+        with mock.patch.object(api, "max_stream_line_length", 40):
+            results = self.stream(iter(chunks))
+        self.assertEqual([item["valid"] for item in results], [True, False, True])
+        self.assertEqual(results[1]["error_detail"]["code"], "line_too_long")
+        self.assertEqual(results[2]["result"], 4)
+
+
+@unittest.skipIf(TestClient is None, "fastapi and httpx are needed to test the API")
+class TestSessions(unittest.TestCase):
+    """Test cases for /sessions"""
+
+    def setUp(self):
+        self.client = TestClient(api.app)
+
+    def test_edits(self):
+        """Test creating a session and editing it"""
+        response = self.client.post("/sessions", json={"expression": "(1+2)*x", "bindings": {"x": 3}})
+        self.assertEqual(response.status_code, 200)
+        session_id = response.json()["session_id"]
+        self.assertEqual(response.json()["result"], 9)
+        response = self.client.post(f"/sessions/{session_id}/edits", json={"offset": 7, "inserted": "+"})
+        self.assertEqual(response.json()["error_detail"]["code"], "leading_trailing_operator")
+        response = self.client.post(f"/sessions/{session_id}/edits", json={"offset": 8, "inserted": "1"})
+        self.assertEqual(response.json()["result"], 10)
+
+    def test_cost_limits(self):
+        """Test that sessions are checked against the cost limits before they are parsed or evaluated"""
+        with mock.patch.object(api, "cost_limits", api.CostLimits(max_nodes=5)):
+            response = self.client.post("/sessions", json={"expression": "1+2+3+4"})
+            self.assertEqual(response.status_code, 413)
+            response = self.client.post("/sessions", json={"expression": "1+2+3"})
+            self.assertEqual(response.json()["result"], 6)
+            session_id = response.json()["session_id"]
+            response = self.client.post(f"/sessions/{session_id}/edits", json={"offset": 5, "inserted": "+4"})
+            self.assertEqual(response.json()["error_detail"]["code"], "cost_limit_exceeded")
+        # Rejected by the magnitude limit rather than overflowing while it is evaluated
+        response = self.client.post(f"/sessions/{session_id}/edits", json={"offset": 0, "inserted": "10^400+"})
+        self.assertEqual(response.json()["error_detail"]["code"], "cost_limit_exceeded")
+
+
+@unittest.skipIf(TestClient is None, "fastapi and httpx are needed to test the API")
+class TestOffload(unittest.TestCase):
+    """Test cases for evaluating large expressions in the process pool"""
+
+    def setUp(self):
+        self.client = TestClient(api.app)
+        api.parse_cache.clear()
+        # Offload every expression to a single process
+        for name, value in [("process_pool_workers", 1), ("offload_min_length", 1), ("request_timeout", 60.0)]:
+            patcher = mock.patch.object(api, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(api.shutdown_process_pool)
+        self.addCleanup(api.parse_cache.clear)
+
+    def test_offloaded(self):
+        """Test that offloaded expressions give the same results and are cached by the server process"""
+        response = self.client.post("/parse", json={"expression": "(1+2)*3^2"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["result"], 27)
+        self.assertIsNotNone(api.process_pool)
+        self.assertIn("(1+2)*3^2", api.parse_cache)
+        self.assertFalse(api.should_offload("(1+2)*3^2"))
+
+        response = self.client.post("/parse/batch?fields=result", json={"expressions": ["6*7", "1/0"]})
+        self.assertEqual([item.get("result") for item in response.json()["results"]], [42, 0])
+        self.assertEqual(response.json()["results"][1]["error_detail"]["code"], "division_by_zero")
+
+    def test_deep_expression(self):
+        """Test that the parse tree of a deep expression is sent back from the process pool"""
+        expression = "+".join(["1"] * 6000)
+        response = self.client.post("/parse", json={"expression": expression})
+        self.assertEqual(response.status_code, 200)
+        # The response is too deep for json.loads
+        self.assertIn('"result":6000.0,', response.text)
+        self.assertTrue(response.text.startswith('{"postfix":["1","1","+","1","+"'))
+        self.assertIn('"parse_tree":{"operator": "+", "left": {"operator": "+", "left": ', response.text)
+        self.assertIn(expression, api.parse_cache)
+
+    def test_timeout(self):
+        """Test that an offloaded expression over REQUEST_TIMEOUT is answered with 504 and its process stopped"""
+        self.assertEqual(self.client.post("/parse", json={"expression": "1+1"}).json()["result"], 2)
+        pool = api.process_pool
+        slow = "+".join(["1"] * 200_000)
+        with mock.patch.object(api, "request_timeout", 0.05):
+            response = self.client.post("/parse", json={"expression": slow})
+            self.assertEqual(response.status_code, 504)
+            self.assertIn("timed out", response.json()["detail"])
+            self.assertIs(api.process_pool, pool)
+
+            # In a batch only that item fails
+            response = self.client.post("/parse/batch?fields=result", json={"expressions": [slow, "1"]})
+            results = response.json()["results"]
+            self.assertEqual(results[0]["error_detail"]["code"], "timeout")
+        # The new pool evaluates the next expressions
+        self.assertEqual(self.client.post("/parse", json={"expression": "2+3"}).json()["result"], 5)
+
+    def test_timeout_stops_only_its_process(self):
+        """Test that the other expressions running in the pool are not stopped by a timeout"""
+        with mock.patch.object(api, "process_pool_workers", 2):
+            pool = api.get_process_pool()
+            running = pool.submit(evaluate_offloaded, "+".join(["1"] * 100_000), False)
+            with mock.patch.object(api, "request_timeout", 0.05):
+                response = self.client.post("/parse", json={"expression": "+".join(["2"] * 200_000)})
+            self.assertEqual(response.status_code, 504)
+            self.assertEqual(running.result(timeout=60).result, 100_000)
+
+    def test_worker_lost(self):
+        """Test that an expression whose process stopped is answered with 503 and the process replaced"""
+        pool = api.get_process_pool()
+        with self.assertRaises(WorkerLost):
+            pool.submit(os._exit, 1).result(timeout=60)
+        self.assertEqual(pool.submit(evaluate_offloaded, "6*7", False).result(timeout=60).result, 42)
+
+        lost = Future()
+        lost.set_exception(WorkerLost("The process evaluating the expression stopped"))
+        with mock.patch.object(api.process_pool, "submit", return_value=lost):
+            response = self.client.post("/parse", json={"expression": "1+2"})
+            self.assertEqual(response.status_code, 503)
+            response = self.client.post("/parse/batch", json={"expressions": ["1+2"]})
+            self.assertEqual(response.json()["results"][0]["error_detail"]["code"], "worker_lost")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+import json
+import unittest
+from threading import Thread
+from unittest import mock
+from cache import LRUCache
+from index import Parser
+from lexer import normalize
+from parseTree import ParseTree
+
+
+class FakeClock:
+    """ A clock that only moves when told to """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLRUCache(unittest.TestCase):
+    """Test cases for the LRU cache"""
+
+    def test_eviction_order(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = LRUCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), (1, 3))
+        self.assertEqual(cache.stats(), {'size': 2, 'maxsize': 2, 'ttl': None, 'hits': 3,
+                                         'misses': 1, 'evictions': 1, 'expirations': 0})
+
+    def test_ttl(self):
+        """Test that entries expire after ttl seconds"""
+        clock = FakeClock()
+        cache = LRUCache(maxsize=10, ttl=5, clock=clock)
+        cache.put('a', 1)
+        clock.now = 4.9
+        self.assertIn('a', cache)
+        self.assertEqual(cache.get('a'), 1)
+        clock.now = 5.0
+        self.assertNotIn('a', cache)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual((cache.expirations, len(cache)), (1, 0))
+
+    def test_disabled_and_clear(self):
+        """Test a cache of size 0 and clearing a cache"""
+        cache = LRUCache(maxsize=0)
+        cache.put('a', 1)
+        self.assertEqual(len(cache), 0)
+        cache = LRUCache()
+        cache.put('a', 1)
+        cache.get('a')
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.hits, 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.pop('b'), 2)
+        self.assertIsNone(cache.pop('b'))
+        self.assertNotIn('b', cache)
+        with self.assertRaises(ValueError):
+            LRUCache(maxsize=-1)
+        with self.assertRaises(ValueError):
+            LRUCache(ttl=0)
+
+    def test_threads(self):
+        """Test that concurrent use keeps the size bounded and the counters consistent"""
+        cache = LRUCache(maxsize=50)
+
+        def work(offset):
+            for i in range(2000):
+                key = (i * 7 + offset) % 100
+                if cache.get(key) is None:
+                    cache.put(key, key)
+
+        threads = [Thread(target=work, args=(offset,)) for offset in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLessEqual(len(cache), 50)
+        self.assertEqual(cache.hits + cache.misses, 8 * 2000)
+
+
+class TestParserCache(unittest.TestCase):
+    """Test cases for Parser.cached()"""
+
+    def test_normalize(self):
+        """Test that only spaces which do not separate operands are removed"""
+        self.assertEqual(normalize(" 3 + 4 * ( x - 1 ) "), "3+4*(x-1)")
+        self.assertEqual(normalize("1  2"), "1 2")
+        self.assertEqual(normalize("a b+c"), "a b+c")
+        self.assertEqual(normalize("   "), "")
+
+    def test_cached(self):
+        """Test that equal expressions are parsed once"""
+        cache = LRUCache()
+        first = Parser.cached("3+4*5", cache)
+        self.assertEqual(first.postfix, ('3', '4', '5', '*', '+'))
+        self.assertEqual(first.result, 23)
+        self.assertEqual(first.parse_tree, {'operator': '+', 'left': '3',
+                                            'right': {'operator': '*', 'left': '4', 'right': '5'}})
+        self.assertIs(Parser.cached(" 3 + 4 * 5 ", cache), first)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_tree_serialized_once(self):
+        """Test that only the JSON of the tree is cached and the dictionary is built on demand"""
+        cache = LRUCache()
+        with mock.patch("index.ParseTree.to_json", autospec=True, side_effect=ParseTree.to_json) as to_json, \
+                mock.patch("index.ParseTree.to_dict", autospec=True, side_effect=ParseTree.to_dict) as to_dict:
+            first = Parser.cached("3+4*5", cache)
+            Parser.cached("3+4*5", cache)
+            self.assertEqual((to_json.call_count, to_dict.call_count), (1, 0))
+        self.assertFalse(any(isinstance(field, dict) for field in first))
+        self.assertEqual(json.loads(first.parse_tree_json), first.parse_tree)
+
+    def test_without_tree(self):
+        """Test that the tree is only built when it is asked for"""
+        cache = LRUCache()
+        first = Parser.cached("2^3", cache, with_tree=False)
+        self.assertEqual((first.result, first.parse_tree, first.parse_tree_json), (8, None, None))
+        second = Parser.cached("2^3", cache)
+        self.assertEqual(second.parse_tree, {'operator': '^', 'left': '2', 'right': '3'})
+        self.assertIs(Parser.cached("2^3", cache, with_tree=False), second)
+
+    def test_invalid_not_cached(self):
+        """Test that invalid expressions raise every time and are not stored"""
+        cache = LRUCache()
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                Parser.cached("1 2", cache)
+            with self.assertRaises(ZeroDivisionError):
+                Parser.cached("1/0", cache)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(Parser.cached("12", cache).result, 12)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+import cli
+from store import build_store
+
+
+class TestReaders(unittest.TestCase):
+    """Test cases for the input formats of bodmas eval"""
+
+    def test_lines(self):
+        """Test that blank lines are skipped and lines are stripped"""
+        self.assertEqual(list(cli.read_lines(io.StringIO("3+4\n\n  5*6 \n7"))), ["3+4", "5*6", "7"])
+
+    def test_csv(self):
+        """Test CSV columns by index and by header name"""
+        data = 'id,formula\n1,3+4\n2,"(1+2)*3"\n\n3\n'
+        self.assertEqual(list(cli.read_csv(io.StringIO(data), "formula")), ["3+4", "(1+2)*3", ""])
+        self.assertEqual(list(cli.read_csv(io.StringIO(data), "1")), ["formula", "3+4", "(1+2)*3", ""])
+        self.assertEqual(list(cli.read_csv(io.StringIO("3+4\n5*6\n"))), ["3+4", "5*6"])
+        with self.assertRaises(ValueError):
+            list(cli.read_csv(io.StringIO(data), "missing"))
+
+    def test_jsonl(self):
+        """Test JSON objects, JSON strings and invalid lines"""
+        data = '{"expression": "3+4"}\n"5*6"\n\n{"formula": "1"}\n[1]\nnot json\n'
+        self.assertEqual(list(cli.read_jsonl(io.StringIO(data))), ["3+4", "5*6", None, None, None])
+        self.assertEqual(list(cli.read_jsonl(io.StringIO(data), "formula")), [None, "5*6", "1", None, None])
+
+
+class TestEval(unittest.TestCase):
+    """Test cases for bodmas eval"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write(self, name: str, text: str) -> str:
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as file:
+            file.write(text)
+        return path
+
+    def run_eval(self, *arguments) -> tuple[int, str, str]:
+        """ (exit status, output, stderr) of bodmas eval with the output written to a file """
+        output = os.path.join(self.directory, "output")
+        stderr = io.StringIO()
+        with redirect_stderr(stderr):
+            status = cli.main(["eval", *arguments, "-o", output])
+        with open(output) if os.path.exists(output) else io.StringIO() as file:
+            return status, file.read(), stderr.getvalue()
+
+    def test_text_output(self):
+        """Test results and errors in the text format"""
+        path = self.write("expressions.txt", "3+4\n1/0\n3++4\n")
+        status, output, stderr = self.run_eval(path, "-w", "0")
+        self.assertEqual(status, 0)
+        self.assertEqual(output, "3+4\t7.0\n"
+                                 "1/0\terror: division_by_zero: Division by zero\n"
+                                 "3++4\terror: consecutive_operators: Invalid expression. Consecutive operators are not allowed.\n")
+        self.assertIn("3 expressions (1 valid, 2 invalid)", stderr)
+        self.assertIn("expressions/s", stderr)
+
+    def test_jsonl_output(self):
+        """Test the JSONL input and output formats"""
+        path = self.write("expressions.jsonl", '{"expression": "2^10"}\n"x"\n{}\n')
+        status, output, _ = self.run_eval(path, "--output-format", "jsonl", "-w", "0", "-q")
+        self.assertEqual(status, 0)
+        lines = [json.loads(line) for line in output.splitlines()]
+        self.assertEqual(lines[0], {"expression": "2^10", "valid": True, "result": 1024.0})
+        self.assertEqual(lines[1]["error"]["code"], "invalid_expression")
+        self.assertEqual(lines[2]["error"]["code"], "invalid_line")
+
+    def test_workers_keep_input_order(self):
+        """Test that chunks evaluated by several processes are written in input order"""
+        expressions = [f"{i}*2+{i % 5}" for i in range(500)]
+        path = self.write("expressions.csv", "formula\n" + "\n".join(expressions) + "\n")
+        status, output, stderr = self.run_eval(path, "--column", "formula", "-w", "3", "--chunk-size", "7")
+        self.assertEqual(status, 0)
+        self.assertEqual(output.splitlines(), [f"{e}\t{float(i * 2 + i % 5)!r}" for i, e in enumerate(expressions)])
+        self.assertIn("500 expressions (500 valid, 0 invalid)", stderr)
+
+    def test_read_ahead_is_bounded(self):
+        """Test that only a few chunks are read ahead of the results"""
+        read = []
+
+        def expressions():
+            for i in range(100):
+                read.append(i)
+                yield str(i)
+
+        for count, (_, chunk_count, _) in enumerate(cli.evaluate_chunks(expressions(), 2, 5), 1):
+            self.assertEqual(chunk_count, 5)
+            self.assertLessEqual(len(read), (count + 2 * cli.CHUNKS_PER_WORKER) * 5)
+
+    def test_store(self):
+        """Test that expressions are served from a store"""
+        store_path = os.path.join(self.directory, "expressions.store")
+        build_store(store_path, ["3+4"])
+        path = self.write("expressions.txt", "3 + 4\n5*6\n")
+        status, output, _ = self.run_eval(path, "--store", store_path, "-w", "1", "-q")
+        self.assertEqual((status, output), (0, "3 + 4\t7.0\n5*6\t30.0\n"))
+
+    def test_errors(self):
+        """Test that missing files and bad options are reported"""
+        status, _, stderr = self.run_eval(os.path.join(self.directory, "missing.txt"))
+        self.assertEqual(status, 1)
+        self.assertIn("bodmas: error:", stderr)
+        path = self.write("expressions.csv", "a,b\n1,2\n")
+        self.assertEqual(self.run_eval(path, "--column", "formula")[0], 1)
+        self.assertEqual(self.run_eval(path, "--chunk-size", "0")[0], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+import unittest
+from index import Parser
+from parseTree import ParseTree
+from compiler import generate_source
+from operators import registry
+
+
+class TestCompile(unittest.TestCase):
+    """Test cases for compiling parse trees into Python functions"""
+
+    def test_same_result_as_execute(self):
+        """Test that compiled functions agree with the tree evaluation"""
+        for expr in ["3+4", "3+4*5", "(3+4)*5-2^3/1.5", "2^3^2", "7", "10/4-3*(2-5)"]:
+            parser = Parser(expr)
+            self.assertEqual(parser.compiled()(), parser.parsetree.execute(), expr)
+
+    def test_generated_source(self):
+        """Test the shape of the generated source"""
+        source = generate_source(ParseTree(['3', '4', '5', '*', '+']).get_root())
+        self.assertEqual(source, "def compiled():\n    t0 = 4.0 * 5.0\n    t1 = 3.0 + t0\n    return t1\n")
+        self.assertEqual(generate_source(None), "def compiled():\n    return 0.0\n")
+
+    def test_cached(self):
+        """Test that compiled functions are reused"""
+        parser = Parser("3+4*5")
+        self.assertIs(parser.compiled(), parser.compiled())
+        self.assertIs(Parser("3 + 4 * 5").compiled(), parser.compiled())
+
+    def test_errors(self):
+        """Test that compiled functions raise the same errors as the tree evaluation"""
+        with self.assertRaises(ZeroDivisionError):
+            Parser("1/(2-2)").compiled()()
+        tree = ParseTree(['3', '4', '+'])
+        tree.get_root().left = None
+        with self.assertRaises(ValueError):
+            tree.compile()
+
+    def test_deep_tree(self):
+        """Test that deep trees compile without hitting nesting limits"""
+        parser = Parser("2-(" * 10000 + "1" + ")" * 10000)
+        self.assertEqual(parser.compiled()(), 1)
+
+    def test_registered_operator(self):
+        """Test that operators without a native Python form are called through their function"""
+        registry.register('%', 2, lambda x, y: x % y)
+        try:
+            self.assertEqual(Parser("10+5%3").compiled()(), 12)
+        finally:
+            registry.unregister('%')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+import math
+import pickle
+import unittest
+from unittest import mock
+from cache import LRUCache
+from cost import Cost, CostLimits, CostLimitExceeded, estimate_cost, check_cost
+from index import Parser
+from operators import guarded_power, MAX_LOG10
+from vectorized import numpy
+
+
+class TestGuardedPower(unittest.TestCase):
+    """Test cases for the ^ operator"""
+
+    def test_power(self):
+        """Test that ordinary powers are unchanged"""
+        self.assertEqual(guarded_power(2.0, 10.0), 1024)
+        self.assertEqual(guarded_power(-2.0, 3.0), -8)
+        self.assertEqual(guarded_power(0.0, 5.0), 0)
+        self.assertEqual(guarded_power(10.0, 308.0), 1e308)
+        self.assertEqual(Parser("2^3^2").evaluate(), 64)
+
+    def test_errors(self):
+        """Test that overflow and complex results are detected"""
+        with self.assertRaises(OverflowError):
+            guarded_power(10.0, 309.0)
+        with self.assertRaises(OverflowError):
+            Parser("10^(10^10)").evaluate()
+        with self.assertRaises(OverflowError):
+            Parser("0.1^(0-400)").compiled()()
+        with self.assertRaises(ValueError):
+            Parser("(0-8)^0.5").evaluate()
+        with self.assertRaises(ZeroDivisionError):
+            guarded_power(0.0, -1.0)
+
+    def test_infinite_operands(self):
+        """Test that infinite operands give the same results in every evaluation path"""
+        inf = math.inf
+        self.assertEqual(guarded_power(inf, 1.0), inf)
+        self.assertEqual(guarded_power(inf, 2.0), inf)
+        self.assertEqual(guarded_power(-inf, 3.0), -inf)
+        self.assertEqual(guarded_power(inf, -1.0), 0)
+        self.assertEqual(guarded_power(10.0, inf), inf)
+        with self.assertRaises(ValueError):
+            guarded_power(-2.0, inf)
+        for expr in ["x^1", "x^2", "x^0", "2^x", "x^(0-1)"]:
+            parser = Parser(expr)
+            for x in [inf, -inf]:
+                expected = parser.bind(x=x)
+                self.assertEqual(parser.parsetree.execute({'x': x}), expected, expr)
+                self.assertEqual(parser.compiled()(x), expected, expr)
+                if numpy is not None:
+                    self.assertEqual(list(parser.parsetree.evaluate_vectorized(x=[x])), [expected], expr)
+
+
+class TestCost(unittest.TestCase):
+    """Test cases for the cost model"""
+
+    def test_estimate(self):
+        """Test node count, depth and magnitude"""
+        self.assertEqual(estimate_cost(Parser("3+4*5").postfix)[:2], (5, 3))
+        self.assertEqual(estimate_cost(Parser("7").postfix), Cost(1, 1, math.log10(7), 7.0))
+        self.assertEqual(estimate_cost([]), Cost(0, 0, 0.0))
+        self.assertAlmostEqual(estimate_cost(Parser("1+1+1+1").postfix).magnitude, math.log10(4))
+        self.assertAlmostEqual(estimate_cost(Parser("10^400").postfix).magnitude, 400)
+        self.assertAlmostEqual(estimate_cost(Parser("(2*10)^3/5").postfix).magnitude, 3 * math.log10(20))
+        self.assertEqual(estimate_cost(Parser("10^(10^10)").postfix).magnitude, 1e10)
+        self.assertEqual(estimate_cost(Parser("10^(10^(10^10))").postfix).magnitude, math.inf)
+        self.assertEqual(Parser("a*x^2").parsetree.cost(), Cost(5, 3, math.log10(2)))
+        with self.assertRaises(ValueError):
+            estimate_cost(['3', '+'])
+
+    def test_value(self):
+        """Test that the value of an expression without variables is computed once, by the estimate"""
+        self.assertEqual(estimate_cost(Parser("(1+2)*3^2-1/4").postfix).value, 26.75)
+        for expr in ["x+1", "1/0", "10^400"]:
+            self.assertIsNone(estimate_cost(Parser(expr).postfix).value, expr)
+        with mock.patch.object(Parser, "evaluate") as evaluate:
+            self.assertEqual(Parser.cached("(1+2)*3^2", LRUCache(), limits=CostLimits()).result, 27)
+            self.assertEqual(Parser.cached("(1+2)*3^2", LRUCache()).result, evaluate.return_value)
+        evaluate.assert_called_once()
+        with self.assertRaises(ZeroDivisionError):
+            Parser.cached("2/(1-1)", LRUCache(), limits=CostLimits())
+
+    def test_check(self):
+        """Test that each limit is enforced"""
+        limits = CostLimits(max_nodes=10, max_depth=3, max_magnitude=100)
+        self.assertEqual(check_cost(Cost(10, 3, 99.9), limits), Cost(10, 3, 99.9))
+        for cost in [Cost(11, 1, 0.0), Cost(1, 4, 0.0), Cost(1, 1, 100.0)]:
+            with self.assertRaises(CostLimitExceeded):
+                check_cost(cost, limits)
+        check_cost(Cost(10 ** 9, 10 ** 9, math.inf), CostLimits(None, None, None))
+        self.assertLess(estimate_cost(Parser("10^308").postfix).magnitude, MAX_LOG10)
+        with self.assertRaises(CostLimitExceeded) as raised:
+            check_cost(estimate_cost(Parser("2^1023*2").postfix))
+        # Sent back as it is from the worker processes of the API
+        copy = pickle.loads(pickle.dumps(raised.exception))
+        self.assertEqual((str(copy), copy.cost), (str(raised.exception), raised.exception.cost))
+
+    def test_negative_and_zero_exponents(self):
+        """Test that exponents that are not positive do not count as large ones"""
+        for expr, result in [("10^(400-400)", 1.0), ("10^(0-400)", 0.0), ("2^(0-1100)", 0.0), ("10^(1-3)", 0.01)]:
+            self.assertLess(estimate_cost(Parser(expr).postfix).magnitude, 4, expr)
+            self.assertAlmostEqual(Parser.cached(expr, LRUCache(), limits=CostLimits()).result, result, msg=expr)
+        # Bounds of expressions with variables (a variable counts as 1 of either sign)
+        self.assertLess(estimate_cost(Parser("x^(0-400)").postfix).magnitude, 4)
+        self.assertEqual(estimate_cost(Parser("10^(0-y*y)").postfix).magnitude, 1)
+        self.assertEqual(estimate_cost(Parser("(0-10)^3*x").postfix).magnitude, 3)
+        # Exponents that can be positive still count, and so do large negative powers of small bases
+        self.assertAlmostEqual(estimate_cost(Parser("10^(x+400)").postfix).magnitude, 401)
+        with self.assertRaises(CostLimitExceeded):
+            check_cost(estimate_cost(Parser("0.5^(0-2000)").postfix))
+        with self.assertRaises(CostLimitExceeded):
+            check_cost(estimate_cost(Parser("10^(400-x)").postfix))
+
+    def test_cached_with_limits(self):
+        """Test that expressions over the limits are rejected before they are evaluated"""
+        cache = LRUCache()
+        self.assertEqual(Parser.cached("2^10", cache, limits=CostLimits()).result, 1024)
+        with self.assertRaises(CostLimitExceeded):
+            Parser.cached("10^308*10", cache, limits=CostLimits())
+        with self.assertRaises(CostLimitExceeded):
+            Parser.cached("1+2+3", cache, limits=CostLimits(max_nodes=4))
+        self.assertEqual(len(cache), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+import json
+import unittest
+from index import Parser
+from parseTree import ParseTree, to_dict, to_json
+
+DEPTH = 10 ** 5
+
+
+class TestDeepTrees(unittest.TestCase):
+    """Test cases for evaluating and serializing trees deeper than the recursion limit"""
+
+    def test_nested_parentheses(self):
+        """Test ((((...1...)))) with 10^5 levels of parentheses"""
+        parser = Parser("(" * DEPTH + "1" + ")" * DEPTH)
+        self.assertEqual(parser.evaluate(), 1)
+        self.assertEqual(parser.parsetree.execute(), 1)
+        self.assertEqual(to_dict(parser.parsetree.get_root()), "1")
+        self.assertEqual(parser.parsetree.to_json(), '"1"')
+
+    def test_left_leaning_chain(self):
+        """Test 1+1+...+1, which builds a left-leaning tree of depth 10^5"""
+        parser = Parser("+".join(["1"] * DEPTH))
+        self.assertEqual(parser.evaluate(), DEPTH)
+        # The explicit-stack evaluation of the tree, not only of the postfix expression
+        self.assertEqual(parser.parsetree.execute(), DEPTH)
+
+        # Walk down the left spine of the serialized tree
+        node = to_dict(parser.parsetree.get_root())
+        depth = 0
+        while isinstance(node, dict):
+            node = node["left"]
+            depth += 1
+        self.assertEqual(depth, DEPTH - 1)
+
+    def test_right_leaning_chain(self):
+        """Test 2-(2-(2-(...1))), which builds a right-leaning tree of depth 10^5"""
+        parser = Parser("2-(" * DEPTH + "1" + ")" * DEPTH)
+        self.assertEqual(parser.evaluate(), 1)
+        self.assertEqual(parser.parsetree.execute(), 1)
+
+        # Walk down the right spine of the serialized tree
+        node = to_dict(parser.parsetree.get_root())
+        depth = 0
+        while isinstance(node, dict):
+            node = node["right"]
+            depth += 1
+        self.assertEqual(depth, DEPTH)
+        text = parser.parsetree.to_json()
+        self.assertEqual(text.count('"operator"'), DEPTH)
+        self.assertTrue(text.startswith('{"operator": "-", "left": "2", "right": {"operator": "-", "left": "2"'))
+        self.assertTrue(text.endswith('"right": "1"' + "}" * DEPTH))
+
+    def test_deep_tree_to_json(self):
+        """Test that compact JSON of a deep tree matches the structure of to_dict"""
+        tree = ParseTree(["1"] + ["1", "-"] * DEPTH)
+        text = to_json(tree.get_root())
+        self.assertTrue(text.startswith('{"operator": "-", "left": {"operator": "-"'))
+        self.assertEqual(text.count('"operator"'), DEPTH)
+
+    def test_to_json_matches_json_dumps(self):
+        """Test that to_json produces the same text as json.dumps for small trees"""
+        for expr in ["3", "3+4", "(3+4)*5-2^3/1.5", "((1+2)*(3-4))^2"]:
+            root = Parser(expr).parsetree.get_root()
+            self.assertEqual(to_json(root), json.dumps(to_dict(root)))
+            self.assertEqual(to_json(root, indent=4), json.dumps(to_dict(root), indent=4))
+
+
+if __name__ == '__main__':
+    unittest.main()
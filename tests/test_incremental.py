@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+import random
+import unittest
+from unittest import mock
+import incremental
+from cost import estimate_cost
+from helpers import outcome
+from index import Parser
+from incremental import EditSession
+from lexer import LexerError, validate
+from operators import registry
+
+
+class TestEditSession(unittest.TestCase):
+    """Test cases for incremental re-evaluation of edited expressions"""
+
+    def setUp(self):
+        # '%' counts how often it is applied, to see which subtrees are evaluated again
+        self.calls = []
+        registry.register('%', 2, lambda x, y: self.calls.append((x, y)) or x % y)
+
+    def tearDown(self):
+        registry.unregister('%')
+
+    def test_edits(self):
+        """Test typing, replacing and deleting"""
+        session = EditSession("3+4")
+        self.assertEqual(session.evaluate(), 7)
+        session.edit(3, 0, "5")
+        self.assertEqual((session.expression, session.evaluate()), ("3+45", 48))
+        session.edit(1, 1, "*")
+        self.assertEqual((session.expression, session.evaluate()), ("3*45", 135))
+        session.edit(0, 2, "")
+        self.assertEqual((session.expression, session.evaluate()), ("45", 45))
+        session.edit(0, 0, "(1+2)*")
+        self.assertEqual((session.expression, session.evaluate()), ("(1+2)*45", 135))
+        self.assertEqual(session.postfix, ['1', '2', '+', '45', '*'])
+        self.assertEqual(session.version, 4)
+
+    def test_invalid_and_back(self):
+        """Test that an expression can be invalid between edits"""
+        session = EditSession("(a+b)", {'a': 1, 'b': 2, 'c': 4})
+        session.edit(4, 0, ")+(c")
+        self.assertEqual(session.expression, "(a+b)+(c)")
+        self.assertEqual(session.evaluate(), 7)
+        session.edit(8, 0, "+")
+        self.assertIsInstance(session.error, LexerError)
+        self.assertEqual(session.error.code, 'invalid_parentheses_content')
+        with self.assertRaises(LexerError):
+            session.evaluate()
+        session.edit(9, 0, "1")
+        self.assertIsNone(session.error)
+        self.assertEqual(session.evaluate(), 8)
+        self.assertEqual(EditSession("").error.code, 'empty_expression')
+
+    def test_edit_out_of_range(self):
+        """Test that edits outside the expression are rejected"""
+        session = EditSession("3+4")
+        for offset, deleted in [(-1, 0), (4, 0), (2, 2), (0, -1)]:
+            with self.assertRaises(ValueError):
+                session.edit(offset, deleted, "1")
+        self.assertEqual((session.expression, session.version), ("3+4", 0))
+
+    def test_untouched_subtrees_are_not_evaluated(self):
+        """Test that only the edited node and its ancestors are evaluated again"""
+        session = EditSession("(10%4)*(9%5)+(8%3)")
+        self.assertEqual(session.evaluate(), 10)
+        self.assertEqual(len(self.calls), 3)
+        self.calls.clear()
+        # Typing in a number: only (8%3) is applied again
+        session.edit(15, 0, "1")
+        self.assertEqual(session.expression, "(10%4)*(9%5)+(81%3)")
+        self.assertEqual(session.evaluate(), 8)
+        self.assertEqual(self.calls, [(81, 3)])
+        self.calls.clear()
+        # Rewriting a parenthesized group: only that group is parsed and applied again
+        session.edit(8, 3, "7%4")
+        self.assertEqual(session.expression, "(10%4)*(7%4)+(81%3)")
+        self.assertEqual(session.evaluate(), 6)
+        self.assertEqual(self.calls, [(7, 4)])
+        self.calls.clear()
+        # Replacing an operator with one that binds the same way
+        session.edit(12, 1, "-")
+        self.assertEqual(session.evaluate(), 6)
+        self.assertEqual(self.calls, [])
+
+    def test_spaces(self):
+        """Test edits in expressions with spaces"""
+        session = EditSession("  ( 1 +  2 ) * x ", {'x': 10})
+        self.assertEqual(session.evaluate(), 30)
+        session.edit(9, 1, "20")
+        self.assertEqual(session.expression, "  ( 1 +  20 ) * x ")
+        self.assertEqual(session.evaluate(), 210)
+        session.edit(16, 1, "y")
+        with self.assertRaises(ValueError):
+            session.evaluate()
+        session.bind(y=2)
+        self.assertEqual(session.evaluate(), 42)
+
+    def test_long_expression_is_not_parsed_again(self):
+        """Test that typing operators, operands and invalid text only lexes the text around the edit"""
+        session = EditSession("+".join(["1"] * 10000))
+        end = len(session.expression)
+        with mock.patch.object(incremental, "iter_tokens", wraps=incremental.iter_tokens) as lexed:
+            session.edit(end, 0, "*")
+            self.assertEqual(session.error.to_dict(), validate(session.expression).to_dict())
+            session.edit(end + 1, 0, " ")
+            session.edit(end + 2, 0, "3")
+            self.assertEqual(session.evaluate(), 10002)
+            session.edit(end - 2, 1, "-")
+            self.assertEqual(session.evaluate(), 9996)
+            session.edit(end - 2, 4, "")
+            self.assertEqual((session.expression[-4:], session.evaluate()), ("1+13", 10011))
+        self.assertEqual(session.postfix, Parser(session.expression).postfix)
+        self.assertLess(max(len(call.args[0]) for call in lexed.call_args_list), 20)
+
+    def test_same_as_parser(self):
+        """Test that random edits give the same postfix, cost, result or error as parsing from scratch"""
+        rng = random.Random(11)
+        pieces = ["1", "2", "7", "0", ".", "5", "x", "+", "-", "*", "/", "^", "(", ")", " ", "(2+3)", "*x"]
+        bindings = {'x': 3}
+        for _ in range(40):
+            session = EditSession("(1+2)*(3-x)/4+5^2", bindings)
+            for _ in range(40):
+                length = len(session.expression)
+                offset = rng.randint(0, length)
+                deleted = rng.randint(0, min(2, length - offset))
+                inserted = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 2)))
+                session.edit(offset, deleted, inserted)
+                expression = session.expression
+                try:
+                    parser = Parser(expression)
+                except LexerError as error:
+                    self.assertEqual(session.error.to_dict(), error.to_dict(), expression)
+                    continue
+                self.assertIsNone(session.error, expression)
+                self.assertEqual(session.postfix, parser.postfix, expression)
+                self.assertEqual(session.cost(), estimate_cost(parser.postfix), expression)
+                self.assertEqual(outcome(session.evaluate), outcome(lambda: parser.bind(**bindings)), expression)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+import pickle
+import unittest
+from unittest import mock
+from lexer import tokenize, validate, Token, LexerError, ERROR_CODES, NUMBER, OPERATOR, LPAREN, RPAREN
+from index import Parser
+
+
+class TestTokenize(unittest.TestCase):
+    """Test cases for the single pass tokenizer in lexer.py"""
+
+    def test_simple_expression(self):
+        """Test the token stream and offsets of a simple expression"""
+        self.assertEqual(tokenize('34+5'), [
+            Token(NUMBER, '34', 0),
+            Token(OPERATOR, '+', 2),
+            Token(NUMBER, '5', 3),
+        ])
+
+    def test_whitespace_and_parentheses(self):
+        """Test that offsets point into the original (unstripped) expression"""
+        tokens = tokenize(' (3.5 * 2) ')
+        self.assertEqual([t.type for t in tokens], [LPAREN, NUMBER, OPERATOR, NUMBER, RPAREN])
+        self.assertEqual([t.value for t in tokens], ['(', '3.5', '*', '2', ')'])
+        self.assertEqual([t.offset for t in tokens], [1, 2, 6, 8, 9])
+
+    def test_error_positions(self):
+        """Test that the first error is reported with its position"""
+        cases = [
+            ('', 0),
+            ('   ', 0),
+            ('3++4', 2),
+            ('+3', 0),
+            ('3+', 1),
+            ('3a+4', 1),
+            ('3.4.5+6', 0),
+            ('1+.5', 2),
+            ('(3+4', 0),
+            ('3+4)', 3),
+            ('()', 0),
+            ('(+3)', 1),
+            ('(3+)', 2),
+            ('(3)(4)', 3),
+            ('3 4', 2),
+        ]
+        for expr, offset in cases:
+            with self.assertRaises(LexerError, msg=expr) as context:
+                tokenize(expr)
+            self.assertEqual(context.exception.offset, offset, f"Wrong offset for '{expr}'")
+
+    def test_validate(self):
+        """Test that validate returns the first error with its code, message and offset"""
+        self.assertIsNone(validate('(1+2)*x'))
+        cases = [
+            ('', 'empty_expression', 0),
+            ('3$4', 'invalid_characters', 1),
+            ('3++4', 'consecutive_operators', 2),
+            ('(3+4', 'unbalanced_parentheses', 0),
+            ('3+', 'leading_trailing_operator', 1),
+            ('()', 'empty_parentheses', 0),
+            ('(3+)', 'invalid_parentheses_content', 2),
+            ('3 4', 'missing_operator', 2),
+            ('1+.5', 'invalid_number', 2),
+        ]
+        for expr, code, offset in cases:
+            error = validate(expr)
+            self.assertEqual((error.code, error.offset), (code, offset), expr)
+            self.assertEqual(error.to_dict(), {'code': code, 'message': error.message, 'offset': offset})
+            self.assertIn(code, ERROR_CODES)
+
+    def test_codes_do_not_depend_on_messages(self):
+        """Test that rewording a message keeps the error code"""
+        with mock.patch('lexer.CONSECUTIVE_OPERATORS', "Two operators in a row."), \
+                mock.patch('lexer.MISSING_OPERATOR', "Expected an operator."):
+            self.assertEqual(validate('3++4').to_dict(),
+                             {'code': 'consecutive_operators', 'message': "Two operators in a row.", 'offset': 2})
+            self.assertEqual(validate('3 4').code, 'missing_operator')
+
+    def test_error_is_value_error(self):
+        """Test that lexer errors can be handled as ValueError"""
+        with self.assertRaises(ValueError):
+            tokenize('3**4')
+
+    def test_pickle(self):
+        """Test that lexer errors can be sent between processes"""
+        error = validate('3++4')
+        copy = pickle.loads(pickle.dumps(error))
+        self.assertEqual((type(copy), str(copy), copy.to_dict()), (LexerError, str(error), error.to_dict()))
+
+    def test_parser_reports_first_error(self):
+        """Test that Parser raises the first error found while converting to postfix"""
+        with self.assertRaises(LexerError) as context:
+            Parser('(1+2)*3++4)')
+        self.assertEqual(context.exception.offset, 8)
+
+    def test_long_expression(self):
+        """Test a long expression is tokenized and parsed without rescans"""
+        expr = '+'.join(['12.5'] * 20000)
+        self.assertEqual(len(tokenize(expr)), 39999)
+        self.assertEqual(len(Parser(expr).postfix), 39999)
+
+
+if __name__ == '__main__':
+    unittest.main()
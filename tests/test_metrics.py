@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+import unittest
+from index import Parser
+from parseTree import ParseTree
+from metrics import MetricsRegistry, instrument, uninstrument, is_instrumented, timed
+
+
+class TestMetrics(unittest.TestCase):
+    """Test cases for counters, histograms and their exposition format"""
+
+    def test_counter(self):
+        """Test that counters are kept per label value"""
+        registry = MetricsRegistry()
+        counter = registry.counter("requests_total", "Requests", ("endpoint",))
+        counter.inc(endpoint="/parse")
+        counter.inc(2, endpoint="/parse")
+        counter.inc(endpoint="/parse/batch")
+        self.assertEqual(counter.get(endpoint="/parse"), 3)
+        self.assertEqual(counter.get(endpoint="/ping"), 0)
+        self.assertEqual(registry.render(),
+                         "# HELP requests_total Requests\n"
+                         "# TYPE requests_total counter\n"
+                         'requests_total{endpoint="/parse"} 3\n'
+                         'requests_total{endpoint="/parse/batch"} 1\n')
+
+    def test_histogram(self):
+        """Test that histogram buckets are cumulative and end with +Inf, _sum and _count"""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 2.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.count(), 4)
+        self.assertEqual(registry.render().splitlines()[2:], [
+            'latency_seconds_bucket{le="0.1"} 1',
+            'latency_seconds_bucket{le="1"} 3',
+            'latency_seconds_bucket{le="+Inf"} 4',
+            'latency_seconds_sum 3.05',
+            'latency_seconds_count 4',
+        ])
+
+    def test_label_escaping(self):
+        """Test that quotes, backslashes and line feeds in label values are escaped"""
+        registry = MetricsRegistry()
+        counter = registry.counter("errors_total", "Errors", ("code",))
+        counter.inc(code='a"b\\c\nd')
+        self.assertIn('errors_total{code="a\\"b\\\\c\\nd"} 1', registry.render())
+
+    def test_collector(self):
+        """Test that collector lines are appended to the output"""
+        registry = MetricsRegistry()
+        registry.collector(lambda: ["# TYPE entries gauge", "entries 5"])
+        self.assertEqual(registry.render(), "# TYPE entries gauge\nentries 5\n")
+
+
+class TestInstrumentation(unittest.TestCase):
+    """Test cases for timing the parsing and evaluation stages"""
+
+    def tearDown(self):
+        uninstrument()
+
+    def test_stages(self):
+        """Test that every stage is observed once per call"""
+        histogram = instrument(MetricsRegistry())
+        self.assertTrue(is_instrumented())
+        parser = Parser("3+4*5")
+        self.assertEqual(parser.evaluate(), 23)
+        tree = ParseTree(parser.postfix)
+        self.assertEqual(tree.execute(), 23)
+        tree.to_dict()
+        tree.to_json()
+        self.assertEqual(histogram.count(stage="parse"), 1)
+        self.assertEqual(histogram.count(stage="evaluate"), 1)
+        self.assertEqual(histogram.count(stage="build"), 1)
+        self.assertEqual(histogram.count(stage="execute"), 1)
+        self.assertEqual(histogram.count(stage="serialize"), 2)
+
+    def test_errors_are_timed(self):
+        """Test that failing stages are observed and the error is raised unchanged"""
+        histogram = instrument(MetricsRegistry())
+        with self.assertRaises(ValueError):
+            Parser("3++4")
+        with self.assertRaises(ZeroDivisionError):
+            Parser("1/0").evaluate()
+        self.assertEqual(histogram.count(stage="parse"), 2)
+        self.assertEqual(histogram.count(stage="evaluate"), 1)
+
+    def test_uninstrument(self):
+        """Test that uninstrument() restores the original methods"""
+        evaluate = Parser.__dict__["evaluate"]
+        build_tree = ParseTree.__dict__["build_tree"]
+        instrument(MetricsRegistry())
+        instrument(MetricsRegistry())
+        self.assertIsNot(Parser.__dict__["evaluate"], evaluate)
+        uninstrument()
+        self.assertFalse(is_instrumented())
+        self.assertIs(Parser.__dict__["evaluate"], evaluate)
+        self.assertIs(ParseTree.__dict__["build_tree"], build_tree)
+
+    def test_timed(self):
+        """Test that timed() wraps a plain function"""
+        histogram = MetricsRegistry().histogram("stage_seconds", "Stages", ("stage",))
+        add = timed(lambda a, b: a + b, histogram, "add")
+        self.assertEqual(add(1, 2), 3)
+        self.assertEqual(histogram.count(stage="add"), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+import random
+import unittest
+from helpers import outcome
+from index import Parser
+from optimizer import optimize
+from operators import registry
+
+
+def random_expression(rng: random.Random, depth: int) -> str:
+    """A random expression over numbers (including the identities 0 and 1) and the variables x and y"""
+    if depth == 0 or rng.random() < 0.2:
+        return rng.choice(["0", "1", "2", "3.5", "10", "0.25", "x", "y"])
+    operator = rng.choice("+-*/^")
+    return f"({random_expression(rng, depth - 1)}{operator}{random_expression(rng, depth - 1)})"
+
+
+class TestOptimize(unittest.TestCase):
+    """Test cases for constant folding and identity removal"""
+
+    def test_constant_folding(self):
+        """Test that subexpressions of numbers only are replaced by their value"""
+        self.assertEqual(optimize(Parser("(3600*24)*x").postfix), ['86400', 'x', '*'])
+        self.assertEqual(optimize(Parser("3+4*5").postfix), ['23'])
+        self.assertEqual(optimize(Parser("x/(1/4)").postfix), ['x', '0.25', '/'])
+        self.assertEqual(optimize(Parser("(0-1)*0").postfix), ['-0.0'])
+        # Not reassociated: (x*3600)*24
+        self.assertEqual(optimize(Parser("x*3600*24").postfix), ['x', '3600', '*', '24', '*'])
+
+    def test_identities(self):
+        """Test that x*1, 1*x, x/1, x^1, x+0, 0+x and x-0 become x"""
+        for expr in ["x*1", "1*x", "x/1", "x^1", "x+0", "0+x", "x-0", "x*1+0", "(x^(2-1))*(3-2)"]:
+            self.assertEqual(optimize(Parser(expr).postfix), ['x'], expr)
+        self.assertEqual(optimize(Parser("a*x^1+b*(x-0)+c/1").postfix),
+                         ['a', 'x', '*', 'b', 'x', '*', '+', 'c', '+'])
+        # The identities hold for every value of x, including infinite ones
+        for expr in ["x*1", "1*x", "x/1", "x^1", "x+0", "0+x", "x-0"]:
+            parser = Parser(expr)
+            for x in [float('inf'), float('-inf'), -2.0, 0.0]:
+                self.assertEqual(parser.compiled()(x), parser.parsetree.execute({'x': x}), (expr, x))
+        # Not identities for every x: 0-x, 1/x, 1^x, x*0
+        for expr in ["0-x", "1/x", "1^x", "x*0"]:
+            self.assertEqual(optimize(Parser(expr).postfix), Parser(expr).postfix, expr)
+
+    def test_errors_are_kept(self):
+        """Test that subexpressions that raise are not folded"""
+        self.assertEqual(optimize(Parser("x+1/(2-2)").postfix), ['x', '1', '0', '/', '+'])
+        self.assertEqual(optimize(Parser("10^400*0").postfix), ['10', '400', '^', '0', '*'])
+        with self.assertRaises(ZeroDivisionError):
+            Parser("x+1/(2-2)").bind(x=1)
+
+    def test_registered_operator(self):
+        """Test that other registered operators are folded but have no identities"""
+        registry.register('%', 2, lambda x, y: x % y)
+        try:
+            self.assertEqual(optimize(Parser("x+10%3").postfix), ['x', '1', '+'])
+            self.assertEqual(optimize(Parser("x%1").postfix), ['x', '1', '%'])
+        finally:
+            registry.unregister('%')
+
+
+class TestOptimizedTree(unittest.TestCase):
+    """Test cases for ParseTree.optimized()"""
+
+    def test_original_is_kept(self):
+        """Test that the original tree is unchanged for display"""
+        tree = Parser("(3600*24)*x+0").parsetree
+        optimized = tree.optimized()
+        self.assertEqual(tree.get_postfix(), ['3600', '24', '*', 'x', '*', '0', '+'])
+        self.assertEqual(tree.to_dict()['right'], '0')
+        self.assertEqual(optimized.get_postfix(), ['86400', 'x', '*'])
+        self.assertEqual(optimized.get_variables(), ['x'])
+        self.assertIs(tree.optimized(), optimized)
+        self.assertIs(optimized.optimized(), optimized)
+
+    def test_nothing_to_optimize(self):
+        """Test that a tree without anything to simplify is its own optimized tree"""
+        tree = Parser("a*x+b").parsetree
+        self.assertIs(tree.optimized(), tree)
+
+    def test_deep_tree(self):
+        """Test that deep trees are optimized without recursion"""
+        tree = Parser("x-(" * 10000 + "1" + "*1)" * 10000).parsetree
+        self.assertEqual(tree.optimized().get_postfix()[:3], ['x', 'x', 'x'])
+        self.assertEqual(tree.optimized().execute({'x': 5}), tree.execute({'x': 5}))
+
+    def test_numeric_equivalence(self):
+        """Test that optimized and original trees give the same results (or errors) on random expressions"""
+        rng = random.Random(2024)
+        bindings = [{'x': 0.0, 'y': 1.0}, {'x': 2.0, 'y': -3.0}, {'x': -0.5, 'y': 0.25}, {'x': 7.0, 'y': 1e10}]
+        for _ in range(500):
+            expr = random_expression(rng, 5)
+            tree = Parser(expr).parsetree
+            variables = tree.get_variables()
+            optimized = tree.optimized()
+            self.assertLessEqual(len(optimized.get_postfix()), len(tree.get_postfix()))
+            self.assertEqual(optimized.get_variables(), variables, expr)
+            for values in bindings:
+                expected = outcome(lambda: tree.execute(values))
+                self.assertEqual(outcome(lambda: optimized.execute(values)), expected, expr)
+                arguments = [values[name] for name in variables]
+                self.assertEqual(outcome(lambda: tree.compile()(*arguments)), expected, expr)
+
+    def test_compile_uses_optimized_tree(self):
+        """Test that compiled functions skip the folded constants"""
+        parser = Parser("x*(3600*24)")
+        self.assertEqual(parser.bind(x=2), 172800)
+        self.assertIs(parser.compiled(), Parser("x*86400").compiled())
+
+
+if __name__ == '__main__':
+    unittest.main()
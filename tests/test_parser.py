@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 # filepath: /home/uncanny/Desktop/Cutie/BodmasParser/test_parser.py
 
+import json
 import unittest
 from index import Parser
-from parseTree import ParseNode, ParseTree, Execute
+from parseTree import ParseNode, ParseTree, Execute, CompactParseTree, evaluate_postfix
 from operators import is_operator, get_precedence, is_valid_expression, valid_parentheses, apply_operator
+from operators import registry, OperatorRegistry, LEFT, RIGHT
 
 
 class TestOperators(unittest.TestCase):
@@ -47,6 +49,44 @@ class TestOperators(unittest.TestCase):
             apply_operator(3, 4, '%')
             apply_operator(3, 4, '%')
     
+    def test_registry(self):
+        """Test the operator registry"""
+        self.assertEqual(registry.get('^').associativity, LEFT)
+        self.assertEqual(registry.get('*').function(3, 4), 12)
+        self.assertIsNone(registry.get('%'))
+        
+        custom = OperatorRegistry()
+        custom.register('%', 2, lambda x, y: x % y)
+        self.assertIn('%', custom)
+        self.assertEqual(custom.symbols, ['%'])
+        with self.assertRaises(ValueError):
+            custom.register('(', 1, lambda x, y: x)
+        with self.assertRaises(ValueError):
+            custom.register('&', 1, lambda x, y: x, associativity='middle')
+
+        # A right associative operator groups from the right
+        registry.register('@', 3, lambda x, y: x ** y, associativity=RIGHT)
+        try:
+            parser = Parser("2@3@2")
+            self.assertEqual(parser.postfix, ['2', '3', '2', '@', '@'])
+            self.assertEqual(parser.evaluate(), 512)
+        finally:
+            registry.unregister('@')
+    
+    def test_register_new_operator(self):
+        """Test that a registered operator is parsed and evaluated"""
+        registry.register('%', 2, lambda x, y: x % y)
+        try:
+            self.assertTrue(is_operator('%'))
+            self.assertEqual(get_precedence('%'), 2)
+            parser = Parser("10+5%3")
+            self.assertEqual(parser.postfix, ['10', '5', '3', '%', '+'])
+            self.assertEqual(parser.evaluate(), 12)
+            self.assertEqual(parser.parsetree.execute(), 12)
+        finally:
+            registry.unregister('%')
+        self.assertFalse(is_valid_expression('10%3'))
+    
     def test_valid_parentheses(self):
         """Test the valid_parentheses function"""
         self.assertTrue(valid_parentheses('()'))
@@ -89,6 +129,17 @@ class TestParseNode(unittest.TestCase):
         self.assertEqual(op_node.value, '+')
         self.assertTrue(op_node.is_operator)
     
+    def test_number(self):
+        """Test that operands are converted to numbers once, when the node is created"""
+        node = ParseNode('24.5')
+        self.assertEqual(node.number, 24.5)
+        self.assertEqual(node.value, '24.5')
+        self.assertIsNone(ParseNode('+', is_operator=True).number)
+        
+        # __slots__: no per-node __dict__
+        with self.assertRaises(AttributeError):
+            node.extra = 1
+    
     def test_str_repr(self):
         """Test string representation of ParseNode"""
         node = ParseNode('42')
@@ -150,6 +201,17 @@ class TestParseTree(unittest.TestCase):
         tree = ParseTree(postfix2)
         self.assertEqual(tree.execute(), 23)
 
+    def test_to_dict_and_json(self):
+        """Test the structured exports of the tree"""
+        tree = ParseTree(['3', '4', '5', '*', '+'])
+        expected = {'operator': '+', 'left': '3', 'right': {'operator': '*', 'left': '4', 'right': '5'}}
+        self.assertEqual(tree.to_dict(), expected)
+        self.assertEqual(tree.to_json(), json.dumps(expected))
+        self.assertEqual(tree.to_json(indent=4), str(tree))
+        self.assertEqual(ParseTree(['7']).to_dict(), '7')
+        self.assertIsNone(ParseTree([]).to_dict())
+        self.assertEqual(ParseTree([]).to_json(), "{}")
+
 
 class TestExecute(unittest.TestCase):
     """Test cases for the Execute class"""
@@ -181,6 +243,62 @@ class TestExecute(unittest.TestCase):
             executor.evaluate()
 
 
+class TestCompactParseTree(unittest.TestCase):
+    """Test cases for the CompactParseTree class"""
+    
+    def test_same_as_parse_tree(self):
+        """Test that the compact tree evaluates and prints like ParseTree"""
+        for expr in ["3+4*5", "(3+4)*5-2^3/1.5", "7", "((1+2)*(3-4))^2"]:
+            parser = Parser(expr)
+            compact = CompactParseTree(parser.postfix)
+            self.assertEqual(compact.execute(), parser.parsetree.execute())
+            self.assertEqual(str(compact), str(parser.parsetree))
+            self.assertEqual(compact.get_postfix(), parser.postfix)
+    
+    def test_layout(self):
+        """Test the packed record layout"""
+        compact = CompactParseTree(['3', '4', '5', '*', '+'])
+        self.assertEqual(len(compact), 5)
+        self.assertEqual(compact.get_root(), 4)
+        self.assertEqual(len(compact.to_bytes()), 5 * CompactParseTree.RECORD.size)
+        self.assertEqual(CompactParseTree.RECORD.unpack_from(compact.to_bytes(), 4 * CompactParseTree.RECORD.size),
+                         (1, 0.0, 0, 3))
+    
+    def test_empty_and_invalid(self):
+        """Test empty and malformed postfix expressions"""
+        empty = CompactParseTree([])
+        self.assertIsNone(empty.get_root())
+        self.assertEqual(empty.execute(), 0.0)
+        self.assertEqual(str(empty), "{}")
+        with self.assertRaises(ValueError):
+            CompactParseTree(['3', '+'])
+
+
+class TestEvaluatePostfix(unittest.TestCase):
+    """Test cases for the evaluate_postfix fast path"""
+    
+    def test_matches_tree_evaluation(self):
+        """Test that evaluate_postfix gives the same result as the parse tree"""
+        postfixes = [
+            ['3', '4', '+'],
+            ['3', '4', '5', '*', '+'],
+            ['34', '5', '60', '*', '+', '8', '2', '/', '-'],
+            ['2', '3', '^', '0.5', '*'],
+            ['7'],
+        ]
+        for postfix in postfixes:
+            self.assertEqual(evaluate_postfix(postfix), ParseTree(postfix).execute())
+    
+    def test_invalid_postfix(self):
+        """Test error handling for malformed postfix expressions"""
+        with self.assertRaises(ValueError):
+            evaluate_postfix(['3', '+'])
+        with self.assertRaises(ValueError):
+            evaluate_postfix(['3', '4'])
+        with self.assertRaises(ZeroDivisionError):
+            evaluate_postfix(['3', '0', '/'])
+
+
 class TestParser(unittest.TestCase):
     """Test cases for the Parser class"""
     
@@ -213,6 +331,12 @@ class TestParser(unittest.TestCase):
         parser = Parser("3^2")
         self.assertEqual(parser.evaluate(), 9)
         
+        # Exponentiation is left associative, like the other operators
+        parser = Parser("2^3^2")
+        self.assertEqual(parser.postfix, ['2', '3', '^', '2', '^'])
+        self.assertEqual(parser.evaluate(), 64)
+        self.assertEqual(Parser("2-3-2").evaluate(), -3)
+        
         # Test expressions with parentheses
         parser = Parser("(3+4)*5")
         self.assertEqual(parser.evaluate(), 35)
@@ -226,6 +350,16 @@ class TestParser(unittest.TestCase):
         parser = Parser("((3+4)*2)")
         self.assertEqual(parser.evaluate(), 14)
     
+    def test_lazy_parse_tree(self):
+        """Test that the parse tree is only built when it is asked for"""
+        parser = Parser("3+4*5")
+        self.assertEqual(parser.evaluate(), 23)
+        self.assertIsNone(parser._Parser__parsetree)
+        
+        tree = parser.parsetree
+        self.assertEqual(tree.get_root().value, '+')
+        self.assertIs(parser.parsetree, tree)
+    
     def test_invalid_expressions(self):
         """Test handling of invalid expressions"""
         with self.assertRaises(ValueError):
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+import unittest
+from index import Parser
+from parseTree import ParseTree
+from compiler import generate_source
+from operators import registry
+
+
+class TestSharedTree(unittest.TestCase):
+    """Test cases for parse trees built with shared=True (hash-consing into a DAG)"""
+
+    def test_identical_subtrees_are_shared(self):
+        """Test that identical subtrees become one node"""
+        tree = ParseTree(Parser("(a+b)*(a+b)^2/(a+b)").postfix, shared=True)
+        root = tree.get_root()
+        multiply = root.left
+        self.assertIs(multiply.left, multiply.right.left)
+        self.assertIs(multiply.left, root.right)
+        self.assertTrue(tree.is_shared())
+        # '/', '*', '^', '+', 'a', 'b' and '2'
+        self.assertEqual(tree.node_count(), 7)
+        self.assertEqual(ParseTree(tree.get_postfix()).node_count(), 13)
+        self.assertFalse(ParseTree(tree.get_postfix()).is_shared())
+
+    def test_different_subtrees_are_not_shared(self):
+        """Test that only structurally identical subtrees are shared"""
+        tree = ParseTree(Parser("(a-b)*(b-a)+(a-b)").postfix, shared=True)
+        root = tree.get_root()
+        self.assertIsNot(root.left.left, root.left.right)
+        self.assertIs(root.left.left, root.right)
+        self.assertEqual(tree.node_count(), 6)
+
+    def test_same_results(self):
+        """Test that shared trees evaluate like ordinary trees"""
+        bindings = {'a': 1.5, 'b': -4, 'x': 3}
+        for expr in ["(a+b)*(a+b)^2/(a+b)", "x*x*x+x*x", "((a*x)+(a*x))*((a*x)+(a*x))", "3+4*5", "7", "a"]:
+            postfix = Parser(expr).postfix
+            tree = ParseTree(postfix)
+            shared = ParseTree(postfix, shared=True)
+            expected = tree.execute(bindings)
+            self.assertEqual(shared.execute(bindings), expected, expr)
+            self.assertEqual(shared.get_variables(), tree.get_variables(), expr)
+            self.assertEqual(shared.to_json(), tree.to_json(), expr)
+            arguments = [bindings[name] for name in shared.get_variables()]
+            self.assertEqual(shared.compile()(*arguments), expected, expr)
+            if arguments:
+                columns = {name: [bindings[name]] for name in shared.get_variables()}
+                self.assertEqual(list(shared.evaluate_vectorized(**columns)), [expected], expr)
+
+    def test_shared_nodes_are_evaluated_once(self):
+        """Test that every distinct operator node is applied once per evaluation"""
+        calls = []
+        registry.register('%', 2, lambda x, y: calls.append((x, y)) or x % y)
+        try:
+            tree = ParseTree(Parser("(a%3)*(a%3)+(a%3)").postfix, shared=True)
+            self.assertEqual(tree.execute({'a': 10}), 2)
+            self.assertEqual(calls, [(10, 3)])
+            calls.clear()
+            ParseTree(tree.get_postfix()).execute({'a': 10})
+            self.assertEqual(len(calls), 3)
+        finally:
+            registry.unregister('%')
+
+    def test_compiled_source(self):
+        """Test that a shared node is assigned once in the compiled source"""
+        tree = ParseTree(Parser("(a+b)*(a+b)").postfix, shared=True)
+        self.assertEqual(generate_source(tree.get_root(), tree.get_variables()),
+                         "def compiled(v_a, v_b):\n    t0 = v_a + v_b\n    t1 = t0 * t0\n    return t1\n")
+
+    def test_optimized_stays_shared(self):
+        """Test that optimizing a shared tree gives a shared tree"""
+        tree = ParseTree(Parser("(x*1+2*3)*(x+6)").postfix, shared=True)
+        optimized = tree.optimized()
+        self.assertTrue(optimized.is_shared())
+        self.assertIs(optimized.get_root().left, optimized.get_root().right)
+
+    def test_deep_dag(self):
+        """Test that deep shared trees are built and evaluated without recursion"""
+        tree =ParseTree(Parser("(" * 5000 + "x" + "+1)" * 5000).postfix, shared=True)
+        self.assertEqual(tree.execute({'x': 1}), 5001)
+        self.assertEqual(tree.node_count(), 5002)
+
+
+if __name__ == '__main__':
+    unittest.main()
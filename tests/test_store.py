@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+import math
+import os
+import tempfile
+import unittest
+from unittest import mock
+from cache import LRUCache
+from cost import CostLimits, CostLimitExceeded
+from index import Parser
+from lexer import LexerError, normalize
+from parseTree import ParseTree
+import store
+from store import ExpressionStore, StoredExpression, StoredError, compile_expression, write_store, build_store
+
+
+class TestDump(unittest.TestCase):
+    """Test cases for ParseTree.dump() and ParseTree.load()"""
+
+    def test_round_trip(self):
+        """Test that a loaded tree is the same as the dumped one"""
+        for expr in ["3+4*5", "(a+b)*(a+b)^2/(a+b)", "x", "2.5^x", "((((1))))"]:
+            tree = ParseTree(Parser(expr).postfix)
+            data = tree.dump()
+            self.assertIsInstance(data, bytes)
+            loaded = ParseTree.load(data)
+            self.assertEqual(loaded.get_postfix(), tree.get_postfix(), expr)
+            self.assertEqual(loaded.to_json(), tree.to_json(), expr)
+        self.assertEqual(ParseTree(Parser("3+4*5").postfix).dump(), b'3 4 5 * +')
+
+    def test_shared(self):
+        """Test that a shared tree is dumped expanded and can be loaded shared again"""
+        tree = ParseTree(Parser("(a+b)*(a+b)").postfix, shared=True)
+        loaded = ParseTree.load(tree.dump(), shared=True)
+        self.assertTrue(loaded.is_shared())
+        self.assertEqual(loaded.node_count(), tree.node_count())
+        self.assertEqual(loaded.execute({'a': 1, 'b': 2}), 9)
+
+
+class TestExpressionStore(unittest.TestCase):
+    """Test cases for the persistent expression store"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "expressions.store")
+
+    def open(self) -> ExpressionStore:
+        opened = ExpressionStore(self.path)
+        self.addCleanup(opened.close)
+        return opened
+
+    def test_write_and_read(self):
+        """Test that every written expression is read back"""
+        expressions = ["3+4", "3+4*5", "(1+2)*(3-4)/5", "2^10", "10-3-2", "3.5+4.2"]
+        self.assertEqual(build_store(self.path, expressions), len(expressions))
+        opened = self.open()
+        self.assertEqual(len(opened), len(expressions))
+        for expr in expressions:
+            stored = opened.get(normalize(expr))
+            self.assertEqual(stored.postfix, tuple(Parser(expr).postfix), expr)
+            self.assertEqual(stored.result, Parser(expr).evaluate(), expr)
+            self.assertIsNone(stored.error)
+        self.assertEqual([key for key, _ in opened.items()], [normalize(expr) for expr in expressions])
+        self.assertIn("3+4", opened)
+        self.assertNotIn("3+5", opened)
+        self.assertIsNone(opened.get("3+5"))
+        self.assertEqual(opened.get("3+5", 0), 0)
+
+    def test_many_expressions(self):
+        """Test lookups in a store of many expressions, with collisions in the index"""
+        expressions = [f"{i}*x+{i % 7}" if i % 3 else f"{i}+{i}" for i in range(3000)]
+        build_store(self.path, expressions)
+        opened = self.open()
+        self.assertEqual(len(opened), 3000)
+        for i in range(0, 3000, 37):
+            stored = opened.get(expressions[i])
+            if i % 3:
+                self.assertEqual(stored.error.code, 'invalid_expression')
+            else:
+                self.assertEqual(stored.result, 2 * i)
+        self.assertNotIn("3001+3001", opened)
+
+    def test_hash_collisions(self):
+        """Test that keys with the same hash are told apart"""
+        with mock.patch.object(store, "key_hash", lambda key: 42):
+            write_store(self.path, [("1+1", compile_expression("1+1")), ("2+2", compile_expression("2+2"))])
+            opened = self.open()
+            self.assertEqual(opened.get("1+1").result, 2)
+            self.assertEqual(opened.get("2+2").result, 4)
+            self.assertIsNone(opened.get("3+3"))
+
+    def test_errors(self):
+        """Test that errors are stored and raised as the same exceptions"""
+        build_store(self.path, ["3++4", "1/0", "x+1", "(3+4", "3+é"])
+        opened = self.open()
+        for expr in ["3++4", "(3+4", "3+é"]:
+            stored = opened.get(normalize(expr))
+            with self.assertRaises(LexerError) as raised:
+                Parser(expr)
+            self.assertEqual(stored.postfix, ())
+            self.assertTrue(math.isnan(stored.result))
+            self.assertEqual(stored.exception().to_dict(), raised.exception.to_dict(), expr)
+        self.assertIsInstance(opened.get("1/0").exception(), ZeroDivisionError)
+        self.assertEqual(opened.get("1/0").error, StoredError('division_by_zero', "Division by zero"))
+        self.assertEqual(opened.get("1/0").postfix, ('1', '0', '/'))
+        self.assertIsInstance(opened.get("x+1").exception(), ValueError)
+
+    def test_later_entries_win(self):
+        """Test that a key written twice keeps its last value"""
+        write_store(self.path, [("1+1", StoredExpression(('1', '1', '+'), 3.0)), ("1+1", compile_expression("1+1"))])
+        self.assertEqual(len(self.open()), 1)
+        self.assertEqual(self.open().get("1+1").result, 2)
+
+    def test_empty_and_invalid_files(self):
+        """Test an empty store and files that are not stores"""
+        write_store(self.path, [])
+        self.assertEqual(len(self.open()), 0)
+        self.assertIsNone(self.open().get("1"))
+        with open(self.path, "wb") as file:
+            file.write(b"not a store, just some bytes")
+        with self.assertRaises(ValueError):
+            ExpressionStore(self.path)
+        with open(self.path, "wb") as file:
+            file.write(b"short")
+        with self.assertRaises(ValueError):
+            ExpressionStore(self.path)
+
+    def test_rebuild_keeps_entries(self):
+        """Test that building from an existing store keeps its expressions"""
+        build_store(self.path, ["1+1"])
+        with ExpressionStore(self.path) as existing:
+            self.assertEqual(build_store(self.path, ["2+2", "1 + 1"], existing), 2)
+        self.assertEqual(self.open().get("1+1").result, 2)
+        self.assertEqual(self.open().get("2+2").result, 4)
+
+    def test_cached_uses_store(self):
+        """Test that Parser.cached() serves stored expressions without parsing them"""
+        build_store(self.path, ["3 + 4 * 5", "1/0", "2^2^2^2"])
+        opened = self.open()
+        cache = LRUCache(maxsize=10)
+        with mock.patch("index.Parser.__init__", side_effect=AssertionError("parsed")):
+            result = Parser.cached("3+4*5", cache, store=opened)
+            self.assertEqual(result.result, 23)
+            self.assertEqual(result.postfix, ('3', '4', '5', '*', '+'))
+            self.assertEqual(result.parse_tree_json, ParseTree(list(result.postfix)).to_json())
+            self.assertIn("3+4*5", cache)
+            self.assertEqual(Parser.cached("3+4*5", LRUCache(maxsize=10), with_tree=False, store=opened).parse_tree, None)
+            with self.assertRaises(ZeroDivisionError):
+                Parser.cached("1/0", cache, store=opened)
+            with self.assertRaises(CostLimitExceeded):
+                Parser.cached("2^2^2^2", cache, limits=CostLimits(max_nodes=3), store=opened)
+        # Expressions missing from the store are parsed
+        self.assertEqual(Parser.cached("6*7", cache, store=opened).result, 42)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -57,9 +57,8 @@ class TestExpressionValidation(unittest.TestCase):
         
         # Invalid number formats
         self.assertFalse(is_valid_expression('3.4.5+6'))
-        # Note: Current implementation actually allows decimal points without following digits
-        # Uncomment this line if validation is strengthened
-        # self.assertFalse(is_valid_expression('3.+4'))
+        self.assertFalse(is_valid_expression('3.+4'))
+        self.assertFalse(is_valid_expression('.5+4'))
     
     def test_parentheses_validation(self):
         """Test behavior with parenthesized expressions"""
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+import unittest
+from index import Parser
+from lexer import tokenize, VARIABLE, LexerError
+from operators import is_valid_expression
+from parseTree import ParseTree, CompactParseTree, evaluate_postfix
+
+
+class TestVariables(unittest.TestCase):
+    """Test cases for expressions with variables"""
+
+    def test_tokenize(self):
+        """Test that identifiers are tokenized as variables"""
+        tokens = tokenize("rate*price_2+x")
+        self.assertEqual([(t.type, t.value) for t in tokens if t.type == VARIABLE],
+                         [(VARIABLE, 'rate'), (VARIABLE, 'price_2'), (VARIABLE, 'x')])
+        self.assertTrue(is_valid_expression("(a+b)*c"))
+        self.assertFalse(is_valid_expression("2x+1"))
+        self.assertFalse(is_valid_expression("a b"))
+        with self.assertRaises(LexerError):
+            tokenize("x$+1")
+
+    def test_bind(self):
+        """Test evaluating a parsed expression against several bindings"""
+        parser = Parser("a*x^2+b*x+c")
+        self.assertEqual(parser.postfix, ['a', 'x', '2', '^', '*', 'b', 'x', '*', '+', 'c', '+'])
+        self.assertEqual(parser.variables, ['a', 'x', 'b', 'c'])
+        for x in range(-3, 4):
+            self.assertEqual(parser.bind(x=x, a=2, b=-1, c=0.5), 2 * x ** 2 - x + 0.5)
+
+    def test_unbound(self):
+        """Test that missing variables raise ValueError"""
+        parser = Parser("x+y")
+        with self.assertRaises(ValueError):
+            parser.evaluate()
+        with self.assertRaises(ValueError):
+            parser.bind(x=1)
+        self.assertEqual(parser.bind(x=1, y=2, z=3), 3)
+
+    def test_all_evaluators_agree(self):
+        """Test that every evaluation path gives the same result"""
+        postfix = Parser("(rate+1)^years*price-fee/2").postfix
+        bindings = {'rate': 0.05, 'years': 3, 'price': 100, 'fee': 4}
+        expected = (0.05 + 1) ** 3 * 100 - 4 / 2
+        tree = ParseTree(postfix)
+        self.assertAlmostEqual(evaluate_postfix(postfix, bindings), expected)
+        self.assertAlmostEqual(tree.execute(bindings), expected)
+        self.assertAlmostEqual(tree.compile()(0.05, 3, 100, 4), expected)
+        self.assertAlmostEqual(CompactParseTree(postfix).execute(bindings), expected)
+        self.assertEqual(CompactParseTree(postfix).get_postfix(), postfix)
+
+    def test_keyword_names(self):
+        """Test that variable names which are Python keywords can be compiled"""
+        self.assertEqual(Parser("in+if*t0").bind(**{'in': 1, 'if': 2, 't0': 3}), 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+import unittest
+from array import array
+from index import Parser
+from vectorized import evaluate_tree, numpy
+
+EXPRESSIONS = ["a*x^2+b*x+c", "(x+1)/(a+2)", "x-a-b", "2^a^0.5*x", "3+4*5"]
+ROWS = {
+    'a': [1.0, 2.0, 0.5, 3.0],
+    'b': [0.0, -1.0, 2.5, 4.0],
+    'c': [1.0, 1.0, -2.0, 0.25],
+    'x': [0.0, 1.5, -3.0, 10.0],
+}
+
+
+def rows(names):
+    """ Yield the bindings of every row """
+    for index in range(len(ROWS['x'])):
+        yield {name: ROWS[name][index] for name in names}
+
+
+class TestPythonFallback(unittest.TestCase):
+    """Test cases for vectorized evaluation without NumPy"""
+
+    def evaluate(self, expr: str, arrays: dict):
+        tree = Parser(expr).parsetree
+        return evaluate_tree(tree.get_root(), tree.get_variables(), arrays, numpy_module=None)
+
+    def test_matches_scalar_path(self):
+        """Test that every row gives the same result as execute()"""
+        for expr in EXPRESSIONS:
+            tree = Parser(expr).parsetree
+            result = self.evaluate(expr, ROWS)
+            self.assertIsInstance(result, array)
+            expected = [tree.execute(bindings) for bindings in rows(tree.get_variables())]
+            if not tree.get_variables():
+                expected = expected[:1]
+            self.assertEqual(list(result), expected, expr)
+
+    def test_errors(self):
+        """Test that division by zero and overflow raise like the scalar path"""
+        with self.assertRaises(ZeroDivisionError):
+            self.evaluate("1/x", {'x': [1.0, 0.0]})
+        with self.assertRaises(OverflowError):
+            self.evaluate("10^x", {'x': [1.0, 400.0]})
+        with self.assertRaises(ValueError):
+            self.evaluate("x+y", {'x': [1.0]})
+        with self.assertRaises(ValueError):
+            self.evaluate("x+y", {'x': [1.0], 'y': [1.0, 2.0]})
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TestNumpy(unittest.TestCase):
+    """Test cases for vectorized evaluation with NumPy"""
+
+    def test_matches_scalar_path(self):
+        """Test that every row gives the same result as execute()"""
+        for expr in EXPRESSIONS:
+            tree = Parser(expr).parsetree
+            result = tree.evaluate_vectorized(**{name: numpy.array(values) for name, values in ROWS.items()})
+            self.assertIsInstance(result, numpy.ndarray)
+            expected = [tree.execute(bindings) for bindings in rows(tree.get_variables())]
+            if not tree.get_variables():
+                expected = expected[:1]
+            self.assertEqual(result.shape, (len(expected),), expr)
+            for value, expected_value in zip(result, expected):
+                self.assertAlmostEqual(value, expected_value, msg=expr)
+
+    def test_same_as_fallback(self):
+        """Test that lengths are checked and results have the same shape as without NumPy"""
+        tree = Parser("x+y").parsetree
+        with self.assertRaises(ValueError):
+            tree.evaluate_vectorized(x=numpy.array([1.0]), y=numpy.array([1.0, 2.0]))
+        for expr in ["3+4*5", "x"]:
+            tree = Parser(expr).parsetree
+            x = numpy.array([1.0, 2.0])
+            result = evaluate_tree(tree.get_root(), tree.get_variables(), {'x': x})
+            self.assertEqual(list(result), list(evaluate_tree(tree.get_root(), tree.get_variables(), {'x': x},
+                                                              numpy_module=None)), expr)
+            self.assertIsNot(result, x)
+            result[0] = 0.0
+            self.assertEqual(x[0], 1.0)
+
+    def test_errors(self):
+        """Test that division by zero and overflow raise like the scalar path"""
+        tree = Parser("1/x").parsetree
+        with self.assertRaises(ZeroDivisionError):
+            tree.evaluate_vectorized(x=numpy.array([1.0, 0.0]))
+        with self.assertRaises(OverflowError):
+            Parser("10^x").parsetree.evaluate_vectorized(x=numpy.array([1.0, 400.0]))
+        with self.assertRaises(ZeroDivisionError):
+            Parser("x^(0-1)").parsetree.evaluate_vectorized(x=numpy.array([0.0]))
+
+    def test_overflow_to_infinity(self):
+        """Test that multiplication overflows to inf, as float arithmetic does"""
+        result = Parser("x*x").parsetree.evaluate_vectorized(x=numpy.array([1e200]))
+        self.assertEqual(result[0], float("inf"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+# Evaluates a parse tree over whole arrays of variable values at once.
+# The tree is walked a single time and every operator is applied to entire arrays,
+# instead of walking the tree once per row.
+
+# NumPy is optional. When it is installed the operators run as NumPy array operations,
+# otherwise a pure Python fallback works on array.array('d') buffers.
+# Both follow the semantics of the scalar evaluators in parseTree.py:
+# - division by zero raises ZeroDivisionError (NumPy alone would return inf or nan)
+# - an exponentiation that overflows raises OverflowError (other operations overflow to inf)
+# - a negative base with a fractional exponent raises ValueError (see operators.guarded_power)
+
+from array import array
+from itertools import repeat
+from operator import truediv, pow as power
+
+from operators import registry, guarded_power
+
+try:
+    import numpy
+except ImportError:  # NumPy is an optional dependency
+    numpy = None
+
+
+def evaluate_tree(root, variables: list[str], arrays: dict, numpy_module=numpy, shared: bool = False):
+    """
+        Evaluate the tree starting at root for every row of the arrays.
+        With shared=True root may be a DAG (see ParseTree(postfix, shared=True)), whose shared nodes are evaluated once.
+        arrays maps each variable name to a sequence of values, all of the same length.
+        Returns a numpy.ndarray when NumPy is available (numpy_module), otherwise an array.array('d'),
+        with one value per row (a single value for an expression without variables). It is never
+        one of the given arrays.
+        Raises ValueError if a variable is missing or the lengths differ.
+    """
+    missing = [name for name in variables if name not in arrays]
+    if missing:
+        raise ValueError(f"Unbound variable(s): {', '.join(missing)}")
+
+    if numpy_module is not None:
+        # Without a copy of the arrays that already are float64 arrays
+        columns = {name: numpy_module.asarray(arrays[name], dtype=numpy_module.float64) for name in variables}
+        apply = lambda function, left, right: _apply_numpy(numpy_module, function, left, right)
+    else:
+        columns = {name: array('d', arrays[name]) for name in variables}
+        apply = lambda function, left, right: _apply_python(length, function, left, right)
+    # NumPy would broadcast arrays of different lengths against each other
+    lengths = {len(column) for column in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError("All arrays must have the same length.")
+    length = lengths.pop() if lengths else 1
+
+    if root is None:
+        result = 0.0
+    else:
+        # Post-order traversal with an explicit stack, operands are arrays or plain floats (constants)
+        values : list = []
+        # The results of the operator nodes evaluated so far by id(node), only kept for a DAG
+        done : dict = {} if shared else None
+        stack : list = [(root, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if node.is_variable:
+                values.append(columns[node.value])
+            elif not node.is_operator:
+                values.append(node.number)
+            elif children_done:
+                right = values.pop()
+                left = values.pop()
+                values.append(apply(registry.get(node.value).function, left, right))
+                if done is not None:
+                    done[id(node)] = values[-1]
+            elif done is not None and id(node) in done:
+                values.append(done[id(node)])
+            else:
+                if node.left is None or node.right is None:
+                    raise ValueError("Invalid parse tree: operator node must have both left and right children.")
+                stack.append((node, True))
+                stack.append((node.right, False))
+                stack.append((node.left, False))
+        result = values.pop()
+
+    # An expression without variables gives a single number, repeat it for every row
+    if numpy_module is not None:
+        if isinstance(result, float):
+            return numpy_module.full(length, result)
+        # A single variable is its column, which may be the caller's array
+        return result.copy() if root.is_variable else result
+    if isinstance(result, float):
+        return array('d', repeat(result, length))
+    return result
+
+
+def _apply_numpy(numpy_module, function, left, right):
+    """ Apply an operator to NumPy arrays (or floats) with the error semantics of the scalar path """
+    if function is truediv:
+        if numpy_module.any(numpy_module.asarray(right) == 0):
+            raise ZeroDivisionError("float division by zero")
+        return numpy_module.true_divide(left, right)
+    if function is guarded_power or function is power:
+        if function is guarded_power:
+            with numpy_module.errstate(invalid='ignore'):
+                # mod(inf, 1) is nan, an infinite exponent is not an integer (like float(inf).is_integer())
+                fractional = numpy_module.mod(right, 1) != 0
+            if numpy_module.any((numpy_module.asarray(left) < 0) & fractional):
+                raise ValueError("Invalid power: a negative base with a fractional exponent has no real result.")
+        with numpy_module.errstate(over='raise', divide='raise'):
+            try:
+                return numpy_module.power(left, right)
+            except FloatingPointError as error:
+                if "overflow" in str(error):
+                    raise OverflowError("Result too large: a power exceeds the largest number.") from None
+                raise ZeroDivisionError("0.0 cannot be raised to a negative power") from None
+    # Like float arithmetic, other operations overflow to inf (or give nan) silently
+    with numpy_module.errstate(over='ignore', invalid='ignore'):
+        return function(left, right)
+
+
+def _apply_python(length: int, function, left, right) -> array:
+    """ Apply an operator element by element to array.array buffers (or floats) """
+    if isinstance(left, float):
+        left = repeat(left, length)
+    if isinstance(right, float):
+        right = repeat(right, length)
+    return array('d', map(function, left, right))